@@ -0,0 +1,239 @@
+"""
+Backfills net_worth_history for days without a snapshot (server down, or before the app existed).
+
+    python -m backend.backfill --start 2021-01-01 --end 2025-12-31
+
+Holdings are rebuilt by replaying transactions through the lot engine, every symbol's close
+series is read from the local price store (syncing only what it does not hold yet, in one
+download), and all missing days are valued in a single vectorized pass (valuation.py). Approximations, since the past state of cash and margins is
+not recorded:
+- Cash (TWD / USD assets) is taken as the current balance on every day.
+- Leverage and futures margin come from the current Assets row of the symbol (1.0 / 0 if gone).
+- Only days on which one of the markets trades are backfilled (weekends and days every
+  market is closed are skipped); a day without a close uses the previous close (or the first
+  close in the range when none is known yet).
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import logging
+import zlib
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from . import lots, rollups, services, versions
+from .markets import any_market_trades
+from .models import Asset, NetWorthHistory, NetWorthHistoryItem, Transaction
+from .pricing import FX_KEY
+from .pricing.engine import tw_candidates
+from .valuation import CURRENCY_CODES, TYPE_CODES, PortfolioArrays, value_portfolio
+
+logger = logging.getLogger(__name__)
+
+# (tickers, start, end) -> DataFrame of closes, one column per ticker, indexed by date
+HistoryLoader = Callable[[List[str], date, date], pd.DataFrame]
+
+FX_TICKER = FX_KEY[0]
+DEFAULT_USD_RATE = 32.0 # Same fallback as services.get_usd_to_twd_rate
+CASH_TYPES = ("TWD", "USD")
+
+
+@dataclass
+class BackfillResult:
+    days: int = 0
+    items: int = 0
+    start: Optional[date] = None
+    end: Optional[date] = None
+
+
+def missing_dates(db: Session, start: date, end: date) -> List[date]:
+    """
+    Trading days (of any market, see markets.py) between start and end (inclusive) without
+    a net_worth_history row.
+    """
+    existing = {row[0] for row in db.query(NetWorthHistory.date).filter(NetWorthHistory.date.between(start, end))}
+    return [d.date() for d in pd.bdate_range(start, end) if d.date() not in existing and any_market_trades(d.date())]
+
+
+def daily_positions(db: Session, dates: List[date]) -> Tuple[Dict[str, str], np.ndarray, np.ndarray]:
+    """
+    Quantity and average cost of every traded symbol at the close of each date, as
+    (dates x symbols) arrays, by replaying all transactions once through the lot engine.
+    Returns ({symbol: asset_type} in column order, quantity, cost).
+    """
+    symbols: Dict[str, str] = {}
+    for symbol, asset_type in db.query(Transaction.symbol, Transaction.asset_type).order_by(Transaction.id):
+        symbols.setdefault(str(symbol), asset_type)
+    column = {symbol: i for i, symbol in enumerate(symbols)}
+
+    quantity = np.zeros((len(dates), len(symbols)))
+    cost = np.zeros((len(dates), len(symbols)))
+    current_qty = np.zeros(len(symbols))
+    current_cost = np.zeros(len(symbols))
+    books = {symbol: lots.LotBook(lots.method_for(asset_type)) for symbol, asset_type in symbols.items()}
+
+    day = 0
+    txns = (
+        db.query(Transaction)
+        .filter(Transaction.date <= dates[-1])
+        .order_by(Transaction.date, Transaction.id)
+        .yield_per(10000)
+    )
+    for txn in txns:
+        while day < len(dates) and dates[day] < txn.date:
+            quantity[day], cost[day] = current_qty, current_cost
+            day += 1
+        symbol = str(txn.symbol)
+        book = books[symbol]
+        held = book.quantity
+        lots.trade(book, txn)
+        current_qty[column[symbol]] = book.quantity
+        current_cost[column[symbol]] = lots.average_cost(held, current_cost[column[symbol]], txn, book.quantity)
+    quantity[day:], cost[day:] = current_qty, current_cost
+    return symbols, quantity, cost
+
+
+def price_tickers(symbol: str, asset_type: str) -> List[str]:
+    if asset_type == "US_STOCK":
+        return [symbol]
+    if asset_type in ("TW_STOCK", "TW_FUTURE"):
+        # Futures are priced through the underlying stock, as in services.quote_key
+        return tw_candidates(symbol)
+    return []
+
+
+def close_matrix(closes: pd.DataFrame, dates: List[date], columns: List[List[str]]) -> np.ndarray:
+    """
+    (dates x symbols) closes, taking for each symbol the first of its tickers that has data.
+    """
+    prices = np.zeros((len(dates), len(columns)))
+    for i, tickers in enumerate(columns):
+        ticker = next((t for t in tickers if t in closes.columns and closes[t].notna().any()), None)
+        if ticker is None:
+            logger.warning(f"No price history for {tickers}, valued at 0.")
+            continue
+        prices[:, i] = closes[ticker].to_numpy(dtype=np.float64)
+    return prices
+
+
+def align_closes(frame: pd.DataFrame, dates: List[date]) -> pd.DataFrame:
+    if frame.empty:
+        return pd.DataFrame(index=dates)
+    index = sorted(set(frame.index) | set(dates))
+    return frame.reindex(index).ffill().bfill().reindex(dates)
+
+
+def synthetic_asset_id(symbol: str) -> int:
+    # Positions that are no longer in the Assets table get a stable negative id
+    return -(zlib.crc32(symbol.encode("utf-8")) & 0x7FFFFFFF) - 1
+
+
+def backfill_net_worth(
+    db: Session,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    loader: Optional[HistoryLoader] = None,
+) -> BackfillResult:
+    """
+    Writes net_worth_history (and its item rows and rollups) for every missing trading day
+    between start (default: first transaction) and end (default: yesterday), then commits.
+    Closes come from `loader`, by default the local price store (services.get_price_store).
+    """
+    if start is None:
+        first = db.query(Transaction.date).order_by(Transaction.date).first()
+        start = first[0] if first else date.today()
+    end = end or date.today() - timedelta(days=1)
+    dates = missing_dates(db, start, end)
+    result = BackfillResult(start=start, end=end)
+    if not dates:
+        return result
+
+    symbols, quantity, cost = daily_positions(db, dates)
+    assets = {a.symbol: a for a in db.query(Asset).filter(Asset.type.notin_(CASH_TYPES))}
+    cash = db.query(Asset).filter(Asset.type.in_(CASH_TYPES)).all()
+
+    # Prices: one bulk read for every symbol and the FX series, after syncing what the store lacks
+    loader = loader or services.get_price_store().history
+    ticker_columns = [price_tickers(symbol, asset_type) for symbol, asset_type in symbols.items()]
+    tickers = sorted({t for column in ticker_columns for t in column} | {FX_TICKER})
+    closes = align_closes(loader(tickers, dates[0] - timedelta(days=10), dates[-1]), dates)
+    prices = close_matrix(closes, dates, ticker_columns)
+    if FX_TICKER in closes.columns:
+        usd_rate = closes[FX_TICKER].fillna(DEFAULT_USD_RATE).to_numpy(dtype=np.float64)
+    else:
+        usd_rate = np.full(len(dates), DEFAULT_USD_RATE)
+
+    # Traded symbols followed by the (constant) cash balances
+    held = [assets.get(symbol) for symbol in symbols]
+    types = list(symbols.values()) + [a.type for a in cash]
+    n_cash = len(cash)
+    arrays = PortfolioArrays(
+        quantity=np.hstack([quantity, np.tile([a.quantity for a in cash], (len(dates), 1))]),
+        cost=np.hstack([cost, np.zeros((len(dates), n_cash))]),
+        contract_size=np.array([(a.contract_size if a else None) or 1.0 for a in held] + [1.0] * n_cash),
+        margin=np.array([(a.margin if a else None) or 0.0 for a in held] + [0.0] * n_cash),
+        leverage=np.array([a.leverage if a and a.leverage is not None else 1.0 for a in held] + [0.0] * n_cash),
+        type_code=np.array([TYPE_CODES.get(t, -1) for t in types], dtype=np.int8),
+        currency_code=np.array(
+            [CURRENCY_CODES["USD" if t == "US_STOCK" else "TWD"] for t in symbols.values()]
+            + [CURRENCY_CODES.get(a.currency, -1) for a in cash],
+            dtype=np.int8,
+        ),
+    )
+    valuation = value_portfolio(arrays, np.hstack([prices, np.zeros((len(dates), n_cash))]), usd_rate)
+
+    asset_ids = [a.id if a else synthetic_asset_id(symbol) for symbol, a in zip(symbols, held)] + [a.id for a in cash]
+    names = list(symbols) + [a.symbol or a.type for a in cash]
+    rows, columns = np.nonzero(arrays.quantity)
+    item_columns = ("date", "asset_id", "symbol", "type", "quantity", "price", "value_twd", "exposure")
+    day_keys = [d.isoformat() for d in dates] # SQLite Date storage format
+    quantities, prices_held = arrays.quantity[rows, columns].tolist(), valuation.current_price[rows, columns].tolist()
+    values, exposures = valuation.value_twd[rows, columns].tolist(), valuation.notional_value[rows, columns].tolist()
+    items = [
+        (day_keys[r], asset_ids[c], names[c], types[c], q, p, v, e)
+        for r, c, q, p, v, e in zip(rows.tolist(), columns.tolist(), quantities, prices_held, values, exposures)
+    ]
+    history = [
+        {"date": d, "total_twd": twd, "total_usd": usd}
+        for d, twd, usd in zip(dates, valuation.total_twd.tolist(), valuation.total_usd.tolist())
+    ]
+
+    # Item rows go straight to the driver's executemany: hundreds of thousands of tuples
+    # without per-row ORM or Core parameter processing
+    connection = db.connection()
+    connection.execute(NetWorthHistory.__table__.insert(), history)
+    if items:
+        placeholders = ", ".join("?" for _ in item_columns)
+        connection.exec_driver_sql(
+            f"INSERT INTO {NetWorthHistoryItem.__tablename__} ({', '.join(item_columns)}) VALUES ({placeholders})",
+            items,
+        )
+    rollups.rebuild_net_worth(db)
+    versions.bump(db, versions.NET_WORTH_HISTORY)
+    db.commit()
+
+    result.days, result.items = len(history), len(items)
+    logger.info(f"Backfilled {result.days} days ({result.items} asset rows) between {start} and {end}.")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill missing net-worth history from transactions.")
+    parser.add_argument("--start", type=date.fromisoformat, help="first day (default: first transaction)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last day (default: yesterday)")
+    args = parser.parse_args()
+
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        result = backfill_net_worth(db, start=args.start, end=args.end)
+        print(f"Backfilled {result.days} days between {result.start} and {result.end}.")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: net-worth backfill over a long history with prices already cached.
+
+Generates `--years` of trading in `--symbols` TW symbols, then backfills every weekday
+from a pre-built close frame (no network). Run from the project root:
+    python -m backend.benchmarks.bench_backfill
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from backend.backfill import backfill_net_worth
+from backend.database import Base
+from backend.models import Transaction
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--trades-per-day", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    start = date(2020, 1, 1)
+    end = start + timedelta(days=365 * args.years)
+    days = [d.date() for d in pd.bdate_range(start, end)]
+    symbols = [f"{1000 + i}" for i in range(args.symbols)]
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    rows = []
+    for day_index, day in enumerate(days):
+        for i in range(args.trades_per_day):
+            rows.append({
+                "date": day, "asset_type": "TW_STOCK", "symbol": random.choice(symbols),
+                "action": "BUY" if random.random() < 0.6 else "SELL",
+                "price": round(random.uniform(10, 1000), 2), "quantity": float(random.randint(1, 10) * 100),
+                "occurrence": i,
+            })
+    session.execute(insert(Transaction), rows)
+    session.commit()
+
+    rng = np.random.default_rng(0)
+    closes = pd.DataFrame(
+        rng.uniform(10, 1000, size=(len(days), len(symbols) + 1)),
+        index=days,
+        columns=[f"{s}.TW" for s in symbols] + ["TWD=X"],
+    )
+
+    def cached_loader(tickers, first, last):
+        return closes[[t for t in tickers if t in closes.columns]]
+
+    t0 = time.perf_counter()
+    result = backfill_net_worth(session, start=start, end=end, loader=cached_loader)
+    elapsed = time.perf_counter() - t0
+    print(f"{len(rows)} transactions, {args.symbols} symbols: backfilled {result.days} days "
+          f"({result.items} asset rows) in {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
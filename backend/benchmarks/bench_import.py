@@ -0,0 +1,92 @@
+"""
+Benchmark: per-row EXISTS + session.add import vs set-based TransactionProcessor.
+
+Run from the project root:
+    python -m backend.benchmarks.bench_import
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, exists, and_
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models import Transaction
+from backend.importer import TransactionDTO, TransactionProcessor
+
+
+def make_dtos(n):
+    start = date(2015, 1, 1)
+    return [
+        TransactionDTO(
+            date=start + timedelta(days=i // 40),
+            asset_type="TW_STOCK",
+            symbol=f"{1000 + random.randrange(300)}",
+            action=random.choice(["BUY", "SELL"]),
+            price=round(random.uniform(10, 1000), 2),
+            quantity=float(random.randint(1, 10) * 100),
+        )
+        for i in range(n)
+    ]
+
+
+def legacy_import(dtos, session):
+    """The previous implementation: one EXISTS query and one ORM object per row."""
+    inserted = 0
+    for dto in dtos:
+        stmt = exists().where(and_(
+            Transaction.date == dto.date,
+            Transaction.symbol == dto.symbol,
+            Transaction.action == dto.action,
+            Transaction.quantity == dto.quantity,
+            Transaction.price == dto.price,
+            Transaction.asset_type == dto.asset_type,
+        ))
+        if session.query(stmt).scalar():
+            continue
+        session.add(Transaction(**dto.__dict__))
+        inserted += 1
+    session.commit()
+    return inserted
+
+
+def fresh_session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)()
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--legacy-max", type=int, default=10000, help="skip the slow legacy path above this size")
+    args = parser.parse_args()
+
+    random.seed(0)
+    processor = TransactionProcessor()
+    print(f"{'rows':>8} {'legacy (s)':>11} {'bulk (s)':>9} {'re-import (s)':>14}")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        dtos = make_dtos(n)
+
+        legacy = "-"
+        if n <= args.legacy_max:
+            legacy = f"{timed(legacy_import, dtos, fresh_session()):.3f}"
+
+        session = fresh_session()
+        bulk = timed(processor.import_transactions, dtos, session)
+        # Re-importing the same file: everything is skipped
+        reimport = timed(processor.import_transactions, dtos, session)
+
+        print(f"{n:>8} {legacy:>11} {bulk:>9.3f} {reimport:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
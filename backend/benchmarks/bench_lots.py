@@ -0,0 +1,50 @@
+"""
+Benchmark: FIFO matching with list.pop(0) (previous import_us.py loop) vs the deque LotBook.
+
+Buys `n` single-share lots, then sells them back one share at a time. Run from the project root:
+    python -m backend.benchmarks.bench_lots
+"""
+import argparse
+import time
+
+from backend.lots import FIFO, LotBook
+
+
+def legacy_fifo(n):
+    buy_queue = [{"qty": 1.0, "price": 100.0 + i % 7} for i in range(n)]
+    pnl = 0.0
+    for _ in range(n):
+        buy_lot = buy_queue[0]
+        pnl += (110.0 - buy_lot["price"]) * 1.0
+        buy_queue.pop(0)
+    return pnl
+
+
+def lot_book_fifo(n):
+    book = LotBook(FIFO)
+    for i in range(n):
+        book.buy(1.0, 100.0 + i % 7)
+    return sum(book.sell(1.0, 110.0) for _ in range(n))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,300000")
+    args = parser.parse_args()
+
+    print(f"{'lots':>8} {'list.pop(0) (s)':>16} {'deque (s)':>10}")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        start = time.perf_counter()
+        legacy = legacy_fifo(n)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        new = lot_book_fifo(n)
+        new_time = time.perf_counter() - start
+
+        assert abs(legacy - new) < 1e-6
+        print(f"{n:>8} {legacy_time:>16.3f} {new_time:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
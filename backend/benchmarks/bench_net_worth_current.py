@@ -0,0 +1,142 @@
+"""
+Benchmark: /net-worth/current throughput and latency from recorded quotes (no network).
+
+A synthetic portfolio is priced through ReplayProviders: most TW symbols resolve on .TW,
+every 5th only on .TWO and every 20th only through twstock, so the fallback chain runs as
+well. `--latency` adds a fixed delay per provider call to stand in for upstream round trips.
+Cold requests start from an empty quote cache, warm ones are served from it.
+
+`--outage twstock` makes a provider hang for `--timeout` seconds and then fail, to show the
+latency budget (`--budget`, 0 to disable) and the per-provider circuit breakers at work.
+
+To replay quotes captured from the real providers instead, run the server once with
+FINANCE_QUOTE_MODE=record and pass the recording (and the database holding the portfolio):
+    FINANCE_DATABASE_URL=sqlite:///backend/finance.db python -m backend.benchmarks.bench_net_worth_current --recording backend/quote_recording.json
+
+Run from the project root:
+    python -m backend.benchmarks.bench_net_worth_current
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+# Import the app against an in-memory database unless one is given
+os.environ.setdefault("FINANCE_DATABASE_URL", "sqlite://")
+
+from fastapi.testclient import TestClient
+
+from backend import database, models, services
+from backend.main import app
+from backend.models import Asset
+from backend.pricing import (
+    CircuitBreaker, PriceCache, QuoteProvider, QuoteRecording, ResolutionIndex, guarded_providers, replay_providers,
+)
+
+
+class OutageProvider(QuoteProvider):
+    """
+    An upstream that times out on every call.
+    """
+
+    def __init__(self, name, timeout):
+        self.name = name
+        self.timeout = timeout
+
+    def fetch(self, target):
+        time.sleep(self.timeout)
+        raise TimeoutError(f"{self.name} timed out")
+
+
+def make_portfolio(db, n):
+    recording = QuoteRecording(os.path.join(tempfile.mkdtemp(), "recording.json"))
+    recording.record("yfinance", "TWD=X", 32.5)
+    db.add(Asset(type="TWD", symbol="TWD", quantity=100000.0, cost=1.0, currency="TWD", leverage=0.0))
+    for i in range(n):
+        price = 100.0 + i
+        if i % 3 == 0:
+            symbol = f"U{i}"
+            db.add(Asset(type="US_STOCK", symbol=symbol, quantity=10.0, cost=90.0, currency="USD"))
+            recording.record("yfinance", symbol, price)
+            continue
+        symbol = str(1000 + i)
+        db.add(Asset(type="TW_STOCK", symbol=symbol, quantity=1000.0, cost=90.0, currency="TWD"))
+        if i % 20 == 1:
+            recording.record("twstock", symbol, price)
+        elif i % 5 == 1:
+            recording.record("yfinance", f"{symbol}.TWO", price)
+        else:
+            recording.record("yfinance", f"{symbol}.TW", price)
+    db.commit()
+    return recording
+
+
+def run(client, requests, cold):
+    latencies = []
+    for _ in range(requests):
+        if cold:
+            services.price_cache.clear()
+        start = time.perf_counter()
+        response = client.get("/net-worth/current")
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200
+    run.valued = len(response.json()["details"])
+    return latencies
+
+
+def report(label, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{label:>6} {len(latencies) / sum(latencies):>10.1f} {statistics.median(latencies) * 1000:>10.1f}"
+        f" {p95 * 1000:>10.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--assets", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every provider call")
+    parser.add_argument("--recording", help="replay this recording against the configured database's assets")
+    parser.add_argument("--outage", action="append", default=[], help="provider that times out on every call")
+    parser.add_argument("--timeout", type=float, default=2.0, help="seconds an --outage provider hangs")
+    parser.add_argument("--budget", type=float, default=services.QUOTE_BUDGET_SECONDS)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=database.engine) # The app only sets up the schema on startup
+    db = database.SessionLocal()
+    if args.recording:
+        recording = QuoteRecording(args.recording)
+    else:
+        recording = make_portfolio(db, args.assets)
+    db.close()
+
+    providers = replay_providers(recording, latency=args.latency)
+    for name in args.outage:
+        providers[name] = OutageProvider(name, args.timeout)
+    breakers = {name: CircuitBreaker(name) for name in providers}
+    services.quote_providers = guarded_providers(providers, breakers)
+    services.QUOTE_BUDGET_SECONDS = args.budget or None
+    services.price_cache = PriceCache()
+    services.resolution_index = ResolutionIndex(path=os.path.join(tempfile.mkdtemp(), "routes.db"))
+    client = TestClient(app)
+
+    # First request resolves every symbol's route (and meets any outage); later cold requests
+    # reuse the resolution index
+    first = run(client, 1, cold=True)
+    print(
+        f"{run.valued} assets valued, {args.requests} requests, {args.latency * 1000:.0f} ms per provider call,"
+        f" budget {args.budget or 'none'}, outage: {', '.join(args.outage) or 'none'}"
+    )
+    print(f"{'cache':>6} {'req/s':>10} {'p50 (ms)':>10} {'p95 (ms)':>10}")
+    report("first", first)
+    report("cold", run(client, args.requests, cold=True))
+    report("warm", run(client, args.requests, cold=False))
+    for name in args.outage:
+        print(f"{name} circuit: {breakers[name].stats()}")
+
+
+if __name__ == "__main__":
+    main()
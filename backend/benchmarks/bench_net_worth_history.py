@@ -0,0 +1,95 @@
+"""
+Benchmark: /net-worth/history read cost, JSON details blob per day vs net_worth_history_items.
+
+Reports wall time and peak Python memory (tracemalloc) for reading `--days` snapshots of
+`--assets` assets each. Run from the project root:
+    python -m backend.benchmarks.bench_net_worth_history
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from sqlalchemy import JSON, Column, Date, Float, Integer, MetaData, Table, create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from backend import crud
+from backend.database import Base
+from backend.models import NetWorthHistory
+
+TYPES = ["TWD", "USD", "TW_STOCK", "US_STOCK", "TW_FUTURE"]
+
+# The previous schema: one JSON document per day
+legacy_metadata = MetaData()
+legacy_history = Table(
+    "legacy_net_worth_history", legacy_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("date", Date, unique=True),
+    Column("total_twd", Float),
+    Column("total_usd", Float),
+    Column("details", JSON),
+)
+
+
+def make_details(n_assets):
+    return [
+        {
+            "id": i, "name": f"Asset {i}", "symbol": f"{1000 + i}", "type": TYPES[i % len(TYPES)],
+            "quantity": 1000.0, "cost": 100.0, "currency": "TWD", "current_price": random.uniform(50, 500),
+            "value_twd": random.uniform(1e4, 1e6), "leverage": 1.0, "contract_size": 1.0, "margin": 0.0,
+            "notional_value": random.uniform(1e4, 1e6), "equity": 0.0, "pnl": 0.0, "pnl_percentage": 0.0,
+        }
+        for i in range(n_assets)
+    ]
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--days", type=int, default=1000)
+    parser.add_argument("--assets", type=int, default=40)
+    args = parser.parse_args()
+
+    random.seed(0)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    legacy_metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+
+    start_day = date(2022, 1, 1)
+    for i in range(args.days):
+        day = start_day + timedelta(days=i)
+        details = make_details(args.assets)
+        total = sum(d["value_twd"] for d in details)
+        session.execute(insert(legacy_history).values(date=day, total_twd=total, total_usd=0.0, details=details))
+        session.add(NetWorthHistory(date=day, total_twd=total, total_usd=0.0))
+        crud.save_net_worth_items(session, day, details)
+    session.commit()
+
+    cases = [
+        ("legacy (JSON details)", lambda: session.execute(
+            select(legacy_history).order_by(legacy_history.c.date.desc()).limit(args.days)).all()),
+        ("totals only", lambda: crud.get_net_worth_history(session, limit=args.days)),
+        ("totals + by_class", lambda: crud.get_net_worth_history(session, limit=args.days, breakdown=True)),
+        ("one day's details", lambda: crud.get_net_worth_details(session, start_day)),
+    ]
+    print(f"{args.days} days x {args.assets} assets")
+    print(f"{'read':<22} {'time (s)':>9} {'peak (MiB)':>11}")
+    for name, fn in cases:
+        fn() # Warm the page cache
+        elapsed, peak = measure(fn)
+        print(f"{name:<22} {elapsed:>9.4f} {peak:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
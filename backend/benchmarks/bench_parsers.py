@@ -0,0 +1,79 @@
+"""
+Benchmark: row-by-row vs column-wise standardization of broker exports.
+
+Run from the project root:
+    python -m backend.benchmarks.bench_parsers
+"""
+import argparse
+import re
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backend.importer import TwBrokerStrategy
+
+
+def make_frame(n):
+    rng = np.random.default_rng(0)
+    days = pd.to_datetime("2020-01-01") + pd.to_timedelta(rng.integers(0, 2000, n), unit="D")
+    return pd.DataFrame({
+        "成交日期": days.strftime("%Y/%m/%d"),
+        "類別": rng.choice(["現股買進", "現股賣出", "融券賣出", "融券買進"], n),
+        "股票名稱": [f"測試{i % 500}({1000 + i % 500})" for i in range(n)],
+        "成交價": rng.uniform(10, 1000, n).round(2),
+        "股數": [f"{q:,}" for q in rng.integers(1, 50, n) * 100],
+        "手續費": rng.integers(20, 500, n),
+        "交易稅": rng.integers(0, 1000, n),
+    })
+
+
+def legacy_standardize(df):
+    """The previous implementation: to_dict('records') and per-row parsing."""
+    out = []
+    for row in df.to_dict("records"):
+        def get_val(key):
+            val = row.get(key)
+            return val.strip() if isinstance(val, str) else val
+        try:
+            txn_date = datetime.strptime(get_val("成交日期"), "%Y/%m/%d").date()
+        except (ValueError, TypeError):
+            continue
+        raw_symbol = str(get_val("股票名稱")).strip()
+        match = re.search(r"\((.*?)\)", raw_symbol)
+        symbol = match.group(1) if match else raw_symbol
+        try:
+            quantity = float(str(get_val("股數")).replace(",", ""))
+            price = float(str(get_val("成交價")).replace(",", ""))
+            fee = float(str(get_val("手續費")).replace(",", ""))
+            tax = float(str(get_val("交易稅")).replace(",", ""))
+        except (ValueError, AttributeError):
+            continue
+        out.append((txn_date, symbol, get_val("類別"), price, quantity, fee, tax))
+    return out
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--legacy-max", type=int, default=100000, help="skip the slow legacy path above this size")
+    args = parser.parse_args()
+
+    strategy = TwBrokerStrategy()
+    print(f"{'rows':>9} {'row-wise (s)':>13} {'column-wise (s)':>16} {'rows/s':>12}")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        df = make_frame(n)
+        legacy = f"{timed(legacy_standardize, df):.3f}" if n <= args.legacy_max else "-"
+        vectorized = timed(strategy._standardize, df)
+        print(f"{n:>9} {legacy:>13} {vectorized:>16.3f} {n / vectorized:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: asset update cost after an import, full replay vs incremental position engine.
+
+Each step grows the history, then imports a batch of new transactions and times
+update_assets_from_history. Run from the project root:
+    python -m backend.benchmarks.bench_positions
+"""
+import argparse
+import random
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models import Transaction
+from backend.services import update_assets_from_history
+
+SYMBOLS = [f"{1000 + i}" for i in range(200)]
+START = date(2015, 1, 1)
+
+
+def make_rows(n, first_day, seen):
+    rows = []
+    for i in range(n):
+        row = {
+            "date": START + timedelta(days=first_day + i // 50),
+            "asset_type": "TW_STOCK",
+            "symbol": random.choice(SYMBOLS),
+            "action": "BUY" if random.random() < 0.6 else "SELL",
+            "price": round(random.uniform(10, 1000), 2),
+            "quantity": float(random.randint(1, 10) * 100),
+        }
+        # Random trades can repeat: copies of a natural key are numbered 0..n-1, as on import
+        key = tuple(row.values())
+        row["occurrence"] = seen[key]
+        seen[key] += 1
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--batch", type=int, default=200, help="transactions per simulated import")
+    args = parser.parse_args()
+
+    random.seed(0)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    seen = Counter()
+
+    print(f"{'history':>9} {'full replay (s)':>16} {'incremental (s)':>16}")
+    loaded = 0
+    for size in [int(x) for x in args.sizes.split(",")]:
+        # Grow the history to `size` rows and bring positions up to date
+        session.execute(insert(Transaction), make_rows(size - loaded, loaded // 50, seen))
+        session.commit()
+        loaded = size
+        update_assets_from_history(session)
+
+        # Simulated import of `batch` new rows
+        new_rows = make_rows(args.batch, loaded // 50, seen)
+        session.execute(insert(Transaction), new_rows)
+        session.commit()
+        loaded += args.batch
+
+        start = time.perf_counter()
+        update_assets_from_history(session)
+        incremental = time.perf_counter() - start
+
+        start = time.perf_counter()
+        update_assets_from_history(session, full=True)
+        full = time.perf_counter() - start
+
+        print(f"{size:>9} {full:>16.3f} {incremental:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
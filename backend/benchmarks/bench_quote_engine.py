@@ -0,0 +1,101 @@
+"""
+Benchmark: serial per-asset pricing vs QuoteEngine against a local stub quote provider.
+
+Run from the project root:
+    python -m backend.benchmarks.bench_quote_engine
+"""
+import argparse
+import time
+from types import SimpleNamespace
+
+from backend.pricing import QuoteEngine
+from backend import services
+
+
+class StubQuoteProvider:
+    """
+    Simulates upstream latency without touching the network.
+    Every `miss_every`-th TW symbol is missing from the batch download so the
+    per-symbol fallback path is exercised as well.
+    """
+
+    def __init__(self, single_latency=0.01, batch_latency=0.05, miss_every=20):
+        self.single_latency = single_latency
+        self.batch_latency = batch_latency
+        self.miss_every = miss_every
+
+    def single(self, symbol, type):
+        time.sleep(self.single_latency)
+        return 100.0
+
+    def fx(self):
+        time.sleep(self.single_latency)
+        return 32.0
+
+    def batch(self, tickers):
+        time.sleep(self.batch_latency)
+        closes = {}
+        for ticker in tickers:
+            base = ticker.split(".")[0]
+            if base.startswith("TW") and int(base[2:]) % self.miss_every == 0:
+                continue
+            if ticker.endswith(".TWO"):
+                continue
+            closes[ticker] = 100.0
+        return closes
+
+
+def make_assets(n):
+    assets = []
+    for i in range(n):
+        if i % 2:
+            asset_type, symbol = "US_STOCK", f"US{i}"
+        else:
+            asset_type, symbol = "TW_STOCK", f"TW{i}"
+        assets.append(SimpleNamespace(
+            id=i, name=symbol, symbol=symbol, type=asset_type, quantity=10.0, cost=90.0,
+            currency="TWD", leverage=1.0, contract_size=1.0, margin=0.0,
+        ))
+    return assets
+
+
+def run_serial(assets, provider):
+    provider.fx()
+    for asset in assets:
+        provider.single(asset.symbol, asset.type)
+
+
+def run_engine(assets, provider):
+    engine = QuoteEngine(
+        single_fetcher=provider.single,
+        fx_fetcher=provider.fx,
+        batch_fetcher=provider.batch,
+    )
+    services.calculate_net_worth(assets, quote_engine=engine)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,100,1000")
+    parser.add_argument("--single-latency", type=float, default=0.01)
+    parser.add_argument("--batch-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    provider = StubQuoteProvider(args.single_latency, args.batch_latency)
+    print(f"{'assets':>8} {'serial (s)':>12} {'engine (s)':>12} {'speedup':>9}")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        assets = make_assets(n)
+
+        start = time.perf_counter()
+        run_serial(assets, provider)
+        serial = time.perf_counter() - start
+
+        start = time.perf_counter()
+        run_engine(assets, provider)
+        engine = time.perf_counter() - start
+
+        print(f"{n:>8} {serial:>12.3f} {engine:>12.3f} {serial / engine:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
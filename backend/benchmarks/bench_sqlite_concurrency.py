@@ -0,0 +1,114 @@
+"""
+Benchmark: /assets/ read latency while a 50k-row import is writing, per engine profile.
+
+Run from the project root:
+    python -m backend.benchmarks.bench_sqlite_concurrency
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import multiprocessing
+import time
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from backend import database, models
+from backend.database import PROFILES, create_db_engine
+from backend.importer import TransactionDTO, TransactionProcessor
+from backend.main import app
+
+
+def make_batches(rows, batch_size):
+    start = date(2015, 1, 1)
+    dtos = [
+        TransactionDTO(
+            date=start + timedelta(days=i // 30), asset_type="TW_STOCK", symbol=f"{1000 + random.randrange(300)}",
+            action=random.choice(["BUY", "SELL"]), price=round(random.uniform(10, 1000), 2),
+            quantity=float(random.randint(1, 10) * 100),
+        )
+        for i in range(rows)
+    ]
+    return [dtos[i:i + batch_size] for i in range(0, rows, batch_size)]
+
+
+def write_rows(path, name, rows, batch_size):
+    random.seed(0)
+    engine = create_db_engine(f"sqlite:///{path}", profile=PROFILES[name])
+    db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    TransactionProcessor().import_batches(make_batches(rows, batch_size), db)
+    db.close()
+
+
+def run_profile(name, rows, batch_size):
+    path = os.path.join(tempfile.mkdtemp(), f"{name}.db")
+    engine = create_db_engine(f"sqlite:///{path}", profile=PROFILES[name])
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    setup = Session()
+    for i in range(50):
+        setup.add(models.Asset(type="TW_STOCK", symbol=f"{1000 + i}", quantity=1000.0, cost=100.0))
+    setup.commit()
+    setup.close()
+
+    def override_get_db():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[database.get_db] = override_get_db
+    client = TestClient(app)
+
+    idle = []
+    for _ in range(100):
+        start = time.perf_counter()
+        client.get("/assets/")
+        idle.append((time.perf_counter() - start) * 1000)
+
+    # The import runs in its own process (as a second uvicorn worker or the scheduler would),
+    # so reads compete with it for the database lock rather than for the GIL
+    writer = multiprocessing.Process(target=write_rows, args=(path, name, rows, batch_size))
+    writer.start()
+    started = time.perf_counter()
+
+    latencies, errors = [], 0
+    while writer.is_alive():
+        start = time.perf_counter()
+        try:
+            response = client.get("/assets/")
+            if response.status_code != 200:
+                errors += 1
+        except Exception:
+            errors += 1
+        latencies.append((time.perf_counter() - start) * 1000)
+    writer.join()
+    write_s = time.perf_counter() - started
+    app.dependency_overrides.clear()
+    engine.dispose()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+    return write_s, statistics.median(idle), len(latencies), statistics.median(latencies), p99, latencies[-1], errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"{'profile':>8} {'import (s)':>11} {'idle p50':>9} {'reads':>7} {'p50 (ms)':>9} {'p99 (ms)':>9} {'max (ms)':>9} {'errors':>7}")
+    for name in ("safe", "tuned"):
+        write_s, idle, reads, p50, p99, worst, errors = run_profile(name, args.rows, args.batch_size)
+        print(f"{name:>8} {write_s:>11.2f} {idle:>9.2f} {reads:>7} {p50:>9.2f} {p99:>9.2f} {worst:>9.2f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
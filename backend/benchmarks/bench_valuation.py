@@ -0,0 +1,66 @@
+"""
+Benchmark: vectorized valuation kernel for large portfolios and price scenarios.
+
+Times calculate_net_worth (kernel plus the per-asset details list), the kernel alone, and
+the kernel over many price scenarios at once. Run from the project root:
+    python -m backend.benchmarks.bench_valuation
+"""
+import argparse
+import random
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from backend import services
+from backend.pricing import QuoteSnapshot
+from backend.valuation import load_arrays, value_portfolio
+
+TYPES = ["TWD", "USD", "TW_STOCK", "US_STOCK", "TW_FUTURE"]
+
+
+def make_portfolio(n):
+    assets, prices = [], {}
+    for i in range(n):
+        asset_type = random.choice(TYPES)
+        assets.append(SimpleNamespace(
+            id=i, name=f"S{i}", type=asset_type, symbol=f"S{i}", currency="TWD", quantity=random.uniform(1, 5000),
+            cost=random.uniform(1, 900), leverage=1.0, contract_size=50.0, margin=random.uniform(1000, 100000),
+        ))
+        prices[(f"S{i}", "TW_STOCK" if asset_type == "TW_FUTURE" else asset_type)] = random.uniform(1, 1200)
+    return assets, QuoteSnapshot(usd_rate=31.7, prices=prices)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,10000,100000")
+    parser.add_argument("--scenarios", type=int, default=1000)
+    args = parser.parse_args()
+
+    random.seed(0)
+    print(f"{'assets':>7} {'calculate_net_worth (s)':>24} {'kernel (s)':>11} {f'{args.scenarios} scenarios (s)':>18}")
+    for n in [int(x) for x in args.sizes.split(",")]:
+        assets, quotes = make_portfolio(n)
+        engine = SimpleNamespace(snapshot=lambda keys: quotes)
+        full = timed(lambda: services.calculate_net_worth(assets, quote_engine=engine))
+
+        arrays = load_arrays(assets)
+        keys = [services.quote_key(a) for a in assets]
+        prices = np.array([quotes.price(*k) if k else 0.0 for k in keys])
+        kernel = timed(lambda: value_portfolio(arrays, prices, quotes.usd_rate))
+
+        scenarios = "-"
+        if n * args.scenarios <= 20_000_000:
+            shocks = np.random.default_rng(0).normal(1.0, 0.05, size=(args.scenarios, 1))
+            scenarios = f"{timed(lambda: value_portfolio(arrays, prices * shocks, quotes.usd_rate)):.3f}"
+        print(f"{n:>7} {full:>24.3f} {kernel:>11.4f} {scenarios:>18}")
+
+
+if __name__ == "__main__":
+    main()
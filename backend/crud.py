@@ -1,5 +1,6 @@
+from sqlalchemy import func, select, or_
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import lots, models, schemas, rollups, versions
 
 def get_assets(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Asset).offset(skip).limit(limit).all()
@@ -7,6 +8,7 @@ def get_assets(db: Session, skip: int = 0, limit: int = 100):
 def create_asset(db: Session, asset: schemas.AssetCreate):
     db_asset = models.Asset(**asset.dict())
     db.add(db_asset)
+    versions.bump(db, versions.ASSETS)
     db.commit()
     db.refresh(db_asset)
     return db_asset
@@ -15,6 +17,7 @@ def delete_asset(db: Session, asset_id: int):
     db_asset = db.query(models.Asset).filter(models.Asset.id == asset_id).first()
     if db_asset:
         db.delete(db_asset)
+        versions.bump(db, versions.ASSETS)
         db.commit()
         return True
     return False
@@ -24,17 +27,65 @@ def update_asset(db: Session, asset_id: int, asset: schemas.AssetCreate):
     if db_asset:
         for key, value in asset.dict().items():
             setattr(db_asset, key, value)
+        versions.bump(db, versions.ASSETS)
         db.commit()
         db.refresh(db_asset)
         return db_asset
     return None
 
-def get_net_worth_history(db: Session, skip: int = 0, limit: int = 30):
-    return db.query(models.NetWorthHistory).order_by(models.NetWorthHistory.date.desc()).offset(skip).limit(limit).all()
+def get_net_worth_history(db: Session, skip: int = 0, limit: int = 30, breakdown: bool = False):
+    """
+    Daily totals, newest first. Per-asset rows are not loaded; with `breakdown` each day also
+    gets `by_class` (TWD value per asset type), aggregated in SQL.
+    """
+    history = models.NetWorthHistory
+    rows = [
+        row._asdict() for row in
+        db.query(history.id, history.date, history.total_twd, history.total_usd)
+        .order_by(history.date.desc()).offset(skip).limit(limit)
+    ]
+    if breakdown and rows:
+        item = models.NetWorthHistoryItem
+        by_date = {row["date"]: row for row in rows}
+        for row in rows:
+            row["by_class"] = {}
+        sums = (
+            db.query(item.date, item.type, func.sum(item.value_twd))
+            .filter(item.date.between(rows[-1]["date"], rows[0]["date"]))
+            .group_by(item.date, item.type)
+        )
+        for day, asset_type, value in sums:
+            if day in by_date:
+                by_date[day]["by_class"][asset_type] = value
+    return rows
+
+def get_net_worth_details(db: Session, day):
+    return db.query(models.NetWorthHistoryItem).filter(models.NetWorthHistoryItem.date == day).order_by(models.NetWorthHistoryItem.asset_id).all()
 
-def create_net_worth_history(db: Session, history: schemas.NetWorthHistoryBase):
-    db_history = models.NetWorthHistory(**history.dict())
+def save_net_worth_items(db: Session, day, details):
+    """
+    Replaces the per-asset rows of one day with the asset list from calculate_net_worth (no commit).
+    """
+    db.query(models.NetWorthHistoryItem).filter(models.NetWorthHistoryItem.date == day).delete()
+    db.add_all(
+        models.NetWorthHistoryItem(
+            date=day,
+            asset_id=item["id"],
+            symbol=item.get("symbol"),
+            type=item["type"],
+            quantity=item.get("quantity"),
+            price=item.get("current_price"),
+            value_twd=item.get("value_twd") or 0.0,
+            exposure=item.get("notional_value"),
+        )
+        for item in details
+    )
+
+def create_net_worth_history(db: Session, history: schemas.NetWorthHistoryCreate):
+    db_history = models.NetWorthHistory(**history.dict(exclude={"details"}))
     db.add(db_history)
+    save_net_worth_items(db, history.date, history.details)
+    versions.bump(db, versions.NET_WORTH_HISTORY)
     db.commit()
     db.refresh(db_history)
     return db_history
@@ -44,45 +95,98 @@ def get_realized_pnl(db: Session, skip: int = 0, limit: int = 100):
 
 def create_realized_pnl(db: Session, pnl: schemas.RealizedPnLCreate):
     db_pnl = models.RealizedProfitLoss(**pnl.dict())
-    db.add(db_pnl)
+    # A manual row replaces the lot-matched PnL of that symbol and day (see lots.apply_trade)
+    if lots.drop_matched_pnl(db, pnl.date, pnl.symbol):
+        db.add(db_pnl)
+        db.flush()
+        rollups.rebuild_symbol_pnl(db, pnl.symbol)
+    else:
+        db.add(db_pnl)
+        rollups.add_realized_pnl(db, pnl.date, pnl.symbol, pnl.pnl)
+    versions.bump(db, versions.REALIZED_PNL)
     db.commit()
     db.refresh(db_pnl)
     return db_pnl
 
-from sqlalchemy import func
+def get_cumulative_pnl(db: Session, start=None, end=None, after=None, limit=None, grain="day"):
+    """
+    Realized PnL per period (`grain`: day, week or month) with its running total, read
+    from the pnl_rollup table: GROUP BY period for the sum over symbols and
+    SUM() OVER (ORDER BY period) for the running total. Rows are returned as an iterator of
+    dicts ordered by date (the period start); `daily_pnl` is the PnL of that period.
 
-def get_cumulative_pnl(db: Session):
-    # Returns list of (date, daily_pnl, cumulative_pnl)
-    # SQLite doesn't support window functions easily in older versions or via simple ORM without subqueries sometimes.
-    # But let's try to do it in Python for simplicity if dataset is small, or use window function if supported.
-    # Let's fetch all and compute in python for now to be safe and simple.
-    results = db.query(models.RealizedProfitLoss).order_by(models.RealizedProfitLoss.date).all()
-    
-    cumulative_data = []
-    running_total = 0.0
-    
-    # Group by date first
-    daily_pnl = {}
-    for row in results:
-        if row.date not in daily_pnl:
-            daily_pnl[row.date] = 0.0
-        daily_pnl[row.date] += row.pnl
-        
-    sorted_dates = sorted(daily_pnl.keys())
-    for d in sorted_dates:
-        pnl = daily_pnl[d]
-        running_total += pnl
-        cumulative_data.append({
-            "date": d,
-            "daily_pnl": pnl,
-            "cumulative_pnl": running_total
-        })
-        
-    return cumulative_data
+    Keyset pagination: pass the last date of the previous page as `after`. Only the requested
+    periods are aggregated; everything before them is folded into one opening-balance sum,
+    so a page costs the same whatever the length of the account's history.
+    """
+    rollup = models.PnlRollup
+    filters = [rollup.grain == grain]
+    before = []
+    if start is not None:
+        filters.append(rollup.period_start >= start)
+        before.append(rollup.period_start < start)
+    if after is not None:
+        filters.append(rollup.period_start > after)
+        before.append(rollup.period_start <= after)
+    if end is not None:
+        filters.append(rollup.period_start <= end)
+
+    if before:
+        opening = (
+            select(func.coalesce(func.sum(rollup.pnl), 0.0))
+            .where(rollup.grain == grain, or_(*before))
+            .scalar_subquery()
+        )
+    else:
+        opening = 0.0
+
+    periods = (
+        select(rollup.period_start.label("date"), func.sum(rollup.pnl).label("daily_pnl"))
+        .where(*filters)
+        .group_by(rollup.period_start)
+        .order_by(rollup.period_start)
+    )
+    if limit is not None:
+        periods = periods.limit(limit)
+    periods = periods.subquery()
+
+    stmt = select(
+        periods.c.date,
+        periods.c.daily_pnl,
+        (opening + func.sum(periods.c.daily_pnl).over(order_by=periods.c.date)).label("cumulative_pnl"),
+    ).order_by(periods.c.date)
+
+    return (row._asdict() for row in db.execute(stmt))
+
+def get_net_worth_rollup(db: Session, grain: str = "day", start=None, end=None):
+    """
+    Net worth per period and asset class (values of the period's latest snapshot).
+    """
+    rollup = models.NetWorthRollup
+    query = db.query(rollup).filter(rollup.grain == grain)
+    if start is not None:
+        query = query.filter(rollup.period_start >= start)
+    if end is not None:
+        query = query.filter(rollup.period_start <= end)
+
+    periods = {}
+    for row in query.order_by(rollup.period_start, rollup.asset_class):
+        period = periods.setdefault(row.period_start, {"date": row.period_start, "as_of": row.as_of, "total_twd": 0.0, "by_class": {}})
+        period["by_class"][row.asset_class] = row.value_twd
+        period["total_twd"] += row.value_twd
+    return list(periods.values())
 
 def create_future_transaction(db: Session, transaction: schemas.TransactionCreate):
-    # 1. Record the transaction
+    # 1. Record the transaction (numbered after identical trades, see Transaction.occurrence)
     db_transaction = models.Transaction(**transaction.dict())
+    db_transaction.occurrence = db.query(models.Transaction).filter(
+        models.Transaction.date == transaction.date,
+        models.Transaction.symbol == transaction.symbol,
+        models.Transaction.action == transaction.action,
+        models.Transaction.quantity == transaction.quantity,
+        models.Transaction.price == transaction.price,
+        models.Transaction.asset_type == transaction.asset_type
+    ).count()
     db.add(db_transaction)
     
     # 2. Update or Create Asset
@@ -135,6 +239,7 @@ def create_future_transaction(db: Session, transaction: schemas.TransactionCreat
         )
         db.add(new_asset)
     
+    versions.bump(db, versions.TRANSACTIONS, versions.ASSETS)
     db.commit()
     db.refresh(db_transaction)
     return db_transaction
@@ -1,15 +1,69 @@
-from sqlalchemy import create_engine
+from dataclasses import dataclass
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, StaticPool
 
 import os
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-SQLALCHEMY_DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'finance.db')}"
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+SQLALCHEMY_DATABASE_URL = os.environ.get(
+    "FINANCE_DATABASE_URL", f"sqlite:///{os.path.join(BASE_DIR, 'finance.db')}"
 )
+
+@dataclass
+class EngineProfile:
+    """
+    SQLite settings applied to every new connection, plus connection pool sizing.
+    """
+    journal_mode: str = "WAL" # Readers don't block the writer (scheduler, imports, dashboard)
+    synchronous: str = "NORMAL" # Safe with WAL, fsync only at checkpoints
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size_kib: int = 64 * 1024
+    busy_timeout_ms: int = 5000 # Wait for the write lock instead of failing with "database is locked"
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+
+PROFILES = {
+    "tuned": EngineProfile(),
+    # SQLite defaults (rollback journal), for comparison or file systems without WAL support
+    "safe": EngineProfile(journal_mode="DELETE", synchronous="FULL", mmap_size=0, cache_size_kib=2000),
+}
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: EngineProfile = PROFILES["tuned"]) -> Engine:
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        # An in-memory database only exists inside a single connection
+        pool_args = {"poolclass": StaticPool}
+    else:
+        pool_args = {
+            "poolclass": QueuePool,
+            "pool_size": profile.pool_size,
+            "max_overflow": profile.max_overflow,
+            "pool_timeout": profile.pool_timeout,
+            "pool_pre_ping": True,
+        }
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": profile.busy_timeout_ms / 1000},
+        **pool_args,
+    )
+
+    @event.listens_for(engine, "connect")
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={profile.journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={profile.synchronous}")
+        cursor.execute(f"PRAGMA mmap_size={profile.mmap_size}")
+        cursor.execute(f"PRAGMA cache_size=-{profile.cache_size_kib}") # Negative value = KiB
+        cursor.execute(f"PRAGMA busy_timeout={profile.busy_timeout_ms}")
+        cursor.close()
+
+    return engine
+
+engine = create_db_engine(profile=PROFILES[os.environ.get("FINANCE_DB_PROFILE", "tuned")])
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -1,5 +1,5 @@
-from .base import BaseImporter, TransactionDTO
+from .base import BaseImporter, TransactionDTO, CsvSource
 from .strategies import TwBrokerStrategy
-from .processor import TransactionProcessor
+from .processor import TransactionProcessor, ImportResult
 
-__all__ = ['BaseImporter', 'TransactionDTO', 'TwBrokerStrategy', 'TransactionProcessor']
+__all__ = ['BaseImporter', 'TransactionDTO', 'CsvSource', 'TwBrokerStrategy', 'TransactionProcessor', 'ImportResult']
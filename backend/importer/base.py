@@ -1,6 +1,10 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from typing import List, Optional, Any
+from typing import BinaryIO, Iterator, List, Optional, Any, Tuple, Union
+from contextlib import contextmanager
+import codecs
+import os
+import numpy as np
 import pandas as pd
 from datetime import date
 
@@ -18,30 +22,103 @@ class TransactionDTO:
     tax: float = 0.0
     assigned_margin: float = 0.0
 
+# Attempt to read with different encodings if standard utf-8 fails
+ENCODINGS = ['utf-8', 'big5'] # big5 is common for TW brokers
+ENCODING_SAMPLE_BYTES = 64 * 1024
+DEFAULT_CHUNK_SIZE = 10000
+
+# A file path, or a seekable binary stream such as an upload's spooled file
+CsvSource = Union[str, os.PathLike, BinaryIO]
+
+@contextmanager
+def open_binary(source: CsvSource):
+    """
+    Yields a binary handle for `source`. Streams are rewound afterwards so the
+    next reader starts from the beginning; paths are opened and closed.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield f
+    else:
+        source.seek(0)
+        try:
+            yield source
+        finally:
+            source.seek(0)
+
+DTO_FIELDS = [
+    "date", "asset_type", "symbol", "action", "price", "quantity",
+    "contract_month", "multiplier", "fee", "tax", "assigned_margin",
+]
+
 class BaseImporter(ABC):
     """
     Abstract Base Class for Broker Importers using Template Method Pattern.
     """
 
-    def parse(self, file_path: str) -> List[TransactionDTO]:
+    def parse(self, file_path: CsvSource) -> List[TransactionDTO]:
         """
         Template method defining the algorithm structure.
         """
         df = self._read_file(file_path)
+        return self._process_frame(df)
+
+    def iter_batches(self, file_path: CsvSource, chunksize: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[TransactionDTO]]:
+        """
+        Streaming variant of parse: reads the file `chunksize` rows at a time and yields one
+        DTO batch per chunk, so memory stays bounded regardless of file size.
+        """
+        for df in self._read_chunks(file_path, chunksize):
+            transactions = self._process_frame(df)
+            if transactions:
+                yield transactions
+
+    def _process_frame(self, df: pd.DataFrame) -> List[TransactionDTO]:
         df = self._clean_headers(df)
         raw_data = self._extract_data(df)
         transactions = self._standardize(raw_data)
         return transactions
 
-    def _read_file(self, file_path: str) -> pd.DataFrame:
+    def _read_file(self, file_path: CsvSource) -> pd.DataFrame:
         """
-        Reads CSV or Excel file. Default implementation for CSV.
+        Reads the whole CSV file.
         """
-        # Attempt to read with different encodings if standard utf-8 fails
-        try:
-            return pd.read_csv(file_path, encoding='utf-8')
-        except UnicodeDecodeError:
-            return pd.read_csv(file_path, encoding='big5') # Common for TW brokers
+        encoding = self._detect_encoding(file_path)
+        options = self._csv_options(file_path, encoding)
+        with open_binary(file_path) as f:
+            return pd.read_csv(f, encoding=encoding, **options)
+
+    def _read_chunks(self, file_path: CsvSource, chunksize: int) -> Iterator[pd.DataFrame]:
+        """
+        Reads the CSV file as an iterator of DataFrames of `chunksize` rows.
+        """
+        encoding = self._detect_encoding(file_path)
+        options = self._csv_options(file_path, encoding)
+        with open_binary(file_path) as f:
+            with pd.read_csv(f, encoding=encoding, chunksize=chunksize, **options) as reader:
+                yield from reader
+
+    def _csv_options(self, file_path: CsvSource, encoding: str) -> dict:
+        """
+        Extra pd.read_csv keyword arguments (e.g. skiprows). Override in subclasses.
+        """
+        return {}
+
+    def _detect_encoding(self, file_path: CsvSource) -> str:
+        """
+        Picks the first supported encoding that decodes a prefix sample of the file,
+        instead of attempting a full read per encoding.
+        """
+        with open_binary(file_path) as f:
+            sample = f.read(ENCODING_SAMPLE_BYTES)
+        for encoding in ENCODINGS:
+            try:
+                # Incremental decoder: a multi-byte character cut at the end of the sample is not an error
+                codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+        raise ValueError("Could not decode CSV file with supported encodings.")
 
     def _clean_headers(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -51,15 +128,77 @@ class BaseImporter(ABC):
         return df
 
     @abstractmethod
-    def _extract_data(self, df: pd.DataFrame) -> List[Any]:
+    def _extract_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Extract raw data from DataFrame. To be implemented by subclasses.
         """
         pass
 
     @abstractmethod
-    def _standardize(self, raw_data: List[Any]) -> List[TransactionDTO]:
+    def _standardize(self, raw_data: pd.DataFrame) -> List[TransactionDTO]:
         """
         Convert raw data to TransactionDTO list. To be implemented by subclasses.
+        Implementations work column-wise (see the helpers below) rather than row by row.
         """
         pass
+
+    # Column-wise helpers for _standardize.
+    # Broker exports repeat the same dates, names and amounts, so string parsing runs once
+    # per distinct value (pd.factorize) and the results are broadcast back to every row.
+
+    @staticmethod
+    def _per_unique(col: pd.Series, parse) -> pd.Series:
+        """
+        Applies a vectorized `parse` to the distinct non-null values of `col`; nulls stay NaN.
+        """
+        codes, uniques = pd.factorize(col)
+        parsed = parse(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+        values = np.append(parsed, np.nan)  # code -1 (null) picks the trailing NaN
+        return pd.Series(values[codes], index=col.index, dtype=object)
+
+    @classmethod
+    def _text(cls, df: pd.DataFrame, column: str) -> pd.Series:
+        """
+        Stripped string column; missing cells (and missing columns) become NaN.
+        """
+        if column not in df.columns:
+            return pd.Series(np.nan, index=df.index, dtype=object)
+        return cls._per_unique(df[column], lambda u: u.astype(str).str.strip())
+
+    @classmethod
+    def _dates(cls, df: pd.DataFrame, column: str, fmt: str = "%Y/%m/%d") -> pd.Series:
+        """
+        Parses a date column; unparseable cells become NaT.
+        """
+        if column not in df.columns:
+            return pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+        parsed = cls._per_unique(
+            df[column],
+            lambda u: pd.to_datetime(u.astype(str).str.strip(), format=fmt, errors="coerce"),
+        )
+        return pd.to_datetime(parsed)
+
+    @classmethod
+    def _numbers(cls, df: pd.DataFrame, column: str) -> Tuple[pd.Series, pd.Series]:
+        """
+        Parses a numeric column that may contain thousands separators.
+        Returns (values, invalid) where `invalid` marks non-empty cells that are not numbers.
+        """
+        if column not in df.columns:
+            return pd.Series(np.nan, index=df.index, dtype=float), pd.Series(True, index=df.index)
+        col = df[column]
+        if pd.api.types.is_numeric_dtype(col):
+            return col.astype(float), pd.Series(False, index=df.index)
+        values = cls._per_unique(
+            col,
+            lambda u: pd.to_numeric(u.astype(str).str.strip().str.replace(",", "", regex=False), errors="coerce"),
+        ).astype(float)
+        return values, values.isna() & col.notna()
+
+    @staticmethod
+    def _to_dtos(frame: pd.DataFrame) -> List[TransactionDTO]:
+        """
+        Builds DTOs from a frame whose columns are TransactionDTO field names, in one pass.
+        """
+        columns = [frame[name].tolist() for name in DTO_FIELDS]
+        return list(map(TransactionDTO, *columns))
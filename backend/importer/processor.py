@@ -1,9 +1,22 @@
-from typing import List
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import exists, and_
-from backend.models import Transaction, Asset
+from sqlalchemy import select, insert
+from backend import versions
+from backend.models import Transaction
 from .base import TransactionDTO
 
+# Columns that identify a transaction for idempotency: date, symbol, action, quantity, price, asset_type
+NATURAL_KEY = ("date", "symbol", "action", "quantity", "price", "asset_type")
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    skipped: int = 0
+
+
 class TransactionProcessor:
     """
     Handles business logic for processing and inserting transactions.
@@ -11,56 +24,110 @@ class TransactionProcessor:
 
     def process_transactions(self, transactions: List[TransactionDTO], db_session: Session) -> int:
         """
-        Iterates through transactions and inserts valid ones into the database.
+        Inserts the transactions that are not already in the database.
         Returns the count of inserted transactions.
         """
-        inserted_count = 0
-        for dto in transactions:
-            if self._is_duplicate(dto, db_session):
-                continue
-
-            # Create Transaction ORM object
-            txn = Transaction(
-                date=dto.date,
-                asset_type=dto.asset_type,
-                symbol=dto.symbol,
-                action=dto.action,
-                price=dto.price,
-                quantity=dto.quantity,
-                contract_month=dto.contract_month,
-                multiplier=dto.multiplier,
-                fee=dto.fee,
-                tax=dto.tax,
-                assigned_margin=dto.assigned_margin
-            )
-            
-            db_session.add(txn)
-            inserted_count += 1
-            
-            # Note: Asset position updates (FIFO/Avg Cost) are explicitly excluded 
+        return self.import_transactions(transactions, db_session).inserted
+
+    def import_transactions(
+        self,
+        transactions: List[TransactionDTO],
+        db_session: Session,
+        seen_keys: Optional[Counter] = None,
+    ) -> ImportResult:
+        """
+        Set-based import: existing natural keys for the file's date range are loaded in one
+        query, and new rows are written with a single executemany INSERT.
+
+        Keys are compared as a multiset, so two identical trades on the same day are both
+        kept on the first import and both skipped when the file is imported again.
+        `seen_keys` counts the keys of earlier batches of the same file (see import_batches):
+        the stored rows they inserted or matched are not available to this batch.
+        """
+        result = ImportResult()
+        if transactions:
+            stored = self._existing_keys(transactions, db_session)
+            existing = stored - seen_keys if seen_keys else stored.copy()
+
+            rows = []
+            for dto in transactions:
+                key = self._natural_key(dto)
+                if seen_keys is not None:
+                    seen_keys[key] += 1
+                if existing[key] > 0:
+                    existing[key] -= 1
+                    result.skipped += 1
+                    continue
+                row = self._to_row(dto)
+                # Stored copies of a key are numbered 0..n-1 (see Transaction.occurrence)
+                row["occurrence"] = stored[key]
+                stored[key] += 1
+                rows.append(row)
+
+            if rows:
+                db_session.execute(insert(Transaction), rows)
+                versions.bump(db_session, versions.TRANSACTIONS)
+            result.inserted = len(rows)
+
+            # Note: Asset position updates (FIFO/Avg Cost) are explicitly excluded
             # from this task as per requirements.
 
         db_session.commit()
-        return inserted_count
+        return result
+
+    def import_batches(
+        self,
+        batches: Iterable[List[TransactionDTO]],
+        db_session: Session,
+        on_batch: Optional[Callable[[int, ImportResult], None]] = None,
+    ) -> ImportResult:
+        """
+        Imports a stream of DTO batches (see BaseImporter.iter_batches), committing once per
+        batch so only one batch is held in memory. `on_batch(rows_parsed, result)` is called
+        after every commit with the running totals.
+        """
+        total = ImportResult()
+        seen_keys: Counter = Counter()
+        rows_parsed = 0
+        for batch in batches:
+            rows_parsed += len(batch)
+            result = self.import_transactions(batch, db_session, seen_keys)
+            total.inserted += result.inserted
+            total.skipped += result.skipped
+            if on_batch is not None:
+                on_batch(rows_parsed, total)
+        return total
 
-    def _is_duplicate(self, dto: TransactionDTO, session: Session) -> bool:
+    def _existing_keys(self, transactions: List[TransactionDTO], session: Session) -> Counter:
         """
-        Checks if a transaction already exists in the database.
-        Idempotency check based on: date, symbol, action, quantity, price.
+        Counts natural keys already stored between the earliest and latest date of the batch.
+        The date range is served from the unique natural-key index alone (covering index).
         """
-        # We assume that if a transaction with the exact same details exists, it is a duplicate.
-        # This might be partially risky if a user does two identical trades on the same day,
-        # but for now, it adheres to the requirement.
-        
-        stmt = exists().where(
-            and_(
-                Transaction.date == dto.date,
-                Transaction.symbol == dto.symbol,
-                Transaction.action == dto.action,
-                Transaction.quantity == dto.quantity,
-                Transaction.price == dto.price,
-                Transaction.asset_type == dto.asset_type
-                # We could add fee/tax check if needed, but primary keys are usually date+symbol+action+price+qty
-            )
-        )
-        return session.query(stmt).scalar()
+        dates = [dto.date for dto in transactions]
+        stmt = self._existing_keys_statement(min(dates), max(dates))
+        return Counter(tuple(row) for row in session.execute(stmt))
+
+    @staticmethod
+    def _existing_keys_statement(start, end):
+        columns = [getattr(Transaction, name) for name in NATURAL_KEY]
+        return select(*columns).where(Transaction.date.between(start, end))
+
+    @staticmethod
+    def _natural_key(dto: TransactionDTO) -> Tuple:
+        return tuple(getattr(dto, name) for name in NATURAL_KEY)
+
+    @staticmethod
+    def _to_row(dto: TransactionDTO) -> dict:
+        return {
+            "date": dto.date,
+            "asset_type": dto.asset_type,
+            "symbol": dto.symbol,
+            "action": dto.action,
+            "price": dto.price,
+            "quantity": dto.quantity,
+            "contract_month": dto.contract_month,
+            "multiplier": dto.multiplier,
+            "fee": dto.fee,
+            "tax": dto.tax,
+            "assigned_margin": dto.assigned_margin,
+        }
@@ -1,123 +1,83 @@
 from typing import List
 import pandas as pd
-import re
-from datetime import datetime
-from .base import BaseImporter, TransactionDTO
+from datetime import date
+from .base import BaseImporter, TransactionDTO, CsvSource, open_binary
+
+US_ACTIONS = {
+    "買進": "BUY",
+    "賣出": "SELL",
+}
 
 class UsBrokerStrategy(BaseImporter):
     """
     Concrete Strategy for parsing US Broker CSV files.
     """
 
-    def _read_file(self, file_path: str) -> pd.DataFrame:
+    # Start matching the required date bounds (2025/11/30 to 2026/02/20)
+    start_date = date(2025, 11, 30)
+    end_date = date(2026, 2, 20)
+
+    def _csv_options(self, file_path: CsvSource, encoding: str) -> dict:
         """
-        Overrides BaseImporter to read only the transaction details section.
+        Skips ahead to the transaction details section.
         """
-        encodings = ['utf-8', 'big5']
-        
-        for enc in encodings:
-            try:
-                # Read line by line to find the transaction headers row
-                with open(file_path, 'r', encoding=enc) as f:
-                    lines = f.readlines()
-                
-                start_idx = 0
-                for idx, line in enumerate(lines):
-                    if '交易日期' in line and '商品代號' in line and '交易種類' in line:
-                        start_idx = idx
-                        break
-                
-                # Now use pandas to read from that starting line
-                import io
-                csv_data = "".join(lines[start_idx:])
-                return pd.read_csv(io.StringIO(csv_data))
-                
-            except UnicodeDecodeError:
-                continue
-                
-        raise ValueError("Could not decode CSV file with supported encodings.")
-
-    def _extract_data(self, df: pd.DataFrame) -> List[dict]:
+        # Read line by line (stopping early) to find the transaction headers row
+        start_idx = 0
+        with open_binary(file_path) as f:
+            for idx, raw_line in enumerate(f):
+                line = raw_line.decode(encoding, errors='replace')
+                if '交易日期' in line and '商品代號' in line and '交易種類' in line:
+                    start_idx = idx
+                    break
+        return {"skiprows": start_idx}
 
+    def _extract_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """
-        Extracts relevant rows and converts to a list of dictionaries.
+        Returns the DataFrame as-is; _standardize works on whole columns.
         """
-        records = df.to_dict('records')
-        return records
+        return df
 
-    def _standardize(self, raw_data: List[dict]) -> List[TransactionDTO]:
+    def _standardize(self, raw_data: pd.DataFrame) -> List[TransactionDTO]:
         """
-        Maps raw dictionary data to TransactionDTO.
+        Maps raw columns to TransactionDTO, column-wise.
         """
-        transactions = []
-        
-        # Start matching the required date bounds (2025/11/30 to 2026/02/20)
-        start_date = datetime(2025, 11, 30).date()
-        end_date = datetime(2026, 2, 20).date()
+        df = raw_data
+
+        # Parse Date
+        # Empty cells, header rows inside the CSV or footers become NaT and are skipped
+        dates = self._dates(df, '交易日期')
+
+        # Filter date range
+        in_range = (dates >= pd.Timestamp(self.start_date)) & (dates <= pd.Timestamp(self.end_date))
+
+        # Parse Action
+        # we will skip "除息" (dividends) or other non-trade actions for now as the schema supports BUY/SELL
+        actions = self._text(df, '交易種類').map(US_ACTIONS)
 
-        for row in raw_data:
-            def get_val(key):
-                val = row.get(key)
-                if isinstance(val, str):
-                    return val.strip()
-                return val
+        # Parse Symbol
+        symbols = self._text(df, '商品代號')
+        has_symbol = symbols.notna() & (symbols != '') & (symbols != '商品代號')
 
-            # Parse Date
-            date_str = get_val('交易日期')
-            # If not found or empty, it could be a header row inside the CSV or footer
-            if not date_str or not isinstance(date_str, str):
-                continue
-                
-            try:
-                txn_date = datetime.strptime(date_str, "%Y/%m/%d").date()
-            except (ValueError, TypeError):
-                # Try another layout, if it fails then skip
-                continue
-                
-            # Filter date range
-            if not (start_date <= txn_date <= end_date):
-                continue
+        # Parse Numeric Fields
+        quantity, bad_qty = self._numbers(df, '股數')
+        price, bad_price = self._numbers(df, '價格')
+        fee, bad_fee = self._numbers(df, '手續費')
+        # For US stocks there might be no tax field, or '其他費用' serves as fee/tax
+        other_fee, bad_other = self._numbers(df, '其他費用')
 
-            # Parse Action
-            raw_action = str(get_val('交易種類')).strip()
-            action = "UNKNOWN"
-            if raw_action == "買進":
-                action = "BUY"
-            elif raw_action == "賣出":
-                action = "SELL"
-            # we will skip "除息" (dividends) or other non-trade actions for now as the schema supports BUY/SELL
-            else:
-                continue
-                
-            # Parse Symbol
-            symbol = get_val('商品代號')
-            if not symbol or symbol == '商品代號':
-                continue
-            
-            # Parse Numeric Fields
-            try: 
-                quantity = float(str(get_val('股數')).replace(',', ''))
-                price = float(str(get_val('價格')).replace(',', ''))
-                fee = float(str(get_val('手續費')).replace(',', ''))
-                # For US stocks there might be no tax field, or '其他費用' serves as fee/tax
-                other_fee = float(str(get_val('其他費用')).replace(',', ''))
-                total_fee = fee + other_fee
-            except (ValueError, AttributeError, TypeError):
-                continue
+        valid = in_range & actions.notna() & has_symbol & ~(bad_qty | bad_price | bad_fee | bad_other)
 
-            dto = TransactionDTO(
-                date=txn_date,
-                asset_type="US_STOCK", # Marked as US stock
-                symbol=symbol,
-                action=action,
-                price=price,
-                quantity=quantity,
-                contract_month=None,
-                multiplier=1.0, # 1 for US stocks
-                fee=total_fee,
-                tax=0.0,
-                assigned_margin=0.0
-            )
-            transactions.append(dto)
-            
-        return transactions
+        frame = pd.DataFrame({
+            "date": dates.dt.date,
+            "asset_type": "US_STOCK", # Marked as US stock
+            "symbol": symbols,
+            "action": actions,
+            "price": price,
+            "quantity": quantity,
+            "contract_month": None,
+            "multiplier": 1.0, # 1 for US stocks
+            "fee": fee + other_fee,
+            "tax": 0.0,
+            "assigned_margin": 0.0,
+        })[valid]
+        return self._to_dtos(frame)
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+import logging
+import threading
+import time
+import uuid
+
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ImportJob:
+    """
+    Progress of one background import. Phases: queued -> importing -> updating_assets -> done | failed.
+    """
+    id: str
+    filename: Optional[str] = None
+    strategy: Optional[str] = None
+    phase: str = "queued"
+    rows_parsed: int = 0
+    rows_inserted: int = 0
+    rows_skipped: int = 0
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        start = self.started_at or self.created_at
+        end = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "filename": self.filename,
+            "strategy": self.strategy,
+            "phase": self.phase,
+            "rows_parsed": self.rows_parsed,
+            "rows_inserted": self.rows_inserted,
+            "rows_skipped": self.rows_skipped,
+            "error": self.error,
+            "elapsed_seconds": round(end - start, 3),
+        }
+
+
+class JobQueue:
+    """
+    In-process queue for imports.
+
+    Jobs run on a bounded thread pool, each with its own session from `session_factory`.
+    Jobs targeting the same database hold a per-database lock, so imports run one at a
+    time per database and never fight over the SQLite write lock.
+    Only the most recent `max_jobs_kept` jobs are remembered.
+    """
+
+    def __init__(self, session_factory: Callable[[], Session], max_workers: int = 2, max_jobs_kept: int = 100):
+        self.session_factory = session_factory
+        self.max_jobs_kept = max_jobs_kept
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="import-job")
+        self._jobs: "OrderedDict[str, ImportJob]" = OrderedDict()
+        self._db_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, work: Callable[[ImportJob, Session], None], **job_fields) -> ImportJob:
+        """
+        Queues `work(job, session)` and returns its job immediately.
+        `work` reports progress by updating the job's fields.
+        """
+        job = ImportJob(id=uuid.uuid4().hex, **job_fields)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs_kept:
+                self._jobs.popitem(last=False)
+        self._executor.submit(self._run, job, work)
+        return job
+
+    def get(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _db_lock(self, db: Session) -> threading.Lock:
+        key = str(db.get_bind().url)
+        with self._lock:
+            return self._db_locks.setdefault(key, threading.Lock())
+
+    def _run(self, job: ImportJob, work: Callable[[ImportJob, Session], None]) -> None:
+        db = self.session_factory()
+        try:
+            with self._db_lock(db):
+                job.started_at = time.time()
+                job.phase = "importing"
+                work(job, db)
+                job.phase = "done"
+        except Exception as e:
+            logger.error(f"Import job {job.id} failed: {e}")
+            db.rollback()
+            job.phase = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            db.close()
@@ -0,0 +1,69 @@
+"""
+Cross-process leases for scheduled work.
+
+Every uvicorn worker (and the reloader's child) starts its own BackgroundScheduler, so each
+scheduled job fires once per process. A job guarded by a LeaderLease only runs in the
+process that holds the lease: a row of scheduler_leases in the shared SQLite database,
+taken with a single atomic upsert and kept until it expires.
+"""
+from typing import Callable, Optional
+import logging
+import os
+import socket
+import time
+import uuid
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .models import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+
+def process_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    """
+    Leadership over `name` for `ttl` seconds. acquire() succeeds when nobody holds the
+    lease, when it expired, or when this owner already holds it (which renews it).
+
+    A lease is not released after a run: workers whose scheduler fires the same job a bit
+    later find it held and skip it, instead of fetching the same quotes again.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        name: str,
+        ttl: float = 600.0,
+        owner: Optional[str] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.session_factory = session_factory
+        self.name = name
+        self.ttl = ttl
+        self.owner = owner or process_owner()
+        self.clock = clock
+
+    def acquire(self) -> bool:
+        now = self.clock()
+        stmt = insert(SchedulerLease).values(name=self.name, owner=self.owner, expires_at=now + self.ttl)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[SchedulerLease.name],
+            set_={"owner": stmt.excluded.owner, "expires_at": stmt.excluded.expires_at},
+            where=(SchedulerLease.owner == self.owner) | (SchedulerLease.expires_at <= now),
+        )
+        db = self.session_factory()
+        try:
+            db.execute(stmt)
+            # Read back inside the same write transaction: nobody can take it over in between
+            holder = db.query(SchedulerLease.owner).filter(SchedulerLease.name == self.name).scalar()
+            db.commit()
+        finally:
+            db.close()
+        if holder != self.owner:
+            logger.info(f"Skipping {self.name}: lease held by {holder}.")
+        return holder == self.owner
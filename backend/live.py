@@ -0,0 +1,185 @@
+"""
+Live net worth pushed to WebSocket subscribers (/ws/net-worth).
+
+One QuotePoller per process refreshes the quotes of every held symbol at a market-aware
+cadence and broadcasts what changed to all subscribers, so upstream traffic stays the same
+however many dashboards are open. It only polls while someone is subscribed.
+"""
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+import asyncio
+import logging
+import threading
+import time
+
+from sqlalchemy.orm import Session
+
+from . import crud, services
+from .markets import quote_market_open, utcnow
+from .pricing import FX_KEY, QuoteSnapshot
+from .pricing.engine import QuoteKey
+
+logger = logging.getLogger(__name__)
+
+
+class QuotePoller:
+    """
+    Background poller shared by all subscribers.
+
+    Every `tick` seconds it reloads the assets, fetches the quotes that are due (every
+    `open_interval` seconds while their market trades, every `closed_interval` seconds
+    otherwise) into services.price_cache, and revalues the portfolio from the cache.
+    Subscribers get the whole valuation once ("snapshot", also whenever the set of assets
+    changes), then only the rows that changed along with the new totals ("update").
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        open_interval: float = 30.0,
+        closed_interval: float = 900.0,
+        tick: float = 1.0,
+        now: Callable[[], datetime] = utcnow,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.session_factory = session_factory
+        self.open_interval = open_interval
+        self.closed_interval = closed_interval
+        self.tick = tick
+        self.now = now
+        self.clock = clock
+        self.state: Optional[dict] = None
+        self._subscribers: Dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+        self._polled_at: Dict[QuoteKey, float] = {}
+        self._failed: Set[QuoteKey] = set() # Keys whose latest refresh got no quote
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"polls": 0, "quotes_fetched": 0, "broadcasts": 0}
+
+    def subscribe(self, loop: asyncio.AbstractEventLoop) -> asyncio.Queue:
+        """
+        Registers a subscriber whose messages are delivered on `loop`, starting with the
+        current valuation when there is one. The poller thread is started separately (start).
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers[queue] = loop
+            if self.state is not None:
+                queue.put_nowait({"event": "snapshot", **self.state})
+            else:
+                self._wake.set()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="quote-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            with self._lock:
+                subscribed = bool(self._subscribers)
+            if subscribed:
+                try:
+                    self.poll_once()
+                except Exception as e:
+                    logger.error(f"Quote poll failed: {e}")
+            self._wake.wait(self.tick)
+            self._wake.clear()
+
+    def interval(self, key: QuoteKey, at: datetime) -> float:
+        return self.open_interval if quote_market_open(key[1], at) else self.closed_interval
+
+    def due(self, keys: List[QuoteKey]) -> List[QuoteKey]:
+        at, now = self.now(), self.clock()
+        return [
+            key for key in keys
+            if key not in self._polled_at or now - self._polled_at[key] >= self.interval(key, at)
+        ]
+
+    def poll_once(self) -> Optional[dict]:
+        """
+        One round: refresh the due quotes, revalue, broadcast. Returns the message sent, if any.
+        """
+        db = self.session_factory()
+        try:
+            assets = crud.get_assets(db)
+        finally:
+            db.close()
+        asset_keys = [services.quote_key(a) for a in assets]
+        held = list(dict.fromkeys(k for k in asset_keys if k is not None))
+
+        due = self.due(held + [FX_KEY])
+        if due:
+            self.refresh(due)
+
+        # Valued from the cache only: the poller is the one talking to upstream. Quotes whose
+        # latest refresh failed keep their last known value (0.0 if none) and are reported
+        # stale, as QuoteEngine does when upstream does not answer
+        cache = services.price_cache
+        with self._lock:
+            failed = set(self._failed)
+        quotes = QuoteSnapshot(
+            usd_rate=cache.last_known(FX_KEY) or 32.0,
+            prices={key: cache.last_known(key) or 0.0 for key in held},
+            stale={key for key in held + [FX_KEY] if key in failed},
+        )
+        return self._broadcast(services.value_net_worth(assets, asset_keys, quotes))
+
+    def refresh(self, keys: List[QuoteKey]) -> None:
+        stock_keys = [k for k in keys if k != FX_KEY]
+        prices = services.default_quote_engine().fetch_prices(stock_keys) if stock_keys else {}
+        if FX_KEY in keys:
+            prices[FX_KEY] = services.fetch_usd_to_twd_rate()
+        for key, price in prices.items():
+            services.price_cache.put(key, price)
+
+        # Failed quotes wait for their next turn too, so an outage is not hammered every tick
+        now = self.clock()
+        with self._lock:
+            self._polled_at.update((key, now) for key in keys)
+            for key in keys:
+                if prices.get(key):
+                    self._failed.discard(key)
+                else:
+                    self._failed.add(key)
+            self._stats["polls"] += 1
+            self._stats["quotes_fetched"] += len(keys)
+
+    def _broadcast(self, result: dict) -> Optional[dict]:
+        with self._lock:
+            previous, self.state = self.state, result
+            if previous is None or [d["id"] for d in previous["details"]] != [d["id"] for d in result["details"]]:
+                message = {"event": "snapshot", **result}
+            else:
+                changed = [d for d, before in zip(result["details"], previous["details"]) if d != before]
+                if not changed and (result["usd_rate"], result["stale_quotes"]) == (previous["usd_rate"], previous["stale_quotes"]):
+                    return None
+                message = {"event": "update", **result, "details": changed}
+
+            for queue, loop in list(self._subscribers.items()):
+                try:
+                    loop.call_soon_threadsafe(queue.put_nowait, message)
+                except RuntimeError: # Event loop closed without unsubscribing
+                    del self._subscribers[queue]
+            self._stats["broadcasts"] += 1
+        return message
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return dict(self._stats, subscribers=len(self._subscribers), quotes=len(self._polled_at))
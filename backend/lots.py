@@ -0,0 +1,230 @@
+from collections import deque
+from dataclasses import dataclass
+from datetime import date
+from typing import Deque, Iterable, Optional
+import logging
+import os
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from . import rollups
+from .models import OpenLot, RealizedProfitLoss, Transaction
+
+logger = logging.getLogger(__name__)
+
+FIFO = "FIFO"
+LIFO = "LIFO"
+AVERAGE = "AVERAGE"
+METHODS = (FIFO, LIFO, AVERAGE)
+
+# Realized PnL for US stocks has always been FIFO; other positions are matched at average
+# cost. FINANCE_LOT_METHOD overrides the method for every asset type. The method only decides
+# realized PnL: Assets.cost is the weighted average cost whatever the method (see positions.py).
+DEFAULT_METHODS = {"US_STOCK": FIFO}
+DEFAULT_METHOD = AVERAGE
+
+BUY_ACTIONS = ("BUY", "BUY_OPEN")
+SELL_ACTIONS = ("SELL", "SELL_CLOSE")
+
+# Quantities below this are float noise from partial fills
+EPSILON = 1e-9
+
+
+def method_override() -> Optional[str]:
+    """
+    The lot method set by FINANCE_LOT_METHOD, or None. An unknown method raises ValueError,
+    so a typo stops the server at startup instead of silently changing realized PnL.
+    """
+    override = os.environ.get("FINANCE_LOT_METHOD", "").strip()
+    if not override:
+        return None
+    if override.upper() not in METHODS:
+        raise ValueError(f"FINANCE_LOT_METHOD must be one of {', '.join(METHODS)}, not {override!r}")
+    return override.upper()
+
+
+# Read once at import
+METHOD_OVERRIDE = method_override()
+
+
+def method_for(asset_type: Optional[str]) -> str:
+    if METHOD_OVERRIDE:
+        return METHOD_OVERRIDE
+    return DEFAULT_METHODS.get(asset_type, DEFAULT_METHOD)
+
+
+@dataclass
+class Lot:
+    quantity: float
+    price: float
+    txn_id: Optional[int] = None
+    date: Optional[date] = None
+
+
+class LotBook:
+    """
+    Open lots of one symbol, oldest first, in a deque: FIFO sells consume from the left,
+    LIFO sells from the right, both in O(1) per lot. AVERAGE keeps a single lot at the
+    weighted average cost.
+    """
+
+    def __init__(self, method: str = FIFO, lots: Iterable[Lot] = ()):
+        if method not in METHODS:
+            raise ValueError(f"Unknown lot method: {method}")
+        self.method = method
+        self.lots: Deque[Lot] = deque(lots)
+
+    @property
+    def quantity(self) -> float:
+        return sum(lot.quantity for lot in self.lots)
+
+    @property
+    def average_cost(self) -> float:
+        quantity = self.quantity
+        if quantity <= EPSILON:
+            return 0.0
+        return sum(lot.quantity * lot.price for lot in self.lots) / quantity
+
+    def buy(self, quantity: float, price: float, txn_id: Optional[int] = None, day: Optional[date] = None) -> None:
+        if self.method == AVERAGE and self.lots:
+            held = self.quantity
+            total_cost = held * self.average_cost + quantity * price
+            self.lots = deque([Lot(held + quantity, total_cost / (held + quantity), None, day)])
+        else:
+            self.lots.append(Lot(quantity, price, txn_id, day))
+
+    def sell(self, quantity: float, price: float) -> float:
+        """
+        Closes `quantity` against the open lots and returns the realized PnL per unit of
+        multiplier, before fees. Quantity with no open lot left is realized at a zero cost
+        basis.
+        """
+        pnl = 0.0
+        remaining = quantity
+        while remaining > EPSILON and self.lots:
+            lot = self.lots[-1] if self.method == LIFO else self.lots[0]
+            matched = min(lot.quantity, remaining)
+            pnl += (price - lot.price) * matched
+            lot.quantity -= matched
+            remaining -= matched
+            if lot.quantity <= EPSILON:
+                if self.method == LIFO:
+                    self.lots.pop()
+                else:
+                    self.lots.popleft()
+        if remaining > EPSILON:
+            pnl += price * remaining
+        return pnl
+
+
+def load_book(db: Session, symbol: str, asset_type: Optional[str]) -> LotBook:
+    rows = db.query(OpenLot).filter(OpenLot.symbol == symbol).order_by(OpenLot.id)
+    return LotBook(method_for(asset_type), (Lot(r.quantity, r.price, r.txn_id, r.date) for r in rows))
+
+
+def save_book(db: Session, symbol: str, asset_type: Optional[str], book: LotBook) -> None:
+    """
+    Replaces the stored open lots of `symbol` with the book's lots (no commit).
+    """
+    db.query(OpenLot).filter(OpenLot.symbol == symbol).delete()
+    if book.lots:
+        db.execute(insert(OpenLot), [
+            {"symbol": symbol, "asset_type": asset_type, "txn_id": lot.txn_id, "date": lot.date,
+             "quantity": lot.quantity, "price": lot.price}
+            for lot in book.lots
+        ])
+
+
+def trade(book: LotBook, txn: Transaction) -> Optional[float]:
+    """
+    Opens a lot for a buy, or matches a sell and returns its realized PnL net of the sell's
+    fee and tax. Other actions do not touch the lots and return None, like buys.
+    """
+    action = txn.action.upper()
+    if action in BUY_ACTIONS:
+        book.buy(txn.quantity, txn.price, txn.id, txn.date)
+    elif action in SELL_ACTIONS:
+        gross = book.sell(txn.quantity, txn.price) * (txn.multiplier or 1.0)
+        return gross - (txn.fee or 0.0) - (txn.tax or 0.0)
+    return None
+
+
+def average_cost(held: float, average: float, txn: Transaction, quantity: float) -> float:
+    """
+    Weighted average cost per unit after `txn`, from the `held` quantity at `average` before
+    it and the `quantity` left after it. Sells keep the cost per unit; a closed position has none.
+    This is Assets.cost, independent of the lot method used for realized PnL.
+    """
+    if quantity <= EPSILON:
+        return 0.0
+    if txn.action.upper() in BUY_ACTIONS:
+        return (held * average + txn.quantity * txn.price) / quantity
+    return average
+
+
+def manual_pnl_query(db: Session, day: date, symbol: str):
+    """
+    Realized PnL entered by hand (POST /pnl/, no txn_id) for `symbol` on `day`.
+    """
+    return db.query(RealizedProfitLoss).filter(
+        RealizedProfitLoss.date == day,
+        RealizedProfitLoss.symbol == symbol,
+        RealizedProfitLoss.txn_id.is_(None),
+    )
+
+
+def drop_matched_pnl(db: Session, day: date, symbol: str) -> int:
+    """
+    Deletes the lot-matched realized PnL of `symbol` on `day` (no commit), when a manual row
+    takes its place. Returns the number of rows deleted; the caller rebuilds the rollups.
+    """
+    return db.query(RealizedProfitLoss).filter(
+        RealizedProfitLoss.date == day,
+        RealizedProfitLoss.symbol == symbol,
+        RealizedProfitLoss.txn_id.isnot(None),
+    ).delete(synchronize_session=False)
+
+
+def apply_trade(db: Session, book: LotBook, txn: Transaction) -> None:
+    """
+    Applies `trade` and records a sell's realized PnL in realized_pnl and the rollups. A sell
+    whose PnL was already entered by hand on the same day keeps the manual row only, so it is
+    not counted twice; the lots are matched either way.
+    """
+    pnl = trade(book, txn)
+    if pnl is None:
+        return
+    if db.query(manual_pnl_query(db, txn.date, txn.symbol).exists()).scalar():
+        logger.info(f"Realized PnL of {txn.symbol} on {txn.date} was entered manually, not recording lot matching.")
+        return
+    db.add(RealizedProfitLoss(
+        date=txn.date,
+        symbol=txn.symbol,
+        quantity=txn.quantity,
+        pnl=pnl,
+        notes=f"{book.method} lot matching (including fees)",
+        txn_id=txn.id,
+    ))
+    rollups.add_realized_pnl(db, txn.date, txn.symbol, pnl)
+
+
+def reset_symbol(db: Session, symbol: str) -> None:
+    """
+    Drops a symbol's open lots and the realized PnL written by lot matching, before a replay.
+    Manually entered realized PnL rows are kept.
+    """
+    db.query(OpenLot).filter(OpenLot.symbol == symbol).delete()
+    db.query(RealizedProfitLoss).filter(
+        RealizedProfitLoss.symbol == symbol, RealizedProfitLoss.txn_id.isnot(None)
+    ).delete()
+    db.flush()
+    rollups.rebuild_symbol_pnl(db, symbol)
+
+
+def reset_all(db: Session) -> None:
+    symbols = {row[0] for row in db.query(OpenLot.symbol).distinct()}
+    symbols |= {row[0] for row in db.query(RealizedProfitLoss.symbol).filter(RealizedProfitLoss.txn_id.isnot(None)).distinct()}
+    for symbol in symbols:
+        reset_symbol(db, symbol)
+    logger.info(f"Reset lots of {len(symbols)} symbols.")
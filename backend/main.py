@@ -1,15 +1,50 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
-from typing import List
-from . import models, schemas, crud, services, database
+from typing import Iterable, List, Literal, Optional
+from . import models, schemas, crud, services, database, versions
+from .leases import LeaderLease
+from .live import QuotePoller
+from .response_cache import ResponseCache
+from .markets import TAIPEI, utcnow
+from .snapshots import GROUPS_BY_NAME, SNAPSHOT_GROUPS, MarketCloseTrigger, catch_up, record_snapshot
+from .migrations import run_migrations
 from fastapi.middleware.cors import CORSMiddleware
 from apscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
-
-models.Base.metadata.create_all(bind=database.engine)
+from datetime import date
+from functools import lru_cache
+import asyncio
+import json
 
 app = FastAPI()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+def ndjson_lines(rows: Iterable[dict]):
+    for row in rows:
+        yield json.dumps(jsonable_encoder(row)) + "\n"
+
+# Read endpoints answer from here while the tables they read are unchanged (ETag / 304)
+response_cache = ResponseCache()
+
+@lru_cache(maxsize=None)
+def list_adapter(schema) -> TypeAdapter:
+    return TypeAdapter(List[schema])
+
+def render_list(schema, rows, **options) -> bytes:
+    # What response_model does, straight to JSON bytes
+    adapter = list_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True), **options)
+
+def sse_events(events: Iterable[dict]):
+    # Server-sent events: the "event" key names the event, the rest is its data
+    for event in events:
+        data = {k: v for k, v in event.items() if k != "event"}
+        yield f"event: {event['event']}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
 # CORS configuration
 origins = [
     "http://localhost:5173",
@@ -29,9 +64,11 @@ def create_asset(asset: schemas.AssetCreate, db: Session = Depends(database.get_
     return crud.create_asset(db=db, asset=asset)
 
 @app.get("/assets/", response_model=List[schemas.Asset])
-def read_assets(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    assets = crud.get_assets(db, skip=skip, limit=limit)
-    return assets
+def read_assets(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
+    return response_cache.respond(
+        request, db, [versions.ASSETS],
+        lambda: render_list(schemas.Asset, crud.get_assets(db, skip=skip, limit=limit)),
+    )
 
 @app.delete("/assets/{asset_id}")
 def delete_asset(asset_id: int, db: Session = Depends(database.get_db)):
@@ -52,21 +89,113 @@ def get_current_net_worth(db: Session = Depends(database.get_db)):
     assets = crud.get_assets(db)
     return services.calculate_net_worth(assets)
 
-@app.get("/net-worth/history", response_model=List[schemas.NetWorthHistory])
-def read_net_worth_history(skip: int = 0, limit: int = 1000, db: Session = Depends(database.get_db)):
-    return crud.get_net_worth_history(db, skip=skip, limit=limit)
+@app.get("/net-worth/stream")
+def stream_current_net_worth(request: Request, db: Session = Depends(database.get_db)):
+    """
+    /net-worth/current from cached positions and last known quotes first, then updates as
+    quotes arrive (see services.stream_net_worth). NDJSON, or server-sent events when asked for.
+    """
+    events = services.stream_net_worth(crud.get_assets(db))
+    if SSE_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(sse_events(events), media_type=SSE_MEDIA_TYPE)
+    return StreamingResponse(ndjson_lines(events), media_type=NDJSON_MEDIA_TYPE)
+
+# One poller refreshes quotes for every /ws/net-worth subscriber; started with the first one
+quote_poller = QuotePoller(database.SessionLocal)
+
+@app.websocket("/ws/net-worth")
+async def net_worth_updates(websocket: WebSocket):
+    await websocket.accept()
+    queue = quote_poller.subscribe(asyncio.get_running_loop())
+    quote_poller.start()
+
+    async def forward():
+        while True:
+            await websocket.send_json(jsonable_encoder(await queue.get()))
+
+    sender = asyncio.create_task(forward())
+    try:
+        while True:
+            await websocket.receive_text() # Only to notice the disconnect
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        quote_poller.unsubscribe(queue)
+
+@app.get("/quotes/poller")
+def read_quote_poller_stats():
+    return quote_poller.stats()
+
+@app.get("/cache/responses")
+def read_response_cache_stats():
+    return response_cache.stats()
+
+@app.get("/quotes/cache")
+def read_quote_cache_stats():
+    return services.price_cache.stats()
+
+@app.get("/quotes/breakers")
+def read_quote_breakers():
+    return {name: breaker.stats() for name, breaker in services.quote_breakers.items()}
+
+@app.get("/net-worth/history", response_model=List[schemas.NetWorthHistory], response_model_exclude_none=True)
+def read_net_worth_history(
+    request: Request, skip: int = 0, limit: int = 1000, breakdown: bool = False, db: Session = Depends(database.get_db)
+):
+    return response_cache.respond(
+        request, db, [versions.NET_WORTH_HISTORY],
+        lambda: render_list(
+            schemas.NetWorthHistory, crud.get_net_worth_history(db, skip=skip, limit=limit, breakdown=breakdown),
+            exclude_none=True,
+        ),
+    )
+
+@app.get("/net-worth/history/{day}/details", response_model=List[schemas.NetWorthHistoryItem])
+def read_net_worth_details(day: date, db: Session = Depends(database.get_db)):
+    return crud.get_net_worth_details(db, day)
+
+@app.get("/net-worth/rollup")
+def read_net_worth_rollup(
+    grain: Literal["day", "week", "month"] = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(database.get_db),
+):
+    return crud.get_net_worth_rollup(db, grain=grain, start=start, end=end)
 
 @app.get("/pnl/history", response_model=List[schemas.RealizedPnL])
-def read_pnl_history(skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
-    return crud.get_realized_pnl(db, skip=skip, limit=limit)
+def read_pnl_history(request: Request, skip: int = 0, limit: int = 100, db: Session = Depends(database.get_db)):
+    return response_cache.respond(
+        request, db, [versions.REALIZED_PNL],
+        lambda: render_list(schemas.RealizedPnL, crud.get_realized_pnl(db, skip=skip, limit=limit)),
+    )
 
 @app.post("/pnl/", response_model=schemas.RealizedPnL)
 def create_pnl(pnl: schemas.RealizedPnLCreate, db: Session = Depends(database.get_db)):
+    # Also for PnL outside the transactions (dividends, interest); a row entered for a day with
+    # a sell of the same symbol replaces that sell's lot-matched PnL
     return crud.create_realized_pnl(db, pnl)
 
 @app.get("/pnl/cumulative")
-def read_cumulative_pnl(db: Session = Depends(database.get_db)):
-    return crud.get_cumulative_pnl(db)
+def read_cumulative_pnl(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    after: Optional[date] = Query(None, description="Keyset cursor: last date of the previous page"),
+    limit: Optional[int] = Query(None, ge=1),
+    grain: Literal["day", "week", "month"] = "day",
+    db: Session = Depends(database.get_db),
+):
+    def rows():
+        return crud.get_cumulative_pnl(db, start=start, end=end, after=after, limit=limit, grain=grain)
+
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        # One JSON object per line, written as rows come off the cursor
+        return StreamingResponse(ndjson_lines(rows()), media_type=NDJSON_MEDIA_TYPE)
+    return response_cache.respond(
+        request, db, [versions.REALIZED_PNL], lambda: json.dumps(jsonable_encoder(list(rows()))).encode()
+    )
 
 @app.post("/transactions/future", response_model=schemas.Transaction)
 def create_future_transaction(transaction: schemas.TransactionCreate, db: Session = Depends(database.get_db)):
@@ -74,90 +203,158 @@ def create_future_transaction(transaction: schemas.TransactionCreate, db: Sessio
 
 
 from fastapi import UploadFile, File, Form
-import shutil
 import os
-from .importer import TwBrokerStrategy, TransactionProcessor
+import shutil
+import tempfile
+from .importer import BaseImporter, CsvSource, TwBrokerStrategy, TransactionProcessor
 from .importer.us_strategies import UsBrokerStrategy
 from .services import update_assets_from_history
+from .jobs import JobQueue, ImportJob
+from .backfill import backfill_net_worth
+
+def get_importer(strategy: str) -> BaseImporter:
+    # Supports "cathay" (TW) and "us_broker" (US)
+    if strategy.lower() == "cathay":
+        return TwBrokerStrategy()
+    elif strategy.lower() == "us_broker":
+        return UsBrokerStrategy()
+    # Default to TW if unknown, but better to support both forms
+    return TwBrokerStrategy()
 
-@app.post("/upload/history")
+# Imports run in the background, one at a time per database
+import_jobs = JobQueue(session_factory=database.SessionLocal)
+
+def run_import(source: CsvSource, strategy: str, db: Session, job: Optional[ImportJob] = None) -> dict:
+    """
+    Parses, inserts and updates assets. Blocking: run it off the event loop.
+    Progress is reported on `job` when given.
+    """
+    importer = get_importer(strategy)
+
+    def on_batch(rows_parsed, totals):
+        if job is not None:
+            job.rows_parsed = rows_parsed
+            job.rows_inserted = totals.inserted
+            job.rows_skipped = totals.skipped
+
+    # 1. Parse and Process (streamed in fixed-size batches, one commit per batch)
+    processor = TransactionProcessor()
+    result = processor.import_batches(importer.iter_batches(source), db, on_batch=on_batch)
+
+    # 2. Update Assets
+    if job is not None:
+        job.phase = "updating_assets"
+    update_assets_from_history(db)
+
+    return {
+        "status": "success",
+        "imported_count": result.inserted,
+        "skipped_count": result.skipped,
+        "message": "Import successful and assets updated."
+    }
+
+@app.post("/upload/history", status_code=202)
 async def upload_history(
     file: UploadFile = File(...),
     strategy: str = Form(...),
-    db: Session = Depends(database.get_db)
 ):
-    # 1. Save file temporarily
-    temp_dir = "temp_uploads"
-    os.makedirs(temp_dir, exist_ok=True)
-    file_path = os.path.join(temp_dir, file.filename)
-    
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        # 2. Select Strategy
-        # Supports "cathay" (TW) and "us_broker" (US)
-        if strategy.lower() == "cathay":
-            importer = TwBrokerStrategy()
-        elif strategy.lower() == "us_broker":
-            importer = UsBrokerStrategy()
-        else:
-            # Default to TW if unknown, but better to support both forms
-            importer = TwBrokerStrategy()
-            
-        # 3. Parse and Process
-        transactions = importer.parse(file_path)
-        processor = TransactionProcessor()
-        count = processor.process_transactions(transactions, db)
-        
-        # 4. Update Assets
-        update_assets_from_history(db)
-        
-        return {"status": "success", "imported_count": count, "message": "Import successful and assets updated."}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        # Cleanup
-        if os.path.exists(file_path):
-            os.remove(file_path)
+    # FastAPI closes request files once the response is sent, so the upload is copied to a
+    # temporary file (off the event loop) that the background job parses and removes; the
+    # response returns the job id immediately.
+    def save_upload() -> str:
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as copy:
+            shutil.copyfileobj(file.file, copy)
+            return copy.name
+
+    path = await asyncio.to_thread(save_upload)
+
+    def work(job: ImportJob, db: Session):
+        try:
+            run_import(path, strategy, db, job)
+        finally:
+            os.remove(path)
+
+    job = import_jobs.submit(work, filename=file.filename, strategy=strategy)
+    return {"status": "queued", "job_id": job.id}
+
+@app.post("/net-worth/backfill", status_code=202)
+def start_net_worth_backfill(start: Optional[date] = None, end: Optional[date] = None):
+    # Runs on the import queue: it shares the per-database lock with imports
+    def work(job: ImportJob, db: Session):
+        result = backfill_net_worth(db, start=start, end=end)
+        job.rows_inserted = result.days
+
+    job = import_jobs.submit(work, strategy="backfill")
+    return {"status": "queued", "job_id": job.id}
 
-def record_net_worth_job():
+@app.get("/jobs/{job_id}")
+def read_job(job_id: str):
+    job = import_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@lru_cache(maxsize=None)
+def snapshot_lease(name: str) -> LeaderLease:
+    # Created on first use, in the worker process that runs the job
+    return LeaderLease(database.SessionLocal, name)
+
+def record_net_worth_job(group_name: Optional[str] = None):
+    """
+    Snapshots the asset classes of one snapshots.SnapshotGroup under its latest trading day,
+    or every asset under today's date without a group. Only the group's assets are quoted:
+    the other classes keep their recorded rows (see record_snapshot). Every worker's scheduler
+    fires it; only the one taking the lease fetches quotes and writes.
+    """
+    group = GROUPS_BY_NAME.get(group_name)
+    if not snapshot_lease(f"snapshot_{group_name or 'all'}").acquire():
+        return
+    now = utcnow()
+    day = group.last_close(now) if group else now.astimezone(TAIPEI).date()
     db = database.SessionLocal()
     try:
         assets = crud.get_assets(db)
+        if group:
+            assets = [a for a in assets if a.type in group.types]
         data = services.calculate_net_worth(assets)
-        
-        history_entry = schemas.NetWorthHistoryBase(
-            date=datetime.now().date(),
-            total_twd=data["total_twd"],
-            total_usd=data["total_usd"],
-            details=data["details"]
-        )
-        # Check if entry for today exists to avoid duplicates or error
-        # For simplicity, we might just try to create and catch error, or check first.
-        # crud.create_net_worth_history handles creation.
-        # Ideally check if exists.
-        existing = db.query(models.NetWorthHistory).filter(models.NetWorthHistory.date == datetime.now().date()).first()
-        if not existing:
-            crud.create_net_worth_history(db, history_entry)
-        else:
-            # Update existing
-            existing.total_twd = data["total_twd"]
-            existing.total_usd = data["total_usd"]
-            existing.details = data["details"]
-            db.commit()
-            
+        record_snapshot(db, day, data["details"], types=group.types if group else None)
     except Exception as e:
         print(f"Error in scheduled job: {e}")
     finally:
         db.close()
 
+def catch_up_job():
+    # Closes missed while the server was down: one backfill, then the groups whose latest day is still missing
+    if not snapshot_lease("snapshot_catch_up").acquire():
+        return
+    db = database.SessionLocal()
+    try:
+        _, due = catch_up(db, utcnow())
+    finally:
+        db.close()
+    for group in due:
+        record_net_worth_job(group.name)
+
 @app.on_event("startup")
 def startup_event():
+    # Schema setup happens here rather than on import, so importing the app (tests, benchmarks)
+    # never creates or migrates the configured database
+    models.Base.metadata.create_all(bind=database.engine)
+    run_migrations(database.engine)
+    db = database.SessionLocal()
+    try:
+        services.ensure_positions(db)
+    finally:
+        db.close()
+
     scheduler = BackgroundScheduler()
-    # Run every day at 13:30 (after TW market close) or 16:00 (after US market close... wait US close is 4am TW time next day)
-    # Let's set it to run at 14:00 TW time for now.
-    scheduler.add_job(record_net_worth_job, 'cron', hour=14, minute=0)
+    # Each market group is snapshot after its own close, on its trading days only
+    for group in SNAPSHOT_GROUPS:
+        scheduler.add_job(record_net_worth_job, MarketCloseTrigger(group), args=[group.name], id=f"snapshot_{group.name}")
+    scheduler.add_job(catch_up_job, id="snapshot_catch_up")
     scheduler.start()
 
+@app.on_event("shutdown")
+def shutdown_event():
+    quote_poller.stop()
+
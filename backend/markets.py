@@ -0,0 +1,166 @@
+"""
+Trading calendars of the markets the portfolio is priced on.
+
+Holidays are the full-day closures published by the exchanges (TWSE for the Taiwan
+markets, which share them; NYSE for US stocks) and have to be extended every year: a
+date in a year without any listed holiday is treated as a regular weekday, and a warning
+is logged the first time a market checks one. Early closes are not modelled.
+"""
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, FrozenSet, Iterable, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+import logging
+
+logger = logging.getLogger(__name__)
+
+# TWSE, TPEX and TAIFEX close on the same days (including the no-trading days before Lunar New Year)
+TW_HOLIDAYS = frozenset(date.fromisoformat(d) for d in (
+    "2025-01-01", "2025-01-23", "2025-01-24", "2025-01-27", "2025-01-28", "2025-01-29", "2025-01-30",
+    "2025-01-31", "2025-02-28", "2025-04-03", "2025-04-04", "2025-05-01", "2025-05-30", "2025-09-29",
+    "2025-10-06", "2025-10-10", "2025-10-24", "2025-12-25",
+    "2026-01-01", "2026-02-12", "2026-02-13", "2026-02-16", "2026-02-17", "2026-02-18", "2026-02-19",
+    "2026-02-20", "2026-02-27", "2026-04-03", "2026-04-06", "2026-05-01", "2026-06-19", "2026-09-25",
+    "2026-09-28", "2026-10-09", "2026-10-26", "2026-12-25",
+))
+
+NYSE_HOLIDAYS = frozenset(date.fromisoformat(d) for d in (
+    "2025-01-01", "2025-01-09", "2025-01-20", "2025-02-17", "2025-04-18", "2025-05-26", "2025-06-19",
+    "2025-07-04", "2025-09-01", "2025-11-27", "2025-12-25",
+    "2026-01-01", "2026-01-19", "2026-02-16", "2026-04-03", "2026-05-25", "2026-06-19", "2026-07-03",
+    "2026-09-07", "2026-11-26", "2026-12-25",
+))
+
+# (market name, year) outside the holiday lists already warned about, to log it once
+_uncovered_warned: Set[Tuple[str, int]] = set()
+
+
+@dataclass(frozen=True)
+class Market:
+    """
+    Regular trading session of an exchange, in its local time zone, on weekdays that are
+    not holidays. `night` is an evening session running past midnight (TAIFEX after-hours
+    trading); it belongs to the next trading day, so the day still ends at `close`.
+    """
+    name: str
+    tz: ZoneInfo
+    open: time
+    close: time
+    holidays: FrozenSet[date] = frozenset()
+    night: Optional[Tuple[time, time]] = None
+    # Years the holiday list covers: those with at least one listed holiday
+    covered_years: FrozenSet[int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "covered_years", frozenset(day.year for day in self.holidays))
+
+    def local(self, at: datetime) -> datetime:
+        return at.astimezone(self.tz)
+
+    def is_trading_day(self, day: date) -> bool:
+        if self.holidays and day.year not in self.covered_years and (self.name, day.year) not in _uncovered_warned:
+            _uncovered_warned.add((self.name, day.year))
+            logger.warning(
+                f"{self.name} holidays are only listed for {', '.join(map(str, sorted(self.covered_years)))}: "
+                f"{day.year} is treated as having none (extend markets.py)."
+            )
+        return day.weekday() < 5 and day not in self.holidays
+
+    def is_open(self, at: datetime) -> bool:
+        local = self.local(at)
+        today, now = local.date(), local.time()
+        if self.is_trading_day(today) and self.open <= now < self.close:
+            return True
+        if self.night is None:
+            return False
+        night_open, night_close = self.night
+        return (
+            (self.is_trading_day(today) and now >= night_open)
+            or (self.is_trading_day(today - timedelta(days=1)) and now < night_close)
+        )
+
+    def previous_trading_day(self, day: date) -> Optional[date]:
+        """
+        The latest trading day before `day` (within the past few weeks).
+        """
+        for _ in range(31):
+            day -= timedelta(days=1)
+            if self.is_trading_day(day):
+                return day
+        return None
+
+    def trades_between(self, start: date, end: date) -> bool:
+        day = start
+        while day <= end:
+            if self.is_trading_day(day):
+                return True
+            day += timedelta(days=1)
+        return False
+
+    def close_at(self, day: date) -> datetime:
+        return datetime.combine(day, self.close, tzinfo=self.tz)
+
+    def last_close(self, at: datetime) -> Optional[date]:
+        """
+        The latest trading day that closed at or before `at` (within the past few weeks).
+        """
+        day = self.local(at).date()
+        for _ in range(31):
+            if self.is_trading_day(day) and self.close_at(day) <= at:
+                return day
+            day -= timedelta(days=1)
+        return None
+
+    def next_close(self, at: datetime) -> datetime:
+        """
+        Close of the first trading day that closes after `at`.
+        """
+        day = self.local(at).date()
+        while not (self.is_trading_day(day) and self.close_at(day) > at):
+            day += timedelta(days=1)
+        return self.close_at(day)
+
+
+TAIPEI = ZoneInfo("Asia/Taipei")
+TWSE = Market("TWSE", TAIPEI, time(9, 0), time(13, 30), TW_HOLIDAYS)
+TPEX = Market("TPEX", TAIPEI, time(9, 0), time(13, 30), TW_HOLIDAYS)
+TAIFEX = Market("TAIFEX", TAIPEI, time(8, 45), time(13, 45), TW_HOLIDAYS, night=(time(15, 0), time(5, 0)))
+NYSE = Market("NYSE", ZoneInfo("America/New_York"), time(9, 30), time(16, 0), NYSE_HOLIDAYS)
+MARKETS = (TWSE, TPEX, TAIFEX, NYSE)
+# USD/TWD (TWD=X) has a daily bar for every weekday
+FX = Market("FX", TAIPEI, time(0, 0), time(23, 59))
+
+# Market whose session moves the quote of each quote type (second element of services.quote_key);
+# futures are priced through the underlying TW stock
+QUOTE_MARKETS: Dict[str, Market] = {"TW_STOCK": TWSE, "US_STOCK": NYSE}
+
+
+def ticker_market(ticker: str) -> Market:
+    """
+    Market whose sessions produce the daily bars of a Yahoo ticker (see pricing.quote_routes).
+    """
+    if ticker.endswith(".TWO"):
+        return TPEX
+    if ticker.endswith(".TW") or ticker == "^TWII":
+        return TWSE
+    if ticker.endswith("=X"):
+        return FX
+    return NYSE
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def quote_market_open(quote_type: str, at: datetime) -> bool:
+    """
+    Whether quotes of `quote_type` can move at `at`. FX trades around the clock on weekdays.
+    """
+    market: Optional[Market] = QUOTE_MARKETS.get(quote_type)
+    if market is None:
+        return at.astimezone(TAIPEI).weekday() < 5
+    return market.is_open(at)
+
+
+def any_market_trades(day: date, markets: Iterable[Market] = MARKETS) -> bool:
+    return any(market.is_trading_day(day) for market in markets)
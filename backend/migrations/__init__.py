@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Callable, List, Tuple
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from . import lot_matching, net_worth_items, rollup_backfill, transaction_indexes
+
+logger = logging.getLogger(__name__)
+
+# Applied in order, each exactly once per database. Append new migrations, never reorder.
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("0001_transaction_indexes", transaction_indexes.upgrade),
+    ("0002_rollup_backfill", rollup_backfill.upgrade),
+    ("0003_net_worth_items", net_worth_items.upgrade),
+    ("0004_lot_matching", lot_matching.upgrade),
+]
+
+
+def run_migrations(engine: Engine) -> List[str]:
+    """
+    Applies pending migrations (run after `create_all`) and returns the versions applied.
+    Each migration runs in its own transaction together with its `schema_migrations` row.
+    """
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations (version VARCHAR PRIMARY KEY, applied_at DATETIME)"
+        ))
+        applied = set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+    newly_applied = []
+    for version, upgrade in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            upgrade(conn)
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, applied_at) VALUES (:version, :applied_at)"),
+                {"version": version, "applied_at": datetime.now()},
+            )
+        logger.info(f"Applied migration {version}.")
+        newly_applied.append(version)
+    return newly_applied
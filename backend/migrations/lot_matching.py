@@ -0,0 +1,29 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from .rollup_backfill import GRAINS_SQL, PERIOD_START_SQL
+
+# Written by the FIFO loop that import_us.py used before lot matching moved to backend/lots.py
+LEGACY_FIFO_NOTES = "US Stock FIFO PnL (including fees)"
+
+
+def upgrade(conn: Connection) -> None:
+    """
+    Adds `realized_pnl.txn_id` and drops the realized PnL of the old import_us.py FIFO loop,
+    recomputing pnl_rollup from the rows left. Positions, open lots and lot-matched realized
+    PnL are not written here: services.ensure_positions replays the history on the next start.
+    """
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(realized_pnl)"))}
+    if "txn_id" not in columns:
+        conn.execute(text("ALTER TABLE realized_pnl ADD COLUMN txn_id INTEGER"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_realized_pnl_txn_id ON realized_pnl (txn_id)"))
+    conn.execute(text("DELETE FROM realized_pnl WHERE notes = :notes"), {"notes": LEGACY_FIFO_NOTES})
+
+    conn.execute(text("DELETE FROM pnl_rollup"))
+    conn.execute(text(f"""
+        WITH {GRAINS_SQL}
+        INSERT INTO pnl_rollup (grain, period_start, symbol, pnl, trade_count)
+        SELECT grain, {PERIOD_START_SQL} AS start, symbol, SUM(pnl), COUNT(*)
+        FROM realized_pnl CROSS JOIN grains
+        GROUP BY grain, start, symbol
+    """))
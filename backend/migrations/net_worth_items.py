@@ -0,0 +1,59 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Frozen definition of the item table this migration fills
+ITEMS_TABLE = """CREATE TABLE IF NOT EXISTS net_worth_history_items (
+    date DATE NOT NULL, asset_id INTEGER NOT NULL, symbol VARCHAR, type VARCHAR, quantity FLOAT, price FLOAT,
+    value_twd FLOAT, exposure FLOAT,
+    PRIMARY KEY (date, asset_id)
+) WITHOUT ROWID"""
+
+# The day / Monday / 1st of the month of `date` for each grain (rollups.period_start)
+GRAINS_SQL = "grains(grain) AS (VALUES ('day'), ('week'), ('month'))"
+PERIOD_START_SQL = """CASE grain
+    WHEN 'day' THEN date
+    WHEN 'week' THEN date(date, '-' || ((CAST(strftime('%w', date) AS INTEGER) + 6) % 7) || ' days')
+    ELSE date(date, 'start of month')
+END"""
+
+
+def upgrade(conn: Connection) -> None:
+    """
+    Moves the per-asset JSON snapshots of net_worth_history into net_worth_history_items,
+    then drops the `details` column and rebuilds the net-worth rollups from the new rows.
+    """
+    conn.execute(text(ITEMS_TABLE))
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(net_worth_history)"))}
+    if "details" not in columns:
+        return
+
+    # Same mapping as crud.save_net_worth_items had when the column was dropped
+    conn.execute(text("""
+        INSERT OR REPLACE INTO net_worth_history_items (date, asset_id, symbol, type, quantity, price, value_twd, exposure)
+        SELECT h.date, json_extract(item.value, '$.id'), json_extract(item.value, '$.symbol'),
+               json_extract(item.value, '$.type'), json_extract(item.value, '$.quantity'),
+               json_extract(item.value, '$.current_price'), COALESCE(json_extract(item.value, '$.value_twd'), 0.0),
+               json_extract(item.value, '$.notional_value')
+        FROM net_worth_history h, json_each(h.details) item
+        WHERE h.details IS NOT NULL
+    """))
+    conn.execute(text("ALTER TABLE net_worth_history DROP COLUMN details")) # SQLite 3.35+
+
+    # Each period keeps the per-class sums of its latest day with items (rollups.rebuild_net_worth)
+    conn.execute(text("DELETE FROM net_worth_rollup"))
+    conn.execute(text(f"""
+        WITH {GRAINS_SQL},
+        daily AS (
+            SELECT date, type AS asset_class, SUM(value_twd) AS value_twd
+            FROM net_worth_history_items
+            GROUP BY date, type
+        ),
+        periods AS (
+            SELECT grain, {PERIOD_START_SQL} AS start, MAX(date) AS as_of
+            FROM daily CROSS JOIN grains
+            GROUP BY grain, start
+        )
+        INSERT INTO net_worth_rollup (grain, period_start, asset_class, value_twd, as_of)
+        SELECT periods.grain, periods.start, daily.asset_class, daily.value_twd, periods.as_of
+        FROM periods JOIN daily ON daily.date = periods.as_of
+    """))
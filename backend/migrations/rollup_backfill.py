@@ -0,0 +1,72 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+# Tables as they were when this migration was written (frozen: later model changes must not
+# change what it does). net_worth_history still carried the per-asset JSON in `details`
+TABLES = (
+    """CREATE TABLE IF NOT EXISTS realized_pnl (
+        id INTEGER NOT NULL PRIMARY KEY, date DATE, symbol VARCHAR, quantity FLOAT, pnl FLOAT, notes VARCHAR
+    )""",
+    """CREATE TABLE IF NOT EXISTS net_worth_history (
+        id INTEGER NOT NULL PRIMARY KEY, date DATE, total_twd FLOAT, total_usd FLOAT, details JSON
+    )""",
+    """CREATE TABLE IF NOT EXISTS pnl_rollup (
+        grain VARCHAR NOT NULL, period_start DATE NOT NULL, symbol VARCHAR NOT NULL, pnl FLOAT, trade_count INTEGER,
+        PRIMARY KEY (grain, period_start, symbol)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS net_worth_rollup (
+        grain VARCHAR NOT NULL, period_start DATE NOT NULL, asset_class VARCHAR NOT NULL, value_twd FLOAT, as_of DATE,
+        PRIMARY KEY (grain, period_start, asset_class)
+    ) WITHOUT ROWID""",
+)
+
+# The day / Monday / 1st of the month of `date` for each grain (rollups.period_start)
+GRAINS_SQL = "grains(grain) AS (VALUES ('day'), ('week'), ('month'))"
+PERIOD_START_SQL = """CASE grain
+    WHEN 'day' THEN date
+    WHEN 'week' THEN date(date, '-' || ((CAST(strftime('%w', date) AS INTEGER) + 6) % 7) || ' days')
+    ELSE date(date, 'start of month')
+END"""
+
+
+def upgrade(conn: Connection) -> None:
+    """
+    Fills pnl_rollup and net_worth_rollup from the rows written before they existed: realized
+    PnL is summed per period and symbol, and each net-worth period keeps the per-class values
+    of its latest snapshot.
+    """
+    for ddl in TABLES:
+        conn.execute(text(ddl))
+    conn.execute(text("DELETE FROM pnl_rollup"))
+    conn.execute(text("DELETE FROM net_worth_rollup"))
+
+    conn.execute(text(f"""
+        WITH {GRAINS_SQL}
+        INSERT INTO pnl_rollup (grain, period_start, symbol, pnl, trade_count)
+        SELECT grain, {PERIOD_START_SQL} AS start, symbol, SUM(pnl), COUNT(*)
+        FROM realized_pnl CROSS JOIN grains
+        GROUP BY grain, start, symbol
+    """))
+
+    # Databases created after the JSON column was dropped have nothing to roll up here
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(net_worth_history)"))}
+    if "details" not in columns:
+        return
+    conn.execute(text(f"""
+        WITH {GRAINS_SQL},
+        periods AS (
+            SELECT grain, {PERIOD_START_SQL} AS start, MAX(date) AS as_of
+            FROM net_worth_history CROSS JOIN grains
+            GROUP BY grain, start
+        ),
+        daily AS (
+            SELECT h.date AS date, json_extract(item.value, '$.type') AS asset_class,
+                   SUM(COALESCE(json_extract(item.value, '$.value_twd'), 0.0)) AS value_twd
+            FROM net_worth_history h, json_each(h.details) item
+            WHERE h.details IS NOT NULL
+            GROUP BY h.date, asset_class
+        )
+        INSERT INTO net_worth_rollup (grain, period_start, asset_class, value_twd, as_of)
+        SELECT periods.grain, periods.start, daily.asset_class, daily.value_twd, periods.as_of
+        FROM periods JOIN daily ON daily.date = periods.as_of
+    """))
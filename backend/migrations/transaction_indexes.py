@@ -0,0 +1,33 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+NATURAL_KEY_SQL = "date, symbol, action, quantity, price, asset_type"
+
+
+def upgrade(conn: Connection) -> None:
+    """
+    Adds `transactions.occurrence`, the composite per-symbol index and the unique natural key.
+
+    Databases created before this migration can already hold identical trades (same date,
+    symbol, action, quantity, price, asset_type); they are numbered 0, 1, ... by id so the
+    unique index can be built without dropping any row.
+    """
+    columns = {row[1] for row in conn.execute(text("PRAGMA table_info(transactions)"))}
+    if "occurrence" not in columns:
+        conn.execute(text("ALTER TABLE transactions ADD COLUMN occurrence INTEGER NOT NULL DEFAULT 0"))
+        conn.execute(text(f"""
+            WITH ranked AS (
+                SELECT id, ROW_NUMBER() OVER (PARTITION BY {NATURAL_KEY_SQL} ORDER BY id) - 1 AS n
+                FROM transactions
+            )
+            UPDATE transactions SET occurrence = (SELECT n FROM ranked WHERE ranked.id = transactions.id)
+        """))
+
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_transactions_symbol_type_date_id "
+        "ON transactions (symbol, asset_type, date, id)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_transactions_natural_key "
+        f"ON transactions ({NATURAL_KEY_SQL}, occurrence)"
+    ))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Date, JSON
+from sqlalchemy import Column, Integer, String, Float, Date, Index
 from .database import Base
 
 class Asset(Base):
@@ -23,7 +23,21 @@ class NetWorthHistory(Base):
     date = Column(Date, index=True, unique=True)
     total_twd = Column(Float)
     total_usd = Column(Float)
-    details = Column(JSON) # Snapshot of asset values
+    # Per-asset snapshot rows live in net_worth_history_items
+
+class NetWorthHistoryItem(Base):
+    __tablename__ = "net_worth_history_items"
+    # Clustered by date, so one day's breakdown is a single range read
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    date = Column(Date, primary_key=True)
+    asset_id = Column(Integer, primary_key=True)
+    symbol = Column(String)
+    type = Column(String) # Asset type, used for the per-class breakdown
+    quantity = Column(Float)
+    price = Column(Float) # current_price at snapshot time
+    value_twd = Column(Float) # Equity for futures, as in calculate_net_worth
+    exposure = Column(Float) # notional_value
 
 class RealizedProfitLoss(Base):
     __tablename__ = "realized_pnl"
@@ -34,6 +48,7 @@ class RealizedProfitLoss(Base):
     quantity = Column(Float)
     pnl = Column(Float)
     notes = Column(String, nullable=True)
+    txn_id = Column(Integer, nullable=True, index=True) # Sell transaction, for rows written by lot matching
 
 class Transaction(Base):
     __tablename__ = "transactions"
@@ -50,4 +65,73 @@ class Transaction(Base):
     fee = Column(Float, default=0.0)
     tax = Column(Float, default=0.0)
     assigned_margin = Column(Float, default=0.0)
+    # Nth identical (date, symbol, action, quantity, price, asset_type) row, so legitimately
+    # repeated trades can share the unique natural key below
+    occurrence = Column(Integer, nullable=False, default=0, server_default="0")
+
+    __table_args__ = (
+        # Per-symbol history scans in date order (positions.replay_symbol)
+        Index("ix_transactions_symbol_type_date_id", "symbol", "asset_type", "date", "id"),
+        # Idempotent imports; also covers the importer's date-range dedup query
+        Index(
+            "uq_transactions_natural_key",
+            "date", "symbol", "action", "quantity", "price", "asset_type", "occurrence",
+            unique=True,
+        ),
+    )
+
+
+class PositionState(Base):
+    __tablename__ = "position_state"
+
+    symbol = Column(String, primary_key=True)
+    asset_type = Column(String)
+    quantity = Column(Float, default=0.0)
+    cost = Column(Float, default=0.0) # Average cost per unit
+    last_txn_id = Column(Integer, default=0) # Checkpoint: last transaction applied to this symbol
+    last_date = Column(Date, nullable=True) # Date of that transaction, used to detect back-dated trades
+
+class PnlRollup(Base):
+    __tablename__ = "pnl_rollup"
+    # Clustered on the primary key, so chart reads are a single index range scan
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    grain = Column(String, primary_key=True) # day, week, month
+    period_start = Column(Date, primary_key=True) # The day / Monday / 1st of the month
+    symbol = Column(String, primary_key=True)
+    pnl = Column(Float, default=0.0)
+    trade_count = Column(Integer, default=0)
+
+class NetWorthRollup(Base):
+    __tablename__ = "net_worth_rollup"
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    grain = Column(String, primary_key=True) # day, week, month
+    period_start = Column(Date, primary_key=True)
+    asset_class = Column(String, primary_key=True) # Asset type: TWD, USD, TW_STOCK, US_STOCK, TW_FUTURE
+    value_twd = Column(Float, default=0.0) # Value at the latest snapshot of the period
+    as_of = Column(Date) # Date of that snapshot
+
+class OpenLot(Base):
+    __tablename__ = "open_lots"
+
+    id = Column(Integer, primary_key=True) # Insertion order = lot order (oldest first)
+    symbol = Column(String, index=True)
+    asset_type = Column(String)
+    txn_id = Column(Integer, nullable=True) # Buy transaction that opened the lot (None once averaged)
+    date = Column(Date, nullable=True)
+    quantity = Column(Float) # Remaining quantity
+    price = Column(Float) # Cost per unit
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+
+    name = Column(String, primary_key=True) # Scheduled work guarded by the lease, e.g. net_worth_snapshot
+    owner = Column(String) # host:pid:random of the process holding it
+    expires_at = Column(Float) # Unix time; anyone may take the lease over after this
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
 
+    name = Column(String, primary_key=True) # Table name
+    version = Column(Integer, default=0) # Bumped by every write to the table (see versions.bump)
@@ -0,0 +1,143 @@
+from typing import Dict, Iterable, List, Set
+import logging
+
+from sqlalchemy.orm import Session
+
+from . import lots
+from .lots import LotBook
+from .models import Transaction, Asset, PositionState
+
+logger = logging.getLogger(__name__)
+
+
+def apply_transaction(db: Session, state: PositionState, book: LotBook, txn: Transaction) -> None:
+    """
+    Applies one transaction to a symbol's open lots (see lots.py) and advances its checkpoint.
+    The quantity is copied from the book once the sync is done (see sync_positions).
+
+    `state.cost` stays the weighted average cost of the buys, whichever method matches the
+    lots: the lot method only decides realized PnL, Assets.cost is always the average cost.
+    """
+    # Initialize type if new
+    if not book.lots:
+        state.asset_type = txn.asset_type
+
+    held = book.quantity
+    lots.apply_trade(db, book, txn)
+    state.cost = lots.average_cost(held, state.cost or 0.0, txn, book.quantity)
+
+    # Highest id, not the id of the latest-dated trade: a back-dated row can carry the highest id
+    state.last_txn_id = max(state.last_txn_id or 0, txn.id)
+    state.last_date = txn.date
+
+
+def replay_symbol(db: Session, state: PositionState, book: LotBook) -> None:
+    """
+    Rebuilds one symbol's lots and realized PnL from its full history.
+    """
+    lots.reset_symbol(db, state.symbol)
+    book.lots.clear()
+    state.cost = 0.0
+    state.last_txn_id = 0
+    state.last_date = None
+    for txn in symbol_history_query(db, state.symbol, state.asset_type).all():
+        apply_transaction(db, state, book, txn)
+
+
+def symbol_history_query(db: Session, symbol: str, asset_type: str):
+    # Served in order by ix_transactions_symbol_type_date_id (no sort step)
+    return db.query(Transaction).filter(
+        Transaction.symbol == symbol, Transaction.asset_type == asset_type
+    ).order_by(Transaction.date, Transaction.id)
+
+
+def new_transactions_query(db: Session, checkpoint: int):
+    return db.query(Transaction).filter(Transaction.id > checkpoint).order_by(Transaction.id)
+
+
+def sync_positions(db: Session, full: bool = False) -> Set[str]:
+    """
+    Brings position_state up to date with the transactions table and returns the touched symbols.
+
+    Only transactions newer than the checkpoint (highest applied id) are read, and they are
+    matched against each symbol's stored open lots, writing realized PnL for sells. A symbol
+    is replayed from scratch only when a new transaction is dated before that symbol's last
+    applied trade; otherwise new transactions are applied on top of the stored state.
+    """
+    if full:
+        db.query(PositionState).delete()
+        lots.reset_all(db)
+        db.flush()
+
+    states: Dict[str, PositionState] = {s.symbol: s for s in db.query(PositionState).all()}
+    checkpoint = max((s.last_txn_id or 0 for s in states.values()), default=0)
+
+    # Primary-key range read (ordering by date in SQL would walk the whole date index);
+    # the handful of new rows is then sorted in memory
+    new_txns: List[Transaction] = new_transactions_query(db, checkpoint).all()
+    new_txns.sort(key=lambda t: (t.date, t.id))
+    logger.info(f"Applying {len(new_txns)} new transactions after checkpoint {checkpoint}.")
+
+    books: Dict[str, LotBook] = {}
+    replayed: Set[str] = set()
+    for txn in new_txns:
+        symbol = str(txn.symbol) # Ensure symbol is string
+        if symbol in replayed:
+            continue
+
+        state = states.get(symbol)
+        if state is None:
+            state = PositionState(symbol=symbol, asset_type=txn.asset_type, quantity=0.0, cost=0.0, last_txn_id=0)
+            db.add(state)
+            states[symbol] = state
+        book = books.get(symbol)
+        if book is None:
+            # Only the symbol's remaining open lots are loaded, never its history
+            book = books[symbol] = lots.load_book(db, symbol, state.asset_type or txn.asset_type)
+
+        if state.last_date is not None and txn.date < state.last_date:
+            # Back-dated trade: the running state is no longer valid for this symbol
+            logger.info(f"Back-dated transaction for {symbol} on {txn.date}, replaying symbol history.")
+            replay_symbol(db, state, book)
+            replayed.add(symbol)
+        else:
+            apply_transaction(db, state, book, txn)
+
+    for symbol, book in books.items():
+        state = states[symbol]
+        state.quantity = book.quantity
+        lots.save_book(db, symbol, state.asset_type, book)
+
+    db.flush()
+    return set(books)
+
+
+def sync_assets(db: Session, states: Iterable[PositionState]) -> None:
+    """
+    Mirrors positions into the Assets table: open positions are created/updated, closed ones removed.
+    """
+    states = list(states)
+    symbols = [s.symbol for s in states]
+    existing_assets = {a.symbol: a for a in db.query(Asset).filter(Asset.symbol.in_(symbols)).all()}
+
+    for state in states:
+        if state.quantity > 0:
+            if state.symbol in existing_assets:
+                # Update
+                asset = existing_assets[state.symbol]
+                asset.quantity = state.quantity
+                asset.cost = state.cost
+                asset.type = state.asset_type
+            else:
+                # Create
+                db.add(Asset(
+                    symbol=state.symbol,
+                    type=state.asset_type,
+                    quantity=state.quantity,
+                    cost=state.cost,
+                    currency="TWD", # Default
+                    name=state.symbol # Placeholder
+                ))
+        elif state.symbol in existing_assets:
+            # Quantity is 0, remove it to keep table clean
+            db.delete(existing_assets[state.symbol])
@@ -0,0 +1,18 @@
+from .cache import PriceCache, FX_KEY, StaleClose
+from .resolution import ResolutionIndex
+from .engine import QuoteEngine, QuoteSnapshot, TW_SYMBOL_MAP, download_bars, download_closes, download_history, quote_routes
+from .store import CsvBarFetcher, EmptyDownloadError, PriceStore, expect_bars
+from .providers import (
+    QuoteProvider, YahooProvider, TwstockProvider, TwseProvider, QuoteRecording, RecordingProvider, ReplayProvider,
+    live_providers, recording_providers, replay_providers,
+)
+from .breaker import CircuitBreaker, CircuitOpenError, GuardedProvider, guarded_providers
+
+__all__ = [
+    'PriceCache', 'FX_KEY', 'StaleClose', 'ResolutionIndex', 'QuoteEngine', 'QuoteSnapshot',
+    'TW_SYMBOL_MAP', 'download_bars', 'download_closes', 'download_history', 'quote_routes',
+    'CsvBarFetcher', 'EmptyDownloadError', 'PriceStore', 'expect_bars',
+    'QuoteProvider', 'YahooProvider', 'TwstockProvider', 'TwseProvider', 'QuoteRecording', 'RecordingProvider',
+    'ReplayProvider', 'live_providers', 'recording_providers', 'replay_providers',
+    'CircuitBreaker', 'CircuitOpenError', 'GuardedProvider', 'guarded_providers',
+]
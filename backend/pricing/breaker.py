@@ -0,0 +1,130 @@
+from typing import Callable, Dict, List, Optional, TypeVar
+import logging
+import threading
+import time
+
+from .providers import QuoteProvider
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a provider whose circuit is open.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing.
+
+    - Closed: calls go through; `failure_threshold` consecutive failures (exceptions) open it.
+    - Open: calls fail fast with CircuitOpenError for `cooldown` seconds.
+    - Half-open: after the cool-down a single probe call goes through; success closes the
+      circuit, failure opens it for another cool-down.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        cooldown: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self.clock() - self._opened_at >= self.cooldown:
+            return HALF_OPEN
+        return self._state
+
+    def available(self) -> bool:
+        """
+        Whether a call would be let through right now (does not take the half-open probe).
+        """
+        with self._lock:
+            state = self._current_state()
+            return state == CLOSED or (state == HALF_OPEN and not self._probing)
+
+    def call(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        with self._lock:
+            state = self._current_state()
+            if state == OPEN or (state == HALF_OPEN and self._probing):
+                self._stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            if state == HALF_OPEN:
+                self._probing = True
+            self._stats["calls"] += 1
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._record(ok=False)
+            raise
+        self._record(ok=True)
+        return result
+
+    def wrap(self, fn: Callable[..., T]) -> Callable[..., T]:
+        return lambda *args, **kwargs: self.call(fn, *args, **kwargs)
+
+    def _record(self, ok: bool) -> None:
+        with self._lock:
+            probe, self._probing = self._probing, False
+            if ok:
+                self._state, self._failures = CLOSED, 0
+                return
+            self._failures += 1
+            self._stats["failures"] += 1
+            if probe or self._failures >= self.failure_threshold:
+                logger.warning(f"Opening {self.name} circuit for {self.cooldown:.0f}s after {self._failures} failures.")
+                self._state, self._opened_at = OPEN, self.clock()
+                self._stats["opened"] += 1
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return dict(self._stats, state=self._current_state(), consecutive_failures=self._failures)
+
+
+class GuardedProvider(QuoteProvider):
+    """
+    Routes every call to `inner` through a circuit breaker.
+    """
+
+    def __init__(self, inner: QuoteProvider, breaker: CircuitBreaker):
+        self.inner = inner
+        self.breaker = breaker
+        self.name = inner.name
+
+    def available(self) -> bool:
+        return self.breaker.available()
+
+    def fetch(self, target: str) -> Optional[float]:
+        return self.breaker.call(self.inner.fetch, target)
+
+    def fetch_many(self, targets: List[str]) -> Dict[str, float]:
+        return self.breaker.call(self.inner.fetch_many, targets)
+
+
+def guarded_providers(providers: Dict[str, QuoteProvider], breakers: Dict[str, CircuitBreaker]) -> Dict[str, QuoteProvider]:
+    return {
+        name: GuardedProvider(provider, breakers[name]) if name in breakers else provider
+        for name, provider in providers.items()
+    }
@@ -0,0 +1,154 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Iterable, Optional, Tuple
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FX_KEY = ("TWD=X", "FX")
+
+# Seconds a quote is considered fresh, per asset type (second element of the key)
+DEFAULT_TTLS = {
+    "TW_STOCK": 60.0,
+    "US_STOCK": 60.0,
+    "FX": 300.0,
+}
+
+
+class StaleClose(float):
+    """
+    A close older than the last session of its market, served because upstream could not
+    refresh it (see PriceStore.latest_closes). Used as a float; QuoteEngine reports its key
+    in QuoteSnapshot.stale and PriceCache does not keep it as a fresh quote.
+    """
+
+
+@dataclass
+class CacheEntry:
+    value: float
+    stored_at: float
+
+
+class PriceCache:
+    """
+    Process-wide LRU cache for quotes keyed by (symbol, asset type).
+
+    - Fresh entries (younger than the TTL of their market) are returned directly.
+    - Stale entries (up to `max_stale` seconds past the TTL) are still returned, and a
+      background refresh is scheduled (stale-while-revalidate).
+    - Anything older is a miss and is loaded synchronously.
+    Failed loads (falsy values, e.g. the 0.0 returned by get_stock_price) and StaleClose values
+    are never cached.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        default_ttl: float = 60.0,
+        max_stale: float = 24 * 3600.0,
+        max_entries: int = 2048,
+        refresh_workers: int = 4,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.max_stale = max_stale
+        self.max_entries = max_entries
+        self.clock = clock
+
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="quote-refresh")
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "evictions": 0}
+
+    def ttl_for(self, key: Tuple[str, str]) -> float:
+        return self.ttls.get(key[1], self.default_ttl)
+
+    def peek(self, key: Tuple[str, str]) -> Optional[Tuple[float, bool]]:
+        """
+        Returns (value, is_fresh), or None on a miss. Updates the counters.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry.stored_at
+                ttl = self.ttl_for(key)
+                if age <= ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry.value, True
+                if age <= ttl + self.max_stale:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    return entry.value, False
+            self._stats["misses"] += 1
+            return None
+
+    def last_known(self, key: Tuple[str, str]) -> Optional[float]:
+        """
+        The cached value whatever its age (a fallback when upstream cannot answer in time).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry.value if entry is not None else None
+
+    def put(self, key: Tuple[str, str], value: Optional[float]) -> None:
+        if not value or isinstance(value, StaleClose):
+            return
+        with self._lock:
+            self._entries[key] = CacheEntry(value=value, stored_at=self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get_or_load(self, key: Tuple[str, str], loader: Callable[[], Optional[float]]) -> Optional[float]:
+        cached = self.peek(key)
+        if cached is not None:
+            value, fresh = cached
+            if not fresh:
+                self.refresh([key], lambda keys: {key: loader()})
+            return value
+
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def refresh(self, keys: Iterable[Tuple[str, str]], loader: Callable[[list], Dict[Tuple[str, str], float]]) -> None:
+        """
+        Reloads `keys` in the background. Keys already being refreshed are skipped.
+        """
+        with self._lock:
+            keys = [k for k in keys if k not in self._in_flight]
+            self._in_flight.update(keys)
+        if not keys:
+            return
+
+        def run():
+            try:
+                for key, value in loader(keys).items():
+                    self.put(key, value)
+                with self._lock:
+                    self._stats["refreshes"] += 1
+            except Exception as e:
+                logger.warning(f"Background quote refresh failed for {keys}: {e}")
+            finally:
+                with self._lock:
+                    self._in_flight.difference_update(keys)
+
+        self._executor.submit(run)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, size=len(self._entries), in_flight=len(self._in_flight))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            for name in self._stats:
+                self._stats[name] = 0
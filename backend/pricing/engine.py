@@ -0,0 +1,460 @@
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed, wait
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+import logging
+import threading
+import time
+
+import pandas as pd
+import yfinance as yf
+
+from .cache import PriceCache, FX_KEY, StaleClose
+from .resolution import ResolutionIndex, Route
+
+logger = logging.getLogger(__name__)
+
+QuoteKey = Tuple[str, str]  # (symbol, asset type used for the lookup)
+
+
+def in_background(fn: Callable, *args) -> Future:
+    """
+    Runs fn(*args) on its own daemon thread, so a request can stop waiting at its budget
+    while the fetch finishes (and fills the cache) in the background. A shared pool would
+    let fetches stuck on a hanging provider delay the next requests' fetches.
+    """
+    future: Future = Future()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(*args))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True, name="quote-fetch").start()
+    return future
+
+
+# Upstream fetches still running, by (cache, key): engines sharing a cache wait on a fetch an
+# earlier request started instead of asking the same (possibly hanging) provider again
+PendingFetch = Tuple[Future, Dict[QuoteKey, float]]
+_pending: Dict[Tuple[int, QuoteKey], PendingFetch] = {}
+_pending_lock = threading.Lock()
+
+
+# Futures are priced through their underlying stock (see services.calculate_net_worth).
+TW_SYMBOL_MAP = {
+    "QSF": "8299",
+    "TX": "2330",
+    "MTX": "^TWII",
+    "ZEF": "2303",
+}
+
+
+def quote_routes(symbol: str, type: str) -> List[Route]:
+    """
+    Every (provider, target) that can price a symbol, in fallback order.
+    """
+    if type == "US_STOCK":
+        return [("yfinance", symbol)]
+    if type == "TW_STOCK":
+        routes = [("yfinance", f"{symbol}.TW"), ("yfinance", f"{symbol}.TWO")]
+        search_symbol = TW_SYMBOL_MAP.get(symbol, symbol)
+        if search_symbol != symbol:
+            routes += [("yfinance", f"{search_symbol}.TW"), ("yfinance", f"{search_symbol}.TWO")]
+        routes += [("twstock", search_symbol), ("twse", symbol)]
+        return routes
+    return []
+
+
+def tw_candidates(symbol: str, resolution: Optional[ResolutionIndex] = None) -> List[str]:
+    """
+    Yahoo tickers to try for a Taiwan symbol, in the same order as get_stock_price.
+    With a resolution index, a known-good ticker is used alone and recently failed ones are dropped
+    (unless every route failed, as in fetch_stock_price).
+    """
+    routes = quote_routes(symbol, "TW_STOCK")
+    if resolution is not None:
+        good = resolution.known_good(symbol, "TW_STOCK")
+        if good is not None and good[0] == "yfinance":
+            return [good[1]]
+        failed = resolution.failed(symbol, "TW_STOCK")
+        if not failed.issuperset(routes): # Every route failed recently: probe them all again
+            routes = [r for r in routes if r not in failed]
+    return [target for provider, target in routes if provider == "yfinance"]
+
+
+def download_closes(tickers: List[str]) -> Dict[str, float]:
+    """
+    Fetches the latest close for many Yahoo tickers with a single yf.download call.
+    Tickers without data are left out of the result.
+    """
+    if not tickers:
+        return {}
+
+    df = yf.download(
+        tickers,
+        period="1d",
+        group_by="ticker",
+        progress=False,
+        threads=True,
+    )
+    if df is None or df.empty:
+        return {}
+
+    closes = {}
+    for ticker in tickers:
+        try:
+            if isinstance(df.columns, pd.MultiIndex):
+                series = df[ticker]["Close"]
+            else:
+                series = df["Close"]
+        except KeyError:
+            continue
+        series = series.dropna()
+        if not series.empty:
+            closes[ticker] = float(series.iloc[-1])
+    return closes
+
+
+BAR_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+
+def download_bars(tickers: List[str], start: date, end: date) -> Dict[str, pd.DataFrame]:
+    """
+    Daily OHLCV bars for many Yahoo tickers from `start` to `end` (inclusive) with a single
+    yf.download call: one frame per ticker (BAR_COLUMNS, indexed by date). Tickers without
+    data are left out.
+    """
+    if not tickers:
+        return {}
+
+    df = yf.download(
+        tickers,
+        start=start.isoformat(),
+        end=(end + timedelta(days=1)).isoformat(),
+        group_by="ticker",
+        progress=False,
+        threads=True,
+        auto_adjust=False,
+    )
+    if df is None or df.empty:
+        return {}
+
+    bars = {}
+    for ticker in tickers:
+        try:
+            frame = df[ticker] if isinstance(df.columns, pd.MultiIndex) else df
+            frame = frame.reindex(columns=BAR_COLUMNS).dropna(subset=["Close"])
+        except KeyError:
+            continue
+        if not frame.empty:
+            frame.index = pd.to_datetime(frame.index).date
+            bars[ticker] = frame
+    return bars
+
+
+def download_history(tickers: List[str], start: date, end: date) -> pd.DataFrame:
+    """
+    Daily closes for many Yahoo tickers from `start` to `end` (inclusive) with a single
+    yf.download call: one column per ticker, indexed by date. Tickers without data are left out.
+    """
+    return closes_frame(download_bars(tickers, start, end))
+
+
+def closes_frame(bars: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    if not bars:
+        return pd.DataFrame()
+    return pd.DataFrame({ticker: frame["Close"] for ticker, frame in bars.items()})
+
+
+@dataclass
+class QuoteSnapshot:
+    """
+    Prices resolved for one valuation pass. `stale` holds the keys (FX_KEY for the rate)
+    priced with their last known value because upstream failed or the budget ran out, or
+    with a StaleClose;
+    `pending` the ones still being fetched (see QuoteEngine.snapshots).
+    """
+    usd_rate: float
+    prices: Dict[QuoteKey, float] = field(default_factory=dict)
+    stale: Set[QuoteKey] = field(default_factory=set)
+    pending: Set[QuoteKey] = field(default_factory=set)
+
+    def price(self, symbol: str, type: str) -> float:
+        return self.prices.get((symbol, type), 0.0)
+
+
+class QuoteEngine:
+    """
+    Resolves all quotes of a portfolio at once instead of one asset at a time.
+
+    1. One batched download per market (US tickers, then TW tickers with every
+       suffix / mapped candidate) plus the FX rate, all running concurrently.
+    2. Symbols the batch could not price go through `single_fetcher`
+       (the full get_stock_price fallback chain) in a thread pool.
+
+    With a `cache`, fresh quotes are served from memory, stale ones are served and
+    refreshed in the background, and only misses are fetched before returning.
+
+    With a `budget` (seconds), a snapshot waits at most that long for upstream: quotes
+    still missing then (or that failed) take their last cached value and are reported in
+    QuoteSnapshot.stale, while the fetch finishes in the background and fills the cache.
+    """
+
+    def __init__(
+        self,
+        single_fetcher: Callable[[str, str], float],
+        fx_fetcher: Callable[[], float],
+        batch_fetcher: Callable[[List[str]], Dict[str, float]] = download_closes,
+        max_workers: int = 16,
+        cache: Optional[PriceCache] = None,
+        resolution: Optional[ResolutionIndex] = None,
+        budget: Optional[float] = None,
+        fallback_usd_rate: float = 32.0,
+    ):
+        self.single_fetcher = single_fetcher
+        self.fx_fetcher = fx_fetcher
+        self.batch_fetcher = batch_fetcher
+        self.max_workers = max_workers
+        self.cache = cache
+        self.resolution = resolution
+        self.budget = budget
+        self.fallback_usd_rate = fallback_usd_rate
+
+    def snapshot(self, keys: Iterable[QuoteKey]) -> QuoteSnapshot:
+        keys = list(dict.fromkeys(keys))  # dedupe, keep order
+        deadline = None if self.budget is None else time.monotonic() + self.budget
+
+        prices: Dict[QuoteKey, float] = {}
+        if self.cache is not None:
+            stale = []
+            for key in keys:
+                cached = self.cache.peek(key)
+                if cached is not None:
+                    prices[key] = cached[0]
+                    if not cached[1]:
+                        stale.append(key)
+            if stale:
+                self.cache.refresh(stale, self.fetch_prices)
+
+        fx_future = in_background(self.fx_fetcher)
+        misses = [k for k in keys if k not in prices]
+        fetches = self._join_or_start(misses) if misses else []
+        finished = [self._wait(future, deadline) for future, _ in fetches]
+        fetched: Dict[QuoteKey, float] = {}
+        for _, progress in fetches:
+            fetched.update(progress.copy())
+        prices.update((key, fetched[key]) for key in misses if key in fetched)
+        if not all(finished):
+            pending = sum(1 for key in misses if key not in fetched)
+            logger.warning(f"Quote budget of {self.budget}s ran out with {pending} quotes pending.")
+
+        snapshot = QuoteSnapshot(usd_rate=self.fallback_usd_rate, prices=prices)
+        for key in misses:
+            if not prices.get(key):
+                self._use_last_known(snapshot, key)
+            elif isinstance(prices[key], StaleClose):
+                snapshot.stale.add(key)
+        if self._wait(fx_future, deadline):
+            snapshot.usd_rate = fx_future.result()
+            if isinstance(snapshot.usd_rate, StaleClose):
+                snapshot.stale.add(FX_KEY)
+        else:
+            self._use_last_known(snapshot, FX_KEY)
+        return snapshot
+
+    def snapshots(self, keys: Iterable[QuoteKey], poll_interval: float = 0.05) -> Iterator[QuoteSnapshot]:
+        """
+        Progressive `snapshot`. The first snapshot comes straight from the cache: fresh quotes,
+        and the last known value (0.0 if none) of the others, which are listed as pending.
+        A new snapshot follows each time more pending quotes resolve, until none are left;
+        quotes still pending when the budget runs out keep their last known value as stale.
+        """
+        keys = list(dict.fromkeys(keys))
+        deadline = None if self.budget is None else time.monotonic() + self.budget
+
+        snapshot = QuoteSnapshot(usd_rate=self._last_known(FX_KEY) or self.fallback_usd_rate)
+        for key in keys:
+            cached = self.cache.peek(key) if self.cache is not None else None
+            if cached is not None and cached[1]:
+                snapshot.prices[key] = cached[0]
+            else:
+                snapshot.prices[key] = self._last_known(key) or 0.0
+                snapshot.pending.add(key)
+        fx = self.cache.peek(FX_KEY) if self.cache is not None else None
+        futures: Dict[Future, Dict[QuoteKey, float]] = {}
+        if fx is None or not fx[1]:
+            snapshot.pending.add(FX_KEY)
+            fx_progress: Dict[QuoteKey, float] = {}
+            futures[in_background(lambda: fx_progress.setdefault(FX_KEY, self.fx_fetcher()))] = fx_progress
+        stock_keys = [k for k in keys if k in snapshot.pending]
+        if stock_keys:
+            futures.update(self._join_or_start(stock_keys))
+        yield self._copy(snapshot)
+
+        while snapshot.pending:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            wait(futures, timeout=poll_interval if remaining is None else min(poll_interval, remaining))
+            everything_done = all(f.done() for f in futures)
+            resolved = {}
+            for progress in futures.values():
+                resolved.update((k, v) for k, v in progress.copy().items() if k in snapshot.pending)
+            if everything_done:
+                # Keys a finished fetch did not report (it raised) are failures
+                resolved.update((k, 0.0) for k in snapshot.pending if k not in resolved)
+            if not resolved:
+                continue
+            for key, price in resolved.items():
+                snapshot.pending.discard(key)
+                if not price:
+                    self._use_last_known(snapshot, key)
+                    continue
+                if key == FX_KEY:
+                    snapshot.usd_rate = price
+                else:
+                    snapshot.prices[key] = price
+                if isinstance(price, StaleClose):
+                    snapshot.stale.add(key)
+            yield self._copy(snapshot)
+
+        if snapshot.pending:
+            logger.warning(f"Quote budget of {self.budget}s ran out with {len(snapshot.pending)} quotes pending.")
+            for key in list(snapshot.pending):
+                snapshot.pending.discard(key)
+                self._use_last_known(snapshot, key)
+            yield self._copy(snapshot)
+
+    @staticmethod
+    def _copy(snapshot: QuoteSnapshot) -> QuoteSnapshot:
+        return QuoteSnapshot(
+            usd_rate=snapshot.usd_rate, prices=dict(snapshot.prices),
+            stale=set(snapshot.stale), pending=set(snapshot.pending),
+        )
+
+    def _last_known(self, key: QuoteKey) -> Optional[float]:
+        return self.cache.last_known(key) if self.cache is not None else None
+
+    def _join_or_start(self, keys: List[QuoteKey]) -> List[PendingFetch]:
+        """
+        Fetches for `keys`: the ones already running for this cache, plus one new fetch
+        (started in the background) for the rest.
+        """
+        if self.cache is None:
+            return [self._start_fetch(keys)]
+        with _pending_lock:
+            fetches = {}
+            for key in keys:
+                pending = _pending.get((id(self.cache), key))
+                if pending is not None:
+                    fetches[id(pending[0])] = pending
+            new = [k for k in keys if (id(self.cache), k) not in _pending]
+            if new:
+                started = self._start_fetch(new)
+                fetches[id(started[0])] = started
+                for key in new:
+                    _pending[(id(self.cache), key)] = started
+        if new:
+            started[0].add_done_callback(lambda _: self._forget(new, started))
+        return list(fetches.values())
+
+    def _start_fetch(self, keys: List[QuoteKey]) -> PendingFetch:
+        progress: Dict[QuoteKey, float] = {}
+        return in_background(self._fetch_and_cache, keys, progress), progress
+
+    def _forget(self, keys: List[QuoteKey], fetch: PendingFetch) -> None:
+        with _pending_lock:
+            for key in keys:
+                if _pending.get((id(self.cache), key)) is fetch:
+                    del _pending[(id(self.cache), key)]
+
+    def _wait(self, future: Future, deadline: Optional[float]) -> bool:
+        """
+        Waits for `future` until the deadline; False when it is still running.
+        """
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeoutError:
+            return False
+        return True
+
+    def _use_last_known(self, snapshot: QuoteSnapshot, key: QuoteKey) -> None:
+        last = self._last_known(key)
+        if not last:
+            if key != FX_KEY:
+                snapshot.prices[key] = 0.0
+            return
+        if key == FX_KEY:
+            snapshot.usd_rate = last
+        else:
+            snapshot.prices[key] = last
+        snapshot.stale.add(key)
+
+    def _fetch_and_cache(self, keys: List[QuoteKey], into: Dict[QuoteKey, float]) -> None:
+        self.fetch_prices(keys, into=into)
+        if self.cache is not None:
+            for key, price in list(into.items()):
+                self.cache.put(key, price)
+
+    def fetch_prices(self, keys: List[QuoteKey], into: Optional[Dict[QuoteKey, float]] = None) -> Dict[QuoteKey, float]:
+        """
+        Fetches `keys` from upstream, bypassing the cache. Prices are also written to `into`
+        as they resolve, so a caller that stops waiting keeps the ones found so far.
+        """
+        us_symbols = [s for s, t in keys if t == "US_STOCK"]
+        tw_symbols = [s for s, t in keys if t == "TW_STOCK"]
+        prices: Dict[QuoteKey, float] = {} if into is None else into
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            us_future = pool.submit(self._safe_batch, us_symbols)
+            candidates = {s: tw_candidates(s, self.resolution) for s in tw_symbols}
+            tw_future = pool.submit(
+                self._safe_batch,
+                [c for s in tw_symbols for c in candidates[s]],
+            )
+
+            us_closes = us_future.result()
+            for symbol in us_symbols:
+                if symbol in us_closes:
+                    prices[(symbol, "US_STOCK")] = us_closes[symbol]
+
+            tw_closes = tw_future.result()
+            for symbol in tw_symbols:
+                for candidate in candidates[symbol]:
+                    if candidate in tw_closes:
+                        prices[(symbol, "TW_STOCK")] = tw_closes[candidate]
+                        if self.resolution is not None:
+                            self.resolution.record(symbol, "TW_STOCK", ("yfinance", candidate), True)
+                        break
+
+            # Outdated closes are kept only if the per-symbol fallback finds nothing better
+            misses = [k for k in keys if k not in prices or isinstance(prices[k], StaleClose)]
+            if misses:
+                logger.info(f"Batch download missed {len(misses)} quotes, falling back per symbol.")
+            futures = {pool.submit(self._safe_single, key): key for key in misses}
+            for future in as_completed(futures):
+                key, price = futures[future], future.result()
+                if key not in prices or (price and not isinstance(price, StaleClose)):
+                    prices[key] = price
+
+        return prices
+
+    def _safe_batch(self, tickers: List[str]) -> Dict[str, float]:
+        try:
+            return self.batch_fetcher(tickers)
+        except Exception as e:
+            logger.warning(f"Batch download failed for {len(tickers)} tickers: {e}")
+            return {}
+
+    def _safe_single(self, key: QuoteKey) -> float:
+        symbol, type = key
+        try:
+            return self.single_fetcher(symbol, type)
+        except Exception as e:
+            logger.error(f"Error fetching price for {symbol}: {e}")
+            return 0.0
@@ -0,0 +1,220 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+import requests
+import twstock
+import urllib3
+
+from .engine import download_closes
+from .resolution import BASE_DIR
+from .store import PriceStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RECORDING_PATH = os.path.join(BASE_DIR, "quote_recording.json")
+
+
+class QuoteProvider(ABC):
+    """
+    One upstream source of last prices. Targets are provider specific (see quote_routes):
+    Yahoo tickers for "yfinance", stock numbers for "twstock" and "twse".
+    Subclasses implement `fetch`, and may override `fetch_many` to batch.
+    """
+    name = ""
+
+    def available(self) -> bool:
+        """
+        False while the provider should not be called (see breaker.GuardedProvider).
+        """
+        return True
+
+    @abstractmethod
+    def fetch(self, target: str) -> Optional[float]:
+        """
+        Last price of one target, or None when the provider has none. May raise on network errors.
+        """
+
+    def fetch_many(self, targets: List[str]) -> Dict[str, float]:
+        """
+        Last prices of many targets; targets without a price are left out.
+        """
+        prices = {}
+        for target in targets:
+            price = self.fetch(target)
+            if price:
+                prices[target] = price
+        return prices
+
+
+class YahooProvider(QuoteProvider):
+    """
+    Yahoo Finance. With a price store, closes are read from it (only bars after the last
+    stored day are downloaded); otherwise the latest close is downloaded directly.
+
+    `breaker` is the circuit breaker guarding the store's downloads: while it is open the
+    provider reports itself unavailable, so single lookups skip it instead of recording a
+    miss, and batch lookups still get the closes stored before the outage.
+    """
+    name = "yfinance"
+
+    def __init__(self, store: Optional[PriceStore] = None, breaker=None):
+        self.store = store
+        self.breaker = breaker
+
+    def available(self) -> bool:
+        return self.breaker is None or self.breaker.available()
+
+    def fetch(self, target: str) -> Optional[float]:
+        return self.fetch_many([target]).get(target)
+
+    def fetch_many(self, targets: List[str]) -> Dict[str, float]:
+        if self.store is not None:
+            return self.store.latest_closes(targets)
+        return download_closes(targets)
+
+
+class TwstockProvider(QuoteProvider):
+    """
+    twstock realtime/recent prices for Taiwan stocks.
+    """
+    name = "twstock"
+
+    def fetch(self, target: str) -> Optional[float]:
+        stock = twstock.Stock(target)
+        if not stock.price:
+            stock.fetch_31()
+        return stock.price[-1] if stock.price else None
+
+
+class TwseProvider(QuoteProvider):
+    """
+    Last close from the TWSE STOCK_DAY report of the current month. Last resort: SSL
+    verification is disabled because the TWSE certificate chain fails on some systems.
+    """
+    name = "twse"
+    URL = "https://www.twse.com.tw/exchangeReport/STOCK_DAY?response=json&stockNo={}"
+
+    def __init__(self, timeout: float = 10.0):
+        self.timeout = timeout
+
+    def fetch(self, target: str) -> Optional[float]:
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        response = requests.get(self.URL.format(target), verify=False, timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        if data['stat'] != 'OK':
+            return None
+        # Rows: ["Date", "Trade Volume", "Trade Value", "Opening Price", "Highest Price", "Lowest Price", "Closing Price", ...]
+        last_day = data['data'][-1]
+        return float(last_day[6].replace(',', ''))
+
+
+class QuoteRecording:
+    """
+    Captured provider responses, kept in one JSON file: {provider: {target: price or null}}.
+    A null price records that the provider had nothing for the target.
+    """
+
+    def __init__(self, path: str = DEFAULT_RECORDING_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.responses: Dict[str, Dict[str, Optional[float]]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.responses = json.load(f)
+
+    def lookup(self, provider: str, target: str) -> Tuple[bool, Optional[float]]:
+        """
+        Returns (was recorded, price).
+        """
+        with self._lock:
+            responses = self.responses.get(provider, {})
+            return target in responses, responses.get(target)
+
+    def record(self, provider: str, target: str, price: Optional[float]) -> None:
+        with self._lock:
+            self.responses.setdefault(provider, {})[target] = float(price) if price else None
+
+    def save(self) -> None:
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.responses, f, indent=1, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+class RecordingProvider(QuoteProvider):
+    """
+    Passes lookups through to `inner` and captures every response, saving the recording
+    after each call.
+    """
+
+    def __init__(self, inner: QuoteProvider, recording: QuoteRecording):
+        self.inner = inner
+        self.recording = recording
+        self.name = inner.name
+
+    def available(self) -> bool:
+        return self.inner.available()
+
+    def fetch(self, target: str) -> Optional[float]:
+        price = self.inner.fetch(target)
+        self.recording.record(self.name, target, price)
+        self.recording.save()
+        return price
+
+    def fetch_many(self, targets: List[str]) -> Dict[str, float]:
+        prices = self.inner.fetch_many(targets)
+        for target in targets:
+            self.recording.record(self.name, target, prices.get(target))
+        self.recording.save()
+        return prices
+
+
+class ReplayProvider(QuoteProvider):
+    """
+    Serves the responses of a QuoteRecording without touching the network; targets that
+    were never recorded have no price. `latency` (seconds per call) simulates upstream
+    round trips for load tests while keeping runs deterministic.
+    """
+
+    def __init__(self, name: str, recording: QuoteRecording, latency: float = 0.0):
+        self.name = name
+        self.recording = recording
+        self.latency = latency
+
+    def fetch(self, target: str) -> Optional[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self.recording.lookup(self.name, target)[1]
+
+    def fetch_many(self, targets: List[str]) -> Dict[str, float]:
+        if self.latency:
+            time.sleep(self.latency)
+        prices = {}
+        for target in targets:
+            price = self.recording.lookup(self.name, target)[1]
+            if price:
+                prices[target] = price
+        return prices
+
+
+PROVIDER_NAMES = (YahooProvider.name, TwstockProvider.name, TwseProvider.name)
+
+
+def live_providers(store: Optional[PriceStore] = None, store_breaker=None) -> Dict[str, QuoteProvider]:
+    return {p.name: p for p in (YahooProvider(store, store_breaker), TwstockProvider(), TwseProvider())}
+
+
+def recording_providers(providers: Dict[str, QuoteProvider], recording: QuoteRecording) -> Dict[str, QuoteProvider]:
+    return {name: RecordingProvider(provider, recording) for name, provider in providers.items()}
+
+
+def replay_providers(recording: QuoteRecording, latency: float = 0.0) -> Dict[str, QuoteProvider]:
+    return {name: ReplayProvider(name, recording, latency) for name in PROVIDER_NAMES}
@@ -0,0 +1,125 @@
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INDEX_PATH = os.path.join(BASE_DIR, "quote_resolution.db")
+
+Route = Tuple[str, str]  # (provider, target), e.g. ("yfinance", "8299.TWO")
+
+
+class RouteState(NamedTuple):
+    ok_at: Optional[float]  # Last success, if any
+    failures: int  # Failures since the last success
+    checked_at: float
+
+
+class ResolutionIndex:
+    """
+    Remembers which provider/target worked (or failed) for each symbol.
+
+    Stored in its own SQLite file next to finance.db so quote lookups never
+    contend with imports for the main database lock.
+    - A known-good route is tried first, and stays preferred for `good_ttl` seconds after
+      its last success. It is only demoted after `max_failures` failures in a row, so one
+      upstream outage does not lose it.
+    - A failed route is skipped for `negative_ttl` seconds before being probed again, or
+      `retry_ttl` seconds if it worked before (a demoted known-good route).
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_INDEX_PATH,
+        good_ttl: float = 7 * 24 * 3600.0,
+        negative_ttl: float = 24 * 3600.0,
+        retry_ttl: float = 600.0,
+        max_failures: int = 3,
+        clock=time.time,
+    ):
+        self.path = path
+        self.good_ttl = good_ttl
+        self.negative_ttl = negative_ttl
+        self.retry_ttl = retry_ttl
+        self.max_failures = max_failures
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS symbol_routes (
+                symbol TEXT NOT NULL,
+                asset_type TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                target TEXT NOT NULL,
+                ok INTEGER NOT NULL,
+                checked_at REAL NOT NULL,
+                ok_at REAL,
+                failures INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (symbol, asset_type, provider, target)
+            )
+            """
+        )
+        self._conn.commit()
+
+        # In-memory mirror: (symbol, type) -> {route: RouteState}
+        self._routes: Dict[Tuple[str, str], Dict[Route, RouteState]] = {}
+        for symbol, asset_type, provider, target, ok_at, failures, checked_at in self._conn.execute(
+            "SELECT symbol, asset_type, provider, target, ok_at, failures, checked_at FROM symbol_routes"
+        ):
+            self._routes.setdefault((symbol, asset_type), {})[(provider, target)] = RouteState(ok_at, failures, checked_at)
+
+    def _worked(self, state: RouteState, now: float) -> bool:
+        return state.ok_at is not None and now - state.ok_at <= self.good_ttl
+
+    def _good(self, state: RouteState, now: float) -> bool:
+        return self._worked(state, now) and state.failures < self.max_failures
+
+    def known_good(self, symbol: str, asset_type: str) -> Optional[Route]:
+        now = self.clock()
+        with self._lock:
+            best = None
+            for route, state in self._routes.get((symbol, asset_type), {}).items():
+                if self._good(state, now) and (best is None or state.ok_at > best[1]):
+                    best = (route, state.ok_at)
+            return best[0] if best else None
+
+    def failed(self, symbol: str, asset_type: str) -> Set[Route]:
+        now = self.clock()
+        with self._lock:
+            return {
+                route
+                for route, state in self._routes.get((symbol, asset_type), {}).items()
+                if state.failures and not self._good(state, now)
+                and now - state.checked_at <= (self.retry_ttl if self._worked(state, now) else self.negative_ttl)
+            }
+
+    def record(self, symbol: str, asset_type: str, route: Route, ok: bool) -> None:
+        now = self.clock()
+        with self._lock:
+            routes = self._routes.setdefault((symbol, asset_type), {})
+            previous = routes.get(route)
+            if ok:
+                state = RouteState(now, 0, now)
+            else:
+                state = RouteState(previous.ok_at if previous else None, (previous.failures if previous else 0) + 1, now)
+            routes[route] = state
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO symbol_routes (symbol, asset_type, provider, target, ok, checked_at, ok_at, failures) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (symbol, asset_type, route[0], route[1], int(ok), now, state.ok_at, state.failures),
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Could not persist route {route} for {symbol}: {e}")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._routes.clear()
+            self._conn.execute("DELETE FROM symbol_routes")
+            self._conn.commit()
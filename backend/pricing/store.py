@@ -0,0 +1,283 @@
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from ..markets import ticker_market
+from .cache import StaleClose
+from .engine import BAR_COLUMNS, download_bars
+from .resolution import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = os.path.join(BASE_DIR, "price_history.db")
+
+# (tickers, start, end) -> {ticker: OHLCV frame indexed by date}, e.g. download_bars
+BarFetcher = Callable[[List[str], date, date], Dict[str, pd.DataFrame]]
+
+
+class EmptyDownloadError(Exception):
+    """
+    Raised by `expect_bars` when a download returned nothing for tickers that should have bars.
+    """
+
+
+def expect_bars(
+    fetcher: BarFetcher,
+    known: Callable[[str], bool] = lambda ticker: True,
+    today: Callable[[], date] = date.today,
+) -> BarFetcher:
+    """
+    Makes a download that returns no bars at all raise EmptyDownloadError when one of the
+    `known` tickers (ones that had data before) should have a bar in the range: its market
+    traded on a day before today (today's bar may not exist yet). yf.download logs the errors
+    of each ticker and returns an empty frame, so a circuit breaker around it would otherwise
+    count an outage as successful calls.
+    """
+    def fetch(tickers: List[str], start: date, end: date) -> Dict[str, pd.DataFrame]:
+        bars = fetcher(tickers, start, end)
+        if not bars:
+            last = min(end, today() - timedelta(days=1))
+            if any(known(ticker) and ticker_market(ticker).trades_between(start, last) for ticker in tickers):
+                raise EmptyDownloadError(f"No bars for {len(tickers)} tickers from {start} to {last}")
+        return bars
+    return fetch
+
+
+class CsvBarFetcher:
+    """
+    Serves bars from `<directory>/<ticker>.csv` files (Date,Open,High,Low,Close,Volume, the
+    layout DataFrame.to_csv writes for a yfinance frame) instead of the network.
+    Used for offline runs and tests; tickers without a file return no data.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._frames: Dict[str, Optional[pd.DataFrame]] = {}
+
+    def load(self, ticker: str) -> Optional[pd.DataFrame]:
+        if ticker not in self._frames:
+            path = os.path.join(self.directory, f"{ticker}.csv")
+            frame = None
+            if os.path.exists(path):
+                frame = pd.read_csv(path, index_col=0).reindex(columns=BAR_COLUMNS).dropna(subset=["Close"])
+                frame.index = pd.to_datetime(frame.index).date
+            self._frames[ticker] = frame
+        return self._frames[ticker]
+
+    def __call__(self, tickers: List[str], start: date, end: date) -> Dict[str, pd.DataFrame]:
+        bars = {}
+        for ticker in tickers:
+            frame = self.load(ticker)
+            if frame is None:
+                continue
+            in_range = [start <= d <= end for d in frame.index]
+            if any(in_range):
+                bars[ticker] = frame[in_range]
+        return bars
+
+
+class PriceStore:
+    """
+    Local daily price history (OHLCV bars) per Yahoo ticker: TW / TWO stocks, US stocks,
+    the underlyings futures are priced with, and the TWD=X FX series.
+
+    Stored in its own SQLite file next to finance.db, like the resolution index, so quote
+    lookups never contend with imports for the main database lock.
+    - `sync` only downloads what is not stored yet: the days after a ticker's synced range
+      (and before it, when an earlier start is asked for). Tickers missing the same range
+      share one download.
+    - Days before today are final once synced. Today's bar is provisional: the next sync
+      downloads it again.
+    - A ticker counts as synced for a range only when the download returned bars for it: a
+      ticker dropped from a batch download (rate limit, timeout) is asked for again on the
+      next sync instead of leaving a hole. Tickers that never return data are left to the
+      resolution index.
+    - Failed downloads are logged and leave the stored bars readable (offline mode).
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_STORE_PATH,
+        fetcher: BarFetcher = download_bars,
+        lookback_days: int = 10,
+        today: Callable[[], date] = date.today,
+    ):
+        self.path = path
+        self.fetcher = fetcher
+        self.lookback_days = lookback_days
+        self.today = today
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS price_bars (
+                ticker TEXT NOT NULL,
+                date TEXT NOT NULL,
+                open REAL,
+                high REAL,
+                low REAL,
+                close REAL NOT NULL,
+                volume REAL,
+                PRIMARY KEY (ticker, date)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS price_sync (
+                ticker TEXT PRIMARY KEY,
+                first_date TEXT NOT NULL,
+                last_date TEXT NOT NULL
+            );
+            """
+        )
+        self._conn.commit()
+
+        # In-memory mirror of price_sync: ticker -> (first synced day, last final day).
+        # The synced range stays contiguous: gaps are downloaded along with what was asked for
+        self._coverage: Dict[str, Tuple[date, date]] = {
+            ticker: (date.fromisoformat(first), date.fromisoformat(last))
+            for ticker, first, last in self._conn.execute("SELECT ticker, first_date, last_date FROM price_sync")
+        }
+
+    def coverage(self, ticker: str) -> Optional[Tuple[date, date]]:
+        with self._lock:
+            return self._coverage.get(ticker)
+
+    def missing_ranges(self, ticker: str, start: Optional[date], end: date) -> List[Tuple[date, date]]:
+        covered = self.coverage(ticker)
+        if covered is None:
+            return [(start or end - timedelta(days=self.lookback_days), end)]
+        first, last = covered
+        ranges = []
+        if start is not None and start < first:
+            ranges.append((start, first - timedelta(days=1)))
+        if last < end:
+            ranges.append((last + timedelta(days=1), end))
+        return ranges
+
+    def sync(self, tickers: Iterable[str], start: Optional[date] = None, end: Optional[date] = None) -> int:
+        """
+        Downloads the bars of `tickers` between `start` (default: the last `lookback_days`
+        for new tickers) and `end` (default: today) that are not stored yet.
+        Returns the number of bars written.
+        """
+        today = self.today()
+        end = min(end or today, today)
+        batches: Dict[Tuple[date, date], List[str]] = {}
+        for ticker in dict.fromkeys(tickers):
+            for missing in self.missing_ranges(ticker, start, end):
+                batches.setdefault(missing, []).append(ticker)
+
+        written = 0
+        for (first, last), batch in batches.items():
+            try:
+                bars = self.fetcher(batch, first, last)
+            except Exception as e:
+                logger.warning(f"Price download failed for {len(batch)} tickers ({first} to {last}): {e}")
+                continue
+            written += self.write(bars)
+            returned = [ticker for ticker in batch if ticker in bars and not bars[ticker].empty]
+            if returned:
+                self.mark_synced(returned, first, min(last, today - timedelta(days=1)))
+        return written
+
+    def write(self, bars: Dict[str, pd.DataFrame]) -> int:
+        rows = [
+            (ticker, day.isoformat(), *(None if pd.isna(v) else float(v) for v in values))
+            for ticker, frame in bars.items()
+            for day, values in zip(frame.index, frame.reindex(columns=BAR_COLUMNS).itertuples(index=False))
+        ]
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO price_bars VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+        return len(rows)
+
+    def mark_synced(self, tickers: List[str], first: date, last: date) -> None:
+        with self._lock:
+            for ticker in tickers:
+                covered = self._coverage.get(ticker, (first, last))
+                synced = (min(first, covered[0]), max(last, covered[1]))
+                self._coverage[ticker] = synced
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO price_sync VALUES (?, ?, ?)",
+                    (ticker, synced[0].isoformat(), synced[1].isoformat()),
+                )
+            self._conn.commit()
+
+    def bars(self, ticker: str, start: Optional[date] = None, end: Optional[date] = None) -> pd.DataFrame:
+        """
+        Stored bars of one ticker (BAR_COLUMNS, indexed by date), without downloading.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT date, open, high, low, close, volume FROM price_bars"
+                " WHERE ticker = ? AND date BETWEEN ? AND ? ORDER BY date",
+                (ticker, (start or date.min).isoformat(), (end or date.max).isoformat()),
+            ).fetchall()
+        frame = pd.DataFrame([row[1:] for row in rows], columns=BAR_COLUMNS, dtype="float64")
+        frame.index = [date.fromisoformat(row[0]) for row in rows]
+        return frame
+
+    def closes(self, tickers: List[str], start: date, end: date) -> pd.DataFrame:
+        """
+        Stored closes between start and end: one column per ticker (tickers without any
+        bar are left out), indexed by date. Same shape as download_history.
+        """
+        if not tickers:
+            return pd.DataFrame()
+        placeholders = ", ".join("?" for _ in tickers)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT date, ticker, close FROM price_bars WHERE ticker IN ({placeholders})"
+                " AND date BETWEEN ? AND ?",
+                (*tickers, start.isoformat(), end.isoformat()),
+            ).fetchall()
+        if not rows:
+            return pd.DataFrame()
+        frame = pd.DataFrame(rows, columns=["date", "ticker", "close"]).pivot(index="date", columns="ticker", values="close")
+        frame.index = [date.fromisoformat(d) for d in frame.index]
+        frame.columns.name = None
+        return frame[[t for t in tickers if t in frame.columns]]
+
+    def history(self, tickers: List[str], start: date, end: date) -> pd.DataFrame:
+        """
+        Syncs, then reads closes: a drop-in for download_history (backfill.HistoryLoader).
+        """
+        self.sync(tickers, start=start, end=end)
+        return self.closes(tickers, start, end)
+
+    def latest_closes(self, tickers: List[str]) -> Dict[str, float]:
+        """
+        Syncs, then returns the last close of each ticker from the past `lookback_days`:
+        a drop-in for download_closes (QuoteEngine.batch_fetcher).
+        Tickers without a recent bar are left out. A close older than the last session of the
+        ticker's market before today (the sync failed) is returned as a StaleClose.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        if not tickers:
+            return {}
+        self.sync(tickers)
+        since = self.today() - timedelta(days=self.lookback_days)
+        placeholders = ", ".join("?" for _ in tickers)
+        with self._lock:
+            # SQLite returns the bare column (close) from the row holding MAX(date)
+            rows = self._conn.execute(
+                f"SELECT ticker, close, MAX(date) FROM price_bars WHERE ticker IN ({placeholders})"
+                " AND date >= ? GROUP BY ticker",
+                (*tickers, since.isoformat()),
+            ).fetchall()
+        today = self.today()
+        closes = {}
+        for ticker, close, day in rows:
+            expected = ticker_market(ticker).previous_trading_day(today)
+            closes[ticker] = StaleClose(close) if expected and date.fromisoformat(day) < expected else close
+        return closes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._coverage.clear()
+            self._conn.execute("DELETE FROM price_bars")
+            self._conn.execute("DELETE FROM price_sync")
+            self._conn.commit()
@@ -0,0 +1,73 @@
+"""
+Versioned response cache with ETags for read endpoints.
+
+A response is identified by its request (path and query string) and tagged with the
+versions (versions.py) of the tables it is built from. Requests whose If-None-Match carries
+the current tag get 304 Not Modified; otherwise the cached body is served while the tag
+still matches, and the response is rebuilt once any of its tables was written.
+"""
+from collections import OrderedDict
+from typing import Callable, Dict, Sequence, Tuple
+import hashlib
+import threading
+
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+
+from . import versions
+
+
+class ResponseCache:
+    """
+    In-process LRU of JSON bodies. Versions are read from the database on every request,
+    so writes from other processes (imports, the snapshot job in another worker) are seen.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"not_modified": 0, "hits": 0, "misses": 0}
+
+    def respond(self, request: Request, db: Session, tables: Sequence[str], render: Callable[[], bytes]) -> Response:
+        """
+        JSON response for `request`, rendered by `render` only when no cached body matches.
+        """
+        key = f"{request.url.path}?{request.url.query}"
+        # Versions are read before the data: a write in between makes the body newer than
+        # its tag, never older, and the next request rebuilds it
+        tag = versions.current(db, tables)
+        etag = '"' + hashlib.sha1(f"{key}|{sorted(tag.items())}".encode()).hexdigest()[:20] + '"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"} # Browsers revalidate with If-None-Match
+
+        if etag in (t.strip() for t in request.headers.get("if-none-match", "").split(",")):
+            self._count("not_modified")
+            return Response(status_code=304, headers=headers)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == etag:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return Response(entry[1], media_type="application/json", headers=headers)
+
+        body = render()
+        with self._lock:
+            self._stats["misses"] += 1
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return Response(body, media_type="application/json", headers=headers)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
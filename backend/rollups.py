@@ -0,0 +1,129 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Dict, Iterable, List
+import logging
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .models import NetWorthHistoryItem, NetWorthRollup, PnlRollup, RealizedProfitLoss
+
+logger = logging.getLogger(__name__)
+
+GRAINS = ("day", "week", "month")
+
+
+def period_start(day: date, grain: str) -> date:
+    if grain == "day":
+        return day
+    if grain == "week":
+        return day - timedelta(days=day.weekday())
+    if grain == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown grain: {grain}")
+
+
+def add_realized_pnl(db: Session, day: date, symbol: str, pnl: float, trades: int = 1) -> None:
+    """
+    Adds one realized PnL amount to the day, week and month rollups (upsert, no commit).
+    """
+    for grain in GRAINS:
+        stmt = insert(PnlRollup).values(
+            grain=grain, period_start=period_start(day, grain), symbol=symbol, pnl=pnl, trade_count=trades
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=["grain", "period_start", "symbol"],
+            set_={
+                "pnl": PnlRollup.pnl + stmt.excluded.pnl,
+                "trade_count": PnlRollup.trade_count + stmt.excluded.trade_count,
+            },
+        ))
+
+
+def rebuild_symbol_pnl(db: Session, symbol: str) -> None:
+    """
+    Recomputes one symbol's PnL rollups from realized_pnl, for writers that replace a
+    symbol's realized rows wholesale (FIFO recomputation).
+    """
+    db.query(PnlRollup).filter(PnlRollup.symbol == symbol).delete()
+    db.flush()
+    daily = db.execute(
+        select(RealizedProfitLoss.date, func.sum(RealizedProfitLoss.pnl), func.count())
+        .where(RealizedProfitLoss.symbol == symbol)
+        .group_by(RealizedProfitLoss.date)
+    )
+    for day, pnl, trades in daily:
+        add_realized_pnl(db, day, symbol, pnl, trades)
+
+
+def asset_class_values(details: Iterable[dict]) -> Dict[str, float]:
+    values: Dict[str, float] = defaultdict(float)
+    for item in details:
+        values[item["type"]] += item.get("value_twd") or 0.0
+    return values
+
+
+def record_net_worth(db: Session, day: date, details: List[dict]) -> None:
+    """
+    Stores a net-worth snapshot per asset class (no commit). Net worth is a level, so each
+    period keeps the values of its latest snapshot; an older snapshot than the one already
+    rolled up for a period leaves that period untouched.
+    """
+    values = asset_class_values(details)
+    for grain in GRAINS:
+        start = period_start(day, grain)
+        rows = db.query(NetWorthRollup).filter(
+            NetWorthRollup.grain == grain, NetWorthRollup.period_start == start
+        )
+        latest = max((row.as_of for row in rows), default=None)
+        if latest is not None and latest > day:
+            continue
+        # Replace the whole period, so classes that were sold out since do not linger
+        rows.delete()
+        db.add_all(
+            NetWorthRollup(grain=grain, period_start=start, asset_class=asset_class, value_twd=value, as_of=day)
+            for asset_class, value in values.items()
+        )
+    db.flush()
+
+
+def rebuild_net_worth(db: Session) -> None:
+    """
+    Recomputes the net-worth rollups from net_worth_history_items (no commit), in one pass
+    over the per-day class sums: each period keeps the classes of its latest day.
+    """
+    db.query(NetWorthRollup).delete()
+    db.flush()
+    daily = (
+        db.query(NetWorthHistoryItem.date, NetWorthHistoryItem.type, func.sum(NetWorthHistoryItem.value_twd))
+        .group_by(NetWorthHistoryItem.date, NetWorthHistoryItem.type)
+        .order_by(NetWorthHistoryItem.date)
+    )
+    latest: Dict[tuple, tuple] = {} # (grain, period_start) -> (as_of, {class: value})
+    for day, asset_class, value in daily:
+        for grain in GRAINS:
+            key = (grain, period_start(day, grain))
+            if key not in latest or latest[key][0] != day:
+                latest[key] = (day, {})
+            latest[key][1][asset_class] = value
+    rows = [
+        {"grain": grain, "period_start": start, "asset_class": asset_class, "value_twd": value, "as_of": as_of}
+        for (grain, start), (as_of, values) in latest.items()
+        for asset_class, value in values.items()
+    ]
+    if rows:
+        db.connection().execute(NetWorthRollup.__table__.insert(), rows)
+
+
+def rebuild_all(db: Session) -> None:
+    """
+    Recomputes every rollup from realized_pnl and the net-worth snapshots (no commit).
+    """
+    db.query(PnlRollup).delete()
+    db.flush()
+    symbols = [row[0] for row in db.query(RealizedProfitLoss.symbol).distinct()]
+    for symbol in symbols:
+        rebuild_symbol_pnl(db, symbol)
+    rebuild_net_worth(db)
+    logger.info(f"Rebuilt rollups for {len(symbols)} symbols.")
@@ -34,10 +34,26 @@ class NetWorthHistoryBase(BaseModel):
     date: date
     total_twd: float
     total_usd: float
-    details: List[Dict[str, Any]]
+
+class NetWorthHistoryCreate(NetWorthHistoryBase):
+    details: List[Dict[str, Any]] # Asset list as returned by calculate_net_worth
 
 class NetWorthHistory(NetWorthHistoryBase):
     id: int
+    by_class: Optional[Dict[str, float]] = None # TWD value per asset type, on request
+
+    class Config:
+        from_attributes = True
+
+class NetWorthHistoryItem(BaseModel):
+    date: date
+    asset_id: int
+    symbol: Optional[str] = None
+    type: str
+    quantity: Optional[float] = None
+    price: Optional[float] = None
+    value_twd: float
+    exposure: Optional[float] = None
 
     class Config:
         from_attributes = True
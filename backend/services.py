@@ -1,254 +1,200 @@
-import yfinance as yf
-import twstock
-import requests
 import logging
 import time
-import urllib3
+import os
+from typing import Dict, Optional
+import numpy as np
+from .pricing import (
+    QuoteEngine, PriceCache, PriceStore, CsvBarFetcher, ResolutionIndex, FX_KEY, quote_routes, download_bars, expect_bars,
+    QuoteProvider, QuoteRecording, live_providers, recording_providers, replay_providers,
+    CircuitBreaker, StaleClose, guarded_providers,
+)
+from .pricing.providers import DEFAULT_RECORDING_PATH, PROVIDER_NAMES
+from .pricing.resolution import DEFAULT_INDEX_PATH
+from .pricing.store import DEFAULT_STORE_PATH
+from .valuation import load_arrays, value_portfolio
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def get_usd_to_twd_rate():
+# Process-wide quote cache shared by get_stock_price, get_usd_to_twd_rate and calculate_net_worth
+price_cache = PriceCache()
+
+# Persistent symbol -> provider/suffix index, opened on first lookup
+resolution_index: Optional[ResolutionIndex] = None
+
+# Local daily price history, opened on first lookup. Set FINANCE_PRICE_FIXTURES to a directory
+# of <ticker>.csv files to serve prices from disk instead of Yahoo (offline runs, tests)
+price_store: Optional[PriceStore] = None
+
+# Quote providers by name (the provider half of a quote_routes route), built on first lookup.
+# FINANCE_QUOTE_MODE=record captures every upstream response to FINANCE_QUOTE_RECORDING,
+# FINANCE_QUOTE_MODE=replay serves them back without network access
+quote_providers: Optional[Dict[str, QuoteProvider]] = None
+
+# One circuit breaker per provider. Yahoo's guards the price store's downloads, so stored
+# closes are still served to batch lookups while it is open (single lookups skip Yahoo then,
+# see YahooProvider.available); the others guard the provider calls
+quote_breakers: Dict[str, CircuitBreaker] = {name: CircuitBreaker(name) for name in PROVIDER_NAMES}
+
+# Seconds /net-worth/current waits for upstream quotes before answering with last known prices
+QUOTE_BUDGET_SECONDS = float(os.environ.get("FINANCE_QUOTE_BUDGET", "3.0"))
+
+def fetch_usd_to_twd_rate():
+    """
+    Fetches USD/TWD from the Yahoo provider, bypassing the cache. Returns None on failure.
+    """
     try:
-        # Using yfinance to get USD/TWD rate
-        ticker = yf.Ticker("TWD=X")
-        data = ticker.history(period="1d")
-        if not data.empty:
-            return data['Close'].iloc[-1]
-        return 32.0 # Fallback
+        return get_quote_providers()["yfinance"].fetch(FX_KEY[0])
     except Exception as e:
         logger.error(f"Error fetching USD/TWD rate: {e}")
-        return 32.0
+    return None
+
+def get_usd_to_twd_rate():
+    rate = price_cache.get_or_load(FX_KEY, fetch_usd_to_twd_rate)
+    return rate if rate else price_cache.last_known(FX_KEY) or 32.0 # Fallback
 
 def get_stock_price(symbol: str, type: str):
-    try:
-        if type == "US_STOCK":
-            ticker = yf.Ticker(symbol)
-            data = ticker.history(period="1d")
-            if not data.empty:
-                return data['Close'].iloc[-1]
-        elif type == "TW_STOCK":
-            # Try yfinance with .TW first
-            for suffix in [".TW", ".TWO"]:
-                try:
-                    full_symbol = f"{symbol}{suffix}"
-                    ticker = yf.Ticker(full_symbol)
-                    data = ticker.history(period="1d")
-                    if not data.empty:
-                        price = data['Close'].iloc[-1]
-                        logger.info(f"Fetched {full_symbol} from yfinance: {price}")
-                        return price
-                except Exception as e:
-                    logger.warning(f"yfinance failed for {full_symbol}: {e}")
-            
-            # Map Future symbols to Underlying if needed
-            # This mapping should happen BEFORE trying yfinance if we want to fetch underlying price for futures
-            # But here we are inside "TW_STOCK" block.
-            # If type is TW_FUTURE, we called get_stock_price(symbol, "TW_STOCK").
-            # So symbol is "QSF".
-            # We need to map "QSF" to "8299" BEFORE yfinance loop if we want to fetch 8299.TW
-            
-            symbol_map = {
-                "QSF": "8299", 
-                "TX": "2330", 
-                "MTX": "^TWII", 
-                "ZEF": "2303", 
-            }
-            search_symbol = symbol_map.get(symbol, symbol)
-            
-            # Retry yfinance with mapped symbol
-            if search_symbol != symbol:
-                 for suffix in [".TW", ".TWO"]:
-                    try:
-                        full_symbol = f"{search_symbol}{suffix}"
-                        ticker = yf.Ticker(full_symbol)
-                        data = ticker.history(period="1d")
-                        if not data.empty:
-                            price = data['Close'].iloc[-1]
-                            logger.info(f"Fetched {full_symbol} (mapped from {symbol}) from yfinance: {price}")
-                            return price
-                    except Exception as e:
-                        logger.warning(f"yfinance failed for {full_symbol}: {e}")
-
-            # Fallback to twstock if yfinance fails
-            try:
-                logger.info(f"Falling back to twstock for {search_symbol}")
-                stock = twstock.Stock(search_symbol)
-                if not stock.price:
-                    stock.fetch_31()
-                if stock.price:
-                    price = stock.price[-1]
-                    logger.info(f"Fetched {symbol} from twstock: {price}")
-                    return price
-            except Exception as e:
-                logger.error(f"twstock fallback failed for {symbol}: {e}")
-                
-                # Last resort: Manual fetch with SSL verification disabled
-                try:
-                    logger.info(f"Attempting manual fetch for {symbol} with SSL disabled")
-                    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-                    # Mimic twstock's fetch logic simply or just get latest
-                    # This is a simplified fallback for current month
-                    url = f"https://www.twse.com.tw/exchangeReport/STOCK_DAY?response=json&stockNo={symbol}"
-                    response = requests.get(url, verify=False, timeout=10)
-                    if response.status_code == 200:
-                        data = response.json()
-                        if data['stat'] == 'OK':
-                            # Get last price from 'data' array
-                            # Format: ["Date", "Trade Volume", "Trade Value", "Opening Price", "Highest Price", "Lowest Price", "Closing Price", ...]
-                            last_day = data['data'][-1]
-                            closing_price = float(last_day[6].replace(',', ''))
-                            logger.info(f"Fetched {symbol} from manual request: {closing_price}")
-                            return closing_price
-                except Exception as manual_e:
-                    logger.error(f"Manual fallback failed for {symbol}: {manual_e}")
+    return price_cache.get_or_load((symbol, type), lambda: fetch_stock_price(symbol, type))
 
+def get_resolution_index() -> ResolutionIndex:
+    """
+    Lazily opens the symbol resolution index (quote_resolution.db next to finance.db,
+    or FINANCE_RESOLUTION_INDEX).
+    """
+    global resolution_index
+    if resolution_index is None:
+        resolution_index = ResolutionIndex(path=os.environ.get("FINANCE_RESOLUTION_INDEX", DEFAULT_INDEX_PATH))
+    return resolution_index
+
+def get_price_store() -> PriceStore:
+    """
+    Lazily opens the local price history (price_history.db next to finance.db, or
+    FINANCE_PRICE_STORE).
+    """
+    global price_store
+    if price_store is None:
+        fixtures = os.environ.get("FINANCE_PRICE_FIXTURES")
+        # An empty download counts as a breaker failure only for tickers the store has bars for:
+        # a batch of never-seen tickers may simply not exist
+        fetcher = CsvBarFetcher(fixtures) if fixtures else quote_breakers["yfinance"].wrap(
+            expect_bars(download_bars, known=lambda ticker: price_store.coverage(ticker) is not None)
+        )
+        price_store = PriceStore(path=os.environ.get("FINANCE_PRICE_STORE", DEFAULT_STORE_PATH), fetcher=fetcher)
+    return price_store
+
+def get_quote_providers() -> Dict[str, QuoteProvider]:
+    global quote_providers
+    if quote_providers is None:
+        mode = os.environ.get("FINANCE_QUOTE_MODE", "live")
+        recording_path = os.environ.get("FINANCE_QUOTE_RECORDING", DEFAULT_RECORDING_PATH)
+        if mode == "replay":
+            quote_providers = replay_providers(QuoteRecording(recording_path))
+        else:
+            guarded = {name: quote_breakers[name] for name in PROVIDER_NAMES if name != "yfinance"}
+            quote_providers = guarded_providers(live_providers(get_price_store(), quote_breakers["yfinance"]), guarded)
+            if mode == "record":
+                quote_providers = recording_providers(quote_providers, QuoteRecording(recording_path))
+    return quote_providers
+
+def fetch_route(route, symbol: str):
+    """
+    Fetches a price through a single (provider, target) route. Returns None on failure.
+    """
+    provider_name, target = route
+    provider = get_quote_providers().get(provider_name)
+    if provider is None:
+        return None
+    try:
+        price = provider.fetch(target)
+        if price:
+            logger.info(f"Fetched {symbol} from {provider_name} ({target}): {price}")
+            return price
     except Exception as e:
-        logger.error(f"Error fetching price for {symbol}: {e}")
-    
+        logger.warning(f"{provider_name} failed for {target}: {e}")
+    return None
+
+def fetch_stock_price(symbol: str, type: str):
+    """
+    Fetches a quote from upstream, bypassing the cache. Returns 0.0 when every source fails.
+
+    Routes are tried in quote_routes order, except that the route which worked last time
+    goes first and routes that failed recently are skipped (see ResolutionIndex). When every
+    route failed recently (an outage), they are all probed again rather than giving up.
+    """
+    index = get_resolution_index()
+    routes = quote_routes(symbol, type)
+
+    good = index.known_good(symbol, type)
+    if good in routes:
+        routes = [good] + [r for r in routes if r != good]
+    recently_failed = index.failed(symbol, type)
+    if recently_failed.issuperset(routes):
+        recently_failed = set()
+
+    providers = get_quote_providers()
+    outdated = None
+    for route in routes:
+        if route in recently_failed:
+            continue
+        if route[0] in providers and not providers[route[0]].available():
+            # Circuit open: skip without recording the route as failed
+            continue
+        price = fetch_route(route, symbol)
+        index.record(symbol, type, route, bool(price))
+        if isinstance(price, StaleClose):
+            # Stored close the price store could not refresh: used only if no route has a current one
+            outdated = outdated or price
+        elif price:
+            return price
+
+    if outdated:
+        logger.warning(f"Only an outdated close was found for {symbol}: {outdated}")
+        return outdated
     logger.error(f"All methods failed for {symbol}, returning 0.0")
     return 0.0
 
-def calculate_net_worth(assets):
-    total_twd = 0.0
-    total_usd = 0.0
-    total_exposure_twd = 0.0 # Total market exposure in TWD
-    usd_rate = get_usd_to_twd_rate()
-    
-    details = []
+def quote_key(asset):
+    """
+    (symbol, type) used to price an asset. Futures are priced through the underlying stock.
+    """
+    if asset.type == "US_STOCK":
+        return (asset.symbol, "US_STOCK")
+    if asset.type in ["TW_STOCK", "TW_FUTURE"]:
+        return (asset.symbol, "TW_STOCK")
+    return None
+
+def default_quote_engine() -> QuoteEngine:
+    # Resolve every quote up front (batched + concurrent) instead of per asset
+    return QuoteEngine(
+        single_fetcher=fetch_stock_price,
+        fx_fetcher=get_usd_to_twd_rate,
+        batch_fetcher=get_quote_providers()["yfinance"].fetch_many,
+        cache=price_cache,
+        resolution=get_resolution_index(),
+        budget=QUOTE_BUDGET_SECONDS,
+    )
+
+def value_net_worth(assets, asset_keys, quotes, arrays=None):
+    """
+    Values `assets` with the prices of one QuoteSnapshot (asset_keys[i] = quote_key(assets[i])).
+    """
+    usd_rate = quotes.usd_rate
 
-    for asset in assets:
-        current_price = 0.0
-        value_twd = 0.0
-        exposure_twd = 0.0
-        
-        # Determine leverage multiplier
-        # Default to 1.0 if not set (though DB has default)
-        # For Cash (TWD, USD), leverage should be 0.0 effectively for market risk, 
-        # but the user said "00685L is 2x... weighted sum divided by net worth".
-        # If I have 100 TWD cash, exposure is 0? Or 100?
-        # Usually leverage ratio = Total Exposure / Net Worth.
-        # Cash has 0 exposure to market volatility (relative to itself).
-        # But if we consider "Gross Leverage", it might include cash.
-        # Based on user description: "00685L is 2x... GGLL is 2x... weighted sum / net worth".
-        # This implies we sum (Value * Leverage).
-        # For Cash, if leverage is 0 (as I set in migration script for TWD/USD types if I did, wait I didn't update TWD/USD types in migration script successfully as it said 0 rows affected).
-        # Ah, because 'type' might be 'TWD' or 'USD' but I might have checked wrong column or no rows matched.
-        # Let's check asset types.
-        # Anyway, let's use asset.leverage from DB.
-        
-        leverage_mult = asset.leverage if asset.leverage is not None else 1.0
-        
-        # Override for Cash types if DB didn't update correctly or to be safe
-        if asset.type in ["TWD", "USD"]:
-            leverage_mult = 0.0
-        
-        # Default values for all assets
-        notional_value = 0.0
-        equity = 0.0
-        pnl = 0.0
-        pnl_percentage = 0.0
-        
-        if asset.type == "TWD":
-            value_twd = asset.quantity
-            total_twd += value_twd
-            current_price = 1.0
-            leverage_mult = 0.0
-            
-            notional_value = value_twd * leverage_mult
-            equity = value_twd
-            
-        elif asset.type == "USD":
-            value_twd = asset.quantity * usd_rate
-            total_usd += asset.quantity
-            total_twd += value_twd
-            current_price = usd_rate
-            leverage_mult = 0.0
-            
-            notional_value = value_twd * leverage_mult
-            equity = value_twd
-            
-        elif asset.type == "US_STOCK":
-            price_usd = get_stock_price(asset.symbol, "US_STOCK")
-            value_usd = price_usd * asset.quantity
-            value_twd = value_usd * usd_rate
-            total_usd += value_usd
-            total_twd += value_twd
-            current_price = price_usd
-            
-            notional_value = value_twd * leverage_mult
-            equity = value_twd
-            # P&L for stocks
-            cost_twd = asset.cost * asset.quantity * usd_rate
-            pnl = value_twd - cost_twd
-            pnl_percentage = (pnl / cost_twd * 100) if cost_twd != 0 else 0.0
-
-        elif asset.type == "TW_STOCK":
-            price_twd = get_stock_price(asset.symbol, "TW_STOCK")
-            value_twd = price_twd * asset.quantity
-            total_twd += value_twd
-            current_price = price_twd
-            
-            notional_value = value_twd * leverage_mult
-            equity = value_twd
-            # P&L for stocks
-            cost_twd = asset.cost * asset.quantity
-            pnl = value_twd - cost_twd
-            pnl_percentage = (pnl / cost_twd * 100) if cost_twd != 0 else 0.0
-
-        elif asset.type == "TW_FUTURE":
-            # For Futures:
-            # Price = Underlying Price (or Future Price if available)
-            # Notional Value (Exposure) = Price * Quantity * Contract Size
-            # Equity = Margin + (Price - Cost) * Quantity * Contract Size
-            
-            price_twd = get_stock_price(asset.symbol, "TW_STOCK") # Using stock price as proxy
-            current_price = price_twd
-            
-            contract_size = asset.contract_size if asset.contract_size else 1.0
-            margin = asset.margin if asset.margin else 0.0
-            
-            # 1. Notional Value (Exposure)
-            notional_value = price_twd * asset.quantity * contract_size
-            
-            # 2. Unrealized P&L
-            # (Current Price - Entry Price) * Quantity * Contract Size
-            pnl = (price_twd - asset.cost) * asset.quantity * contract_size
-            
-            # 3. Equity
-            equity = margin + pnl
-            
-            # Update totals
-            # For Net Worth, we add Equity
-            total_twd += equity
-            
-            # For Exposure, we add Notional Value
-            exposure_twd = notional_value
-            
-            # Leverage = Notional Value / Margin (Nominal Leverage)
-            # If Margin is 0 (Cross Margin), it's technically undefined per position, 
-            # but we can show 0 or handle it. 
-            # Ideally we should use the Maintenance Margin if known, but we only have 'margin' field.
-            if margin > 0:
-                leverage_mult = notional_value / margin
-            else:
-                # If margin is 0, maybe fallback to Notional / Equity? 
-                # Or just 0 to indicate "Cross Margin / Undefined".
-                # Given user set margin to 31200, this will work.
-                leverage_mult = 0.0
-            
-            value_twd = equity # For backward compatibility in 'value_twd' field if needed, or we use specific fields
-            
-            # P&L Percentage on Margin? Or on Notional?
-            # Usually on Margin (ROE)
-            pnl_percentage = (pnl / margin * 100) if margin != 0 else 0.0
-            
-        if asset.type != "TW_FUTURE":
-             exposure_twd = value_twd * leverage_mult
-        
-        total_exposure_twd += exposure_twd
-            
+    # Value every asset in one vectorized pass (see valuation.py for the per-type formulas):
+    # - Cash (TWD, USD) has 0 leverage: no market exposure relative to itself
+    # - Stocks: value = price * quantity, exposure = value * leverage (e.g. 2.0 for 00685L)
+    # - Futures (priced with the underlying stock): exposure = price * quantity * contract size,
+    #   equity = margin + unrealized P&L, leverage = notional / margin (0 if cross margin)
+    prices = np.array([quotes.price(*key) if key else 0.0 for key in asset_keys], dtype=np.float64)
+    result = value_portfolio(arrays if arrays is not None else load_arrays(assets), prices, usd_rate)
+
+    columns = {
+        name: getattr(result, name).tolist()
+        for name in ("current_price", "value_twd", "leverage", "notional_value", "equity", "pnl", "pnl_percentage")
+    }
+    details = []
+    for i, asset in enumerate(assets):
         details.append({
             "id": asset.id,
             "name": asset.name,
@@ -257,116 +203,78 @@ def calculate_net_worth(assets):
             "quantity": asset.quantity,
             "cost": asset.cost,
             "currency": asset.currency,
-            "current_price": current_price,
-            "value_twd": value_twd, # This remains Equity for Futures to keep 'total' consistent if summed frontend
-            "leverage": leverage_mult,
+            "current_price": columns["current_price"][i],
+            "value_twd": columns["value_twd"][i], # This remains Equity for Futures to keep 'total' consistent if summed frontend
+            "leverage": columns["leverage"][i],
             "contract_size": asset.contract_size,
             "margin": asset.margin,
-            "notional_value": notional_value,
-            "equity": equity,
-            "pnl": pnl,
-            "pnl_percentage": pnl_percentage
+            "notional_value": columns["notional_value"][i],
+            "equity": columns["equity"][i],
+            "pnl": columns["pnl"][i],
+            "pnl_percentage": columns["pnl_percentage"][i],
+            "stale": asset_keys[i] in quotes.stale, # Last known price, upstream did not answer in time
+            "pending": asset_keys[i] in quotes.pending # Last known price, still being fetched (streaming only)
         })
-        
-    total_net_worth_twd = total_twd # This is actually total value in TWD
-    leverage_ratio = total_exposure_twd / total_net_worth_twd if total_net_worth_twd > 0 else 0.0
 
     return {
-        "total_twd": total_twd,
-        "total_usd": total_usd,
+        "total_twd": float(result.total_twd),
+        "total_usd": float(result.total_usd),
         "usd_rate": usd_rate,
-        "leverage_ratio": leverage_ratio,
+        "leverage_ratio": float(result.leverage_ratio),
+        "stale_quotes": sorted(symbol for symbol, _ in quotes.stale),
         "details": details
     }
 
+def calculate_net_worth(assets, quote_engine: Optional[QuoteEngine] = None):
+    quote_engine = quote_engine or default_quote_engine()
+    asset_keys = [quote_key(a) for a in assets]
+    quotes = quote_engine.snapshot([k for k in asset_keys if k is not None])
+    return value_net_worth(assets, asset_keys, quotes)
+
+def stream_net_worth(assets, quote_engine: Optional[QuoteEngine] = None):
+    """
+    calculate_net_worth in steps, for /net-worth/stream. Yields:
+    - {"event": "snapshot", ...}: the whole valuation from cached / last known quotes, right away.
+      Details whose quote is still being fetched have "pending": true.
+    - {"event": "update", ...}: totals and only the details that changed, each time more quotes resolve.
+    - {"event": "done", "stale_quotes": [...]} once every quote resolved or the budget ran out.
+    """
+    quote_engine = quote_engine or default_quote_engine()
+    asset_keys = [quote_key(a) for a in assets]
+    arrays = load_arrays(assets)
+    previous = None
+    quotes = None
+    for quotes in quote_engine.snapshots([k for k in asset_keys if k is not None]):
+        result = value_net_worth(assets, asset_keys, quotes, arrays)
+        result["pending_quotes"] = sorted(symbol for symbol, _ in quotes.pending)
+        if previous is None:
+            yield {"event": "snapshot", **result}
+        else:
+            changed = [d for d, before in zip(result["details"], previous) if d != before]
+            yield {"event": "update", **result, "details": changed}
+        previous = result["details"]
+    yield {"event": "done", "stale_quotes": sorted(symbol for symbol, _ in quotes.stale)}
+
 from sqlalchemy.orm import Session
-from .models import Transaction, Asset
-from collections import defaultdict
-from typing import Dict, Any
+from .models import PositionState, Transaction
+from . import versions
+from .positions import sync_positions, sync_assets
 
-def update_assets_from_history(db: Session):
+def update_assets_from_history(db: Session, full: bool = False):
     """
-    Replays all transactions to calculate current asset holdings and updates the Assets table.
+    Applies newly inserted transactions to the stored positions and updates the Assets table.
+    Pass full=True to discard the stored positions and replay the whole history.
     """
     try:
-        # 1. Fetch all transactions ordered by date
-        transactions = db.query(Transaction).order_by(Transaction.date, Transaction.id).all()
-        logger.info(f"Fetched {len(transactions)} transactions for asset update.")
-
-        # 2. Calculate holdings
-        # structure: symbol -> {quantity: float, cost: float, type: str}
-        holdings: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"quantity": 0.0, "cost": 0.0, "type": "TW_STOCK"})
-
-        for txn in transactions:
-            symbol = str(txn.symbol) # Ensure symbol is string
-            action = txn.action.upper()
-            price = txn.price
-            qty = txn.quantity
-            
-            # Initialize type if new
-            if holdings[symbol]["quantity"] == 0:
-                holdings[symbol]["type"] = txn.asset_type
-
-            current_qty = holdings[symbol]["quantity"]
-            current_avg_cost = holdings[symbol]["cost"]
-
-            if action in ["BUY", "BUY_OPEN"]:
-                # Weighted Average Cost
-                total_cost = (current_qty * current_avg_cost) + (qty * price)
-                new_qty = current_qty + qty
-                new_avg_cost = total_cost / new_qty if new_qty > 0 else 0.0
-                
-                holdings[symbol]["quantity"] = new_qty
-                holdings[symbol]["cost"] = new_avg_cost
-                
-            elif action in ["SELL", "SELL_CLOSE"]:
-                # Selling reduces quantity but doesn't change average cost per unit
-                new_qty = current_qty - qty
-                holdings[symbol]["quantity"] = new_qty
-                # Cost remains the same (Average Cost method) unless qty goes to 0
-                if new_qty <= 0:
-                    holdings[symbol]["quantity"] = 0.0
-                    holdings[symbol]["cost"] = 0.0
-
-        # 3. Update Assets Table
-        logger.info("Updating Assets table...")
-        
-        # Get existing assets map
-        existing_assets = {a.symbol: a for a in db.query(Asset).all()}
-        
-        for symbol, data in holdings.items():
-            qty = data["quantity"]
-            cost = data["cost"]
-            asset_type = data["type"]
-            
-            if qty > 0:
-                if symbol in existing_assets:
-                    # Update
-                    asset = existing_assets[symbol]
-                    asset.quantity = qty
-                    asset.cost = cost
-                    asset.type = asset_type
-                else:
-                    # Create
-                    new_asset = Asset(
-                        symbol=symbol,
-                        type=asset_type,
-                        quantity=qty,
-                        cost=cost,
-                        currency="TWD", # Default
-                        name=symbol # Placeholder
-                    )
-                    db.add(new_asset)
-            else:
-                # If quantity is 0, check if we need to remove it
-                # For now, let's remove it to keep table clean
-                if symbol in existing_assets:
-                    db.delete(existing_assets[symbol])
-
-        # Commit is handled by caller or here? 
-        # Usually service functions using a standard session might commit.
-        # But if part of larger transaction, maybe not.
-        # Let's commit here to ensure assets are synced.
+        touched = sync_positions(db, full=full)
+
+        # Update Assets Table (only symbols that changed)
+        logger.info(f"Updating Assets table for {len(touched)} symbols...")
+        states = db.query(PositionState).filter(PositionState.symbol.in_(touched)).all() if touched else []
+        sync_assets(db, states)
+        if touched:
+            versions.bump(db, versions.ASSETS, versions.REALIZED_PNL)
+
         db.commit()
         logger.info("Assets table updated successfully.")
 
@@ -374,3 +282,15 @@ def update_assets_from_history(db: Session):
         logger.error(f"Error updating assets: {e}")
         db.rollback()
         raise e
+
+def ensure_positions(db: Session) -> bool:
+    """
+    Replays the whole history when there are transactions but no stored positions (a database
+    filled before positions were stored, or positions discarded by a migration). Returns
+    whether it did.
+    """
+    if db.query(PositionState.symbol).first() is not None or db.query(Transaction.id).first() is None:
+        return False
+    logger.info("No stored positions, replaying the transaction history.")
+    update_assets_from_history(db, full=True)
+    return True
@@ -0,0 +1,179 @@
+"""
+Daily net-worth snapshots taken after each market's close.
+
+Every SnapshotGroup revalues its asset classes `SNAPSHOT_DELAY` after the close of its
+markets, on their trading days only: nothing runs (and no quote is fetched) on weekends
+and holidays. A group's run only quotes its own classes and updates their rows in that
+day's snapshot, keeping the other classes as recorded by their own markets; the first run
+of a day carries them over from the latest earlier snapshot. Days missed while the server was down are written by a
+single backfill at startup (catch_up) rather than one run per missed close.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+import logging
+
+from apscheduler.triggers.base import BaseTrigger
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from . import crud, rollups, versions
+from .backfill import BackfillResult, backfill_net_worth
+from .markets import NYSE, TAIFEX, TPEX, TWSE, Market
+from .models import NetWorthHistory, NetWorthHistoryItem
+
+logger = logging.getLogger(__name__)
+
+# Time after the close before quotes are taken, so the closing prices have been published
+SNAPSHOT_DELAY = timedelta(minutes=15)
+
+
+@dataclass(frozen=True)
+class SnapshotGroup:
+    """
+    Asset types valued together after the close of `markets` (which share one calendar).
+    """
+    name: str
+    markets: Tuple[Market, ...]
+    types: Tuple[str, ...]
+
+    def is_trading_day(self, day: date) -> bool:
+        return all(market.is_trading_day(day) for market in self.markets)
+
+    def close_at(self, day: date) -> datetime:
+        return max(market.close_at(day) for market in self.markets)
+
+    def last_close(self, at: datetime) -> Optional[date]:
+        """
+        The group's latest trading day (in the markets' local time) closed at or before `at`.
+        """
+        day = self.markets[0].local(at).date()
+        for _ in range(31):
+            if self.is_trading_day(day) and self.close_at(day) <= at:
+                return day
+            day -= timedelta(days=1)
+        return None
+
+    def next_close(self, at: datetime) -> datetime:
+        day = self.markets[0].local(at).date()
+        while not (self.is_trading_day(day) and self.close_at(day) > at):
+            day += timedelta(days=1)
+        return self.close_at(day)
+
+
+# Cash is valued with the Taiwan stocks, at the afternoon USD/TWD rate. TW futures are
+# snapshot after the TAIFEX day session: the night session belongs to the next trading day.
+# US stocks are snapshot after the NYSE close (early morning in Taiwan) under their US date
+SNAPSHOT_GROUPS = (
+    SnapshotGroup("tw_stock", (TWSE, TPEX), ("TW_STOCK", "TWD", "USD")),
+    SnapshotGroup("tw_future", (TAIFEX,), ("TW_FUTURE",)),
+    SnapshotGroup("us_stock", (NYSE,), ("US_STOCK",)),
+)
+GROUPS_BY_NAME = {group.name: group for group in SNAPSHOT_GROUPS}
+
+
+class MarketCloseTrigger(BaseTrigger):
+    """
+    APScheduler trigger firing `delay` after each close of a SnapshotGroup.
+    """
+
+    def __init__(self, group: SnapshotGroup, delay: timedelta = SNAPSHOT_DELAY):
+        self.group = group
+        self.delay = delay
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        after = (previous_fire_time or now) - self.delay
+        return self.group.next_close(after) + self.delay
+
+    def __str__(self):
+        return f"market_close[{self.group.name}]"
+
+
+def item_detail(item: NetWorthHistoryItem) -> dict:
+    # A stored row in the shape of a calculate_net_worth detail
+    return {
+        "id": item.asset_id,
+        "symbol": item.symbol,
+        "type": item.type,
+        "quantity": item.quantity,
+        "current_price": item.price,
+        "value_twd": item.value_twd,
+        "notional_value": item.exposure,
+    }
+
+
+def total_usd(details: Sequence[dict]) -> float:
+    # Same as valuation.value_portfolio: USD cash plus US stocks at market value
+    return sum(
+        (d.get("quantity") or 0.0) * (1.0 if d["type"] == "USD" else d.get("current_price") or 0.0)
+        for d in details if d["type"] in ("USD", "US_STOCK")
+    )
+
+
+def record_snapshot(db: Session, day: date, details: List[dict], types: Optional[Sequence[str]] = None) -> None:
+    """
+    Writes the snapshot of `day` from calculate_net_worth details, then commits. With
+    `types`, only the details of those asset types are written: the other types keep the
+    day's stored rows, or those of the latest earlier snapshot on the first run of the day.
+    The totals are recomputed from the merged rows.
+
+    The day's row is upserted (INSERT ... ON CONFLICT(date) DO UPDATE), so a second run for
+    the same day overwrites the first instead of failing on the unique date.
+    """
+    if types is not None:
+        stored = db.query(NetWorthHistoryItem).filter(NetWorthHistoryItem.date == day).all()
+        if not stored:
+            previous = db.query(func.max(NetWorthHistory.date)).filter(NetWorthHistory.date < day).scalar()
+            if previous is not None:
+                stored = db.query(NetWorthHistoryItem).filter(NetWorthHistoryItem.date == previous).all()
+        details = [d for d in details if d["type"] in types] + [item_detail(i) for i in stored if i.type not in types]
+
+    stmt = insert(NetWorthHistory).values(
+        date=day, total_twd=sum(d.get("value_twd") or 0.0 for d in details), total_usd=total_usd(details)
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[NetWorthHistory.date],
+        set_={"total_twd": stmt.excluded.total_twd, "total_usd": stmt.excluded.total_usd},
+    ))
+    crud.save_net_worth_items(db, day, details)
+    rollups.record_net_worth(db, day, details)
+    versions.bump(db, versions.NET_WORTH_HISTORY)
+    db.commit()
+
+
+def settled_day(now: datetime, groups: Sequence[SnapshotGroup] = SNAPSHOT_GROUPS) -> Optional[date]:
+    """
+    The latest day on which every group trading that day has closed by `now`.
+    """
+    day = now.astimezone(TWSE.tz).date()
+    for _ in range(31):
+        trading = [g for g in groups if g.is_trading_day(day)]
+        if trading and all(g.close_at(day) + SNAPSHOT_DELAY <= now for g in trading):
+            return day
+        day -= timedelta(days=1)
+    return None
+
+
+def catch_up(db: Session, now: datetime, **backfill_options) -> Tuple[Optional[BackfillResult], List[SnapshotGroup]]:
+    """
+    Coalesces the snapshots missed since the last recorded day: fully closed days are
+    written by one backfill_net_worth call (from daily closes), and the groups whose latest
+    close falls on a later day without a snapshot yet are returned, to be run right away.
+    Does nothing before the first snapshot: older history is backfilled explicitly.
+    """
+    last = db.query(func.max(NetWorthHistory.date)).scalar()
+    if last is None:
+        return None, []
+    result = None
+    end = settled_day(now)
+    if end is not None and end > last:
+        result = backfill_net_worth(db, start=last + timedelta(days=1), end=end, **backfill_options)
+        last = max(last, end)
+
+    due = []
+    for group in SNAPSHOT_GROUPS:
+        day = group.last_close(now - SNAPSHOT_DELAY)
+        if day is not None and day > last and not db.query(NetWorthHistory.id).filter(NetWorthHistory.date == day).first():
+            due.append(group)
+    return result, due
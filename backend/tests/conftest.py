@@ -0,0 +1,74 @@
+import os
+import shutil
+import tempfile
+from datetime import date
+
+import pytest
+
+# Files the app opens by default (finance.db, the price store, the resolution index) go to a
+# scratch directory, so a test run never writes next to the sources. Set before backend imports
+SCRATCH_DIR = tempfile.mkdtemp(prefix="finance-tests-")
+os.environ["FINANCE_DATABASE_URL"] = f"sqlite:///{os.path.join(SCRATCH_DIR, 'finance.db')}"
+os.environ["FINANCE_PRICE_STORE"] = os.path.join(SCRATCH_DIR, "price_history.db")
+os.environ["FINANCE_RESOLUTION_INDEX"] = os.path.join(SCRATCH_DIR, "quote_resolution.db")
+
+from sqlalchemy.orm import sessionmaker
+from backend.database import Base, create_db_engine
+from backend import models  # noqa: F401  (registers tables on Base)
+from backend.models import Transaction
+from backend.pricing import CsvBarFetcher
+
+
+@pytest.fixture
+def db_engine():
+    engine = create_db_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db_session(db_engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def add_txn(db_session):
+    """
+    Records a trade on January `day` 2025 in db_session and commits it.
+    """
+    def add(day, symbol, action, price, quantity, asset_type="TW_STOCK", fee=0.0):
+        db_session.add(Transaction(
+            date=date(2025, 1, day), asset_type=asset_type, symbol=symbol,
+            action=action, price=price, quantity=quantity, fee=fee,
+        ))
+        db_session.commit()
+    return add
+
+
+class FakeClock:
+    """
+    A monotonic clock for the components that take `clock=`; tests move `now` by hand.
+    """
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def price_fixtures():
+    # Recorded daily bars (fixtures/prices/<ticker>.csv) served instead of Yahoo
+    return CsvBarFetcher(os.path.join(os.path.dirname(__file__), "fixtures", "prices"))
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(SCRATCH_DIR, ignore_errors=True)
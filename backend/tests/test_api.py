@@ -0,0 +1,213 @@
+import pytest
+import json
+from datetime import date
+import time
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+from backend import crud, database, schemas, services
+from backend import main
+from backend.main import app
+from backend.live import QuotePoller
+from backend.models import Transaction, Asset
+from backend.pricing import PriceCache, QuoteRecording, ResolutionIndex, replay_providers
+
+TW_CSV = """成交日期,類別,股票名稱,成交價,股數,金額,手續費,交易稅
+2025/01/02,現股買進,台積電(2330),600,1000,600000,20,0
+2025/01/03,現股買進,台積電(2330),700,1000,700000,20,0
+"""
+
+
+@pytest.fixture
+def client(db_engine):
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)
+
+    def override_get_db():
+        db = TestingSession()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[database.get_db] = override_get_db
+    main.response_cache.clear() # Tags of an earlier test's database would match this one's
+    original_factory = main.import_jobs.session_factory
+    main.import_jobs.session_factory = TestingSession
+    yield TestClient(app)
+    main.import_jobs.session_factory = original_factory
+    app.dependency_overrides.clear()
+
+
+def wait_for_job(client, job_id, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["phase"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise TimeoutError(job_id)
+
+
+def test_upload_history_parses_upload_stream(client, db_session, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    files = {"file": ("tw.csv", TW_CSV.encode("big5"), "text/csv")}
+
+    response = client.post("/upload/history", files=files, data={"strategy": "cathay"})
+
+    assert response.status_code == 202
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["phase"] == "done"
+    assert (job["rows_parsed"], job["rows_inserted"], job["rows_skipped"]) == (2, 2, 0)
+    assert db_session.query(Transaction).count() == 2
+    asset = db_session.query(Asset).one()
+    assert (asset.symbol, asset.quantity, asset.cost) == ("2330", 2000.0, 650.0)
+    # Nothing is written to a temp upload directory any more
+    assert list(tmp_path.iterdir()) == []
+
+    # Uploading the same file again is idempotent
+    response = client.post("/upload/history", files=files, data={"strategy": "cathay"})
+    job = wait_for_job(client, response.json()["job_id"])
+    assert (job["rows_inserted"], job["rows_skipped"]) == (0, 2)
+
+
+def test_failed_and_unknown_jobs(client):
+    files = {"file": ("bad.csv", b"\xff\xfe\x00garbage", "text/csv")}
+    response = client.post("/upload/history", files=files, data={"strategy": "cathay"})
+
+    job = wait_for_job(client, response.json()["job_id"])
+    assert job["phase"] == "failed"
+    assert job["error"]
+    assert client.get("/jobs/does-not-exist").status_code == 404
+
+
+def test_cumulative_pnl_pages_and_streams(client):
+    for day, pnl in [(1, 100.0), (1, -30.0), (2, 50.0), (5, -20.0), (9, 10.0)]:
+        payload = {"date": date(2025, 1, day).isoformat(), "symbol": "2330", "quantity": 1, "pnl": pnl}
+        assert client.post("/pnl/", json=payload).status_code == 200
+
+    full = client.get("/pnl/cumulative").json()
+    assert [(r["date"], r["daily_pnl"], r["cumulative_pnl"]) for r in full] == [
+        ("2025-01-01", 70.0, 70.0),
+        ("2025-01-02", 50.0, 120.0),
+        ("2025-01-05", -20.0, 100.0),
+        ("2025-01-09", 10.0, 110.0),
+    ]
+
+    # Keyset pages keep the running total of the whole history
+    first = client.get("/pnl/cumulative", params={"limit": 2}).json()
+    second = client.get("/pnl/cumulative", params={"limit": 2, "after": first[-1]["date"]}).json()
+    assert first + second == full
+    ranged = client.get("/pnl/cumulative", params={"start": "2025-01-02", "end": "2025-01-05"}).json()
+    assert ranged == full[1:3]
+
+    response = client.get("/pnl/cumulative", headers={"Accept": "application/x-ndjson"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == full
+
+    weekly = client.get("/pnl/cumulative", params={"grain": "week"}).json()
+    assert [(r["date"], r["cumulative_pnl"]) for r in weekly] == [("2024-12-30", 100.0), ("2025-01-06", 110.0)]
+
+
+def test_net_worth_history_totals_and_lazy_details(client, db_session):
+    details = [
+        {"id": 1, "symbol": "TWD", "type": "TWD", "quantity": 100.0, "current_price": 1.0, "value_twd": 100.0, "notional_value": 0.0},
+        {"id": 2, "symbol": "AAPL", "type": "US_STOCK", "quantity": 1.0, "current_price": 2.0, "value_twd": 64.0, "notional_value": 64.0},
+    ]
+    crud.create_net_worth_history(db_session, schemas.NetWorthHistoryCreate(
+        date=date(2025, 1, 6), total_twd=164.0, total_usd=2.0, details=details
+    ))
+
+    assert client.get("/net-worth/history").json() == [
+        {"id": 1, "date": "2025-01-06", "total_twd": 164.0, "total_usd": 2.0}
+    ]
+    breakdown = client.get("/net-worth/history", params={"breakdown": True}).json()
+    assert breakdown[0]["by_class"] == {"TWD": 100.0, "US_STOCK": 64.0}
+
+    items = client.get("/net-worth/history/2025-01-06/details").json()
+    assert [(i["symbol"], i["price"], i["value_twd"], i["exposure"]) for i in items] == [
+        ("TWD", 1.0, 100.0, 0.0), ("AAPL", 2.0, 64.0, 64.0)
+    ]
+
+
+def test_backfill_endpoint_runs_as_job(client):
+    # A weekend-only range has nothing to value, so no prices are downloaded
+    response = client.post("/net-worth/backfill", params={"start": "2025-01-04", "end": "2025-01-05"})
+    assert response.status_code == 202
+    job = wait_for_job(client, response.json()["job_id"])
+    assert (job["phase"], job["strategy"], job["rows_inserted"]) == ("done", "backfill", 0)
+
+
+def test_net_worth_streams_as_ndjson_and_sse(client, tmp_path, monkeypatch):
+    recording = QuoteRecording(str(tmp_path / "recording.json"))
+    recording.record("yfinance", "2330.TW", 1075.0)
+    recording.record("yfinance", "TWD=X", 32.5)
+    monkeypatch.setattr(services, "quote_providers", replay_providers(recording))
+    monkeypatch.setattr(services, "price_cache", PriceCache())
+    monkeypatch.setattr(services, "resolution_index", ResolutionIndex(path=str(tmp_path / "routes.db")))
+    client.post("/assets/", json={"type": "TWD", "quantity": 1000.0, "cost": 1.0, "leverage": 0.0})
+    client.post("/assets/", json={"type": "TW_STOCK", "symbol": "2330", "quantity": 10.0, "cost": 1000.0})
+
+    response = client.get("/net-worth/stream")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[0]["event"] == "snapshot" and events[0]["pending_quotes"] == ["2330", "TWD=X"]
+    assert [d["symbol"] for d in events[0]["details"]] == ["TWD", "2330"]
+    assert events[-1] == {"event": "done", "stale_quotes": []}
+    final = events[-2]
+    assert final["pending_quotes"] == [] and final["total_twd"] == 1000.0 + 10 * 1075.0
+
+    # Second request: every quote is cached, so the snapshot is already final
+    response = client.get("/net-worth/stream", headers={"Accept": "text/event-stream"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    blocks = response.text.strip().split("\n\n")
+    assert [b.splitlines()[0] for b in blocks] == ["event: snapshot", "event: done"]
+    snapshot = json.loads(blocks[0].splitlines()[1][len("data: "):])
+    assert snapshot["total_twd"] == 1000.0 + 10 * 1075.0 and snapshot["pending_quotes"] == []
+
+
+def test_net_worth_websocket_shares_one_poller(client, db_engine, tmp_path, monkeypatch):
+    recording = QuoteRecording(str(tmp_path / "recording.json"))
+    recording.record("yfinance", "2330.TW", 1075.0)
+    recording.record("yfinance", "TWD=X", 32.5)
+    monkeypatch.setattr(services, "quote_providers", replay_providers(recording))
+    monkeypatch.setattr(services, "price_cache", PriceCache())
+    monkeypatch.setattr(services, "resolution_index", ResolutionIndex(path=str(tmp_path / "routes.db")))
+    poller = QuotePoller(sessionmaker(bind=db_engine), tick=0.05)
+    monkeypatch.setattr(main, "quote_poller", poller)
+    client.post("/assets/", json={"type": "TW_STOCK", "symbol": "2330", "quantity": 10.0, "cost": 1000.0})
+
+    try:
+        with client.websocket_connect("/ws/net-worth") as first, client.websocket_connect("/ws/net-worth") as second:
+            for ws in (first, second):
+                message = ws.receive_json()
+                assert message["event"] == "snapshot"
+                assert message["total_twd"] == 10 * 1075.0
+            stats = client.get("/quotes/poller").json()
+            assert stats["subscribers"] == 2 and stats["polls"] == 1
+    finally:
+        poller.stop()
+
+
+def test_read_endpoints_revalidate_with_etags(client):
+    client.post("/assets/", json={"type": "TWD", "quantity": 1000.0, "cost": 1.0})
+    first = client.get("/assets/")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and len(first.json()) == 1
+
+    # Unchanged table: 304 without a body, or the cached body for a plain request
+    assert client.get("/assets/", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/assets/").json() == first.json()
+    # Other query strings are tagged separately
+    assert client.get("/assets/", params={"limit": 1}).headers["etag"] != etag
+
+    # A write bumps the assets version: the old tag no longer matches
+    client.post("/assets/", json={"type": "USD", "quantity": 10.0, "cost": 1.0, "currency": "USD"})
+    changed = client.get("/assets/", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and len(changed.json()) == 2 and changed.headers["etag"] != etag
+
+    pnl_etag = client.get("/pnl/cumulative").headers["etag"]
+    assert client.get("/pnl/cumulative", headers={"If-None-Match": pnl_etag}).status_code == 304
+    client.post("/pnl/", json={"date": "2025-01-02", "symbol": "2330", "quantity": 1, "pnl": 50.0})
+    assert client.get("/pnl/cumulative", headers={"If-None-Match": pnl_etag}).json()[0]["cumulative_pnl"] == 50.0
+
+    stats = client.get("/cache/responses").json()
+    assert stats["not_modified"] >= 2 and stats["hits"] >= 1
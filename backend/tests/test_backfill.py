@@ -0,0 +1,71 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from backend import crud
+from backend.backfill import backfill_net_worth, synthetic_asset_id
+from backend.models import Asset, NetWorthHistory, NetWorthRollup
+from backend.pricing import PriceStore
+
+
+def fake_loader(calls):
+    closes = pd.DataFrame(
+        {
+            "2330.TW": [600.0, 610.0, None, 620.0],
+            "AAPL": [200.0, 210.0, 220.0, 230.0],
+            "TWD=X": [30.0, 31.0, 32.0, 33.0],
+        },
+        index=[date(2025, 1, 6), date(2025, 1, 7), date(2025, 1, 8), date(2025, 1, 9)],
+    )
+
+    def loader(tickers, start, end):
+        calls.append(list(tickers))
+        return closes[[t for t in tickers if t in closes.columns]]
+    return loader
+
+
+def test_backfill_values_missing_weekdays_from_transactions(db_session, add_txn):
+    add_txn(6, "2330", "BUY", 500.0, 100)
+    add_txn(7, "AAPL", "BUY", 150.0, 10, asset_type="US_STOCK")
+    add_txn(8, "2330", "SELL", 600.0, 100)
+    db_session.add(Asset(type="TWD", symbol="TWD", quantity=1000.0, cost=1.0, currency="TWD"))
+    db_session.add(NetWorthHistory(date=date(2025, 1, 7), total_twd=1.0, total_usd=0.0)) # Recorded live
+    db_session.commit()
+
+    calls = []
+    result = backfill_net_worth(db_session, start=date(2025, 1, 4), end=date(2025, 1, 9), loader=fake_loader(calls))
+
+    assert len(calls) == 1 # One bulk download for every symbol
+    assert (result.days, result.items) == (3, 6)
+    totals = {h.date: (h.total_twd, h.total_usd) for h in db_session.query(NetWorthHistory)}
+    assert totals == {
+        date(2025, 1, 6): (1000 + 100 * 600.0, 0.0),
+        date(2025, 1, 7): (1.0, 0.0), # Existing rows are left alone
+        date(2025, 1, 8): (1000 + 10 * 220.0 * 32.0, 10 * 220.0),
+        date(2025, 1, 9): (1000 + 10 * 230.0 * 33.0, 10 * 230.0),
+    }
+    items = crud.get_net_worth_details(db_session, date(2025, 1, 6))
+    assert sorted((i.symbol, i.price, i.value_twd) for i in items) == [("2330", 600.0, 60000.0), ("TWD", 1.0, 1000.0)]
+    assert {i.asset_id for i in items if i.symbol == "2330"} == {synthetic_asset_id("2330")}
+    assert db_session.query(NetWorthRollup).filter(NetWorthRollup.grain == "day").count() == 6
+
+    # Nothing left to backfill
+    assert backfill_net_worth(db_session, start=date(2025, 1, 4), end=date(2025, 1, 9), loader=fake_loader(calls)).days == 0
+
+
+def test_backfill_reads_the_price_store(db_session, add_txn, tmp_path, price_fixtures):
+    add_txn(2, "AAPL", "BUY", 240.0, 10, asset_type="US_STOCK")
+    downloads = []
+    store = PriceStore(
+        path=str(tmp_path / "prices.db"),
+        fetcher=lambda tickers, start, end: downloads.append(tickers) or price_fixtures(tickers, start, end),
+        today=lambda: date(2025, 1, 11),
+    )
+
+    result = backfill_net_worth(db_session, start=date(2025, 1, 2), end=date(2025, 1, 10), loader=store.history)
+
+    assert result.days == 7 and downloads == [["AAPL", "TWD=X"]]
+    totals = {h.date: h.total_usd for h in db_session.query(NetWorthHistory)}
+    assert totals[date(2025, 1, 9)] == 10 * 242.70 # US holiday: previous close
+    assert store.coverage("AAPL") == (date(2024, 12, 23), date(2025, 1, 10))
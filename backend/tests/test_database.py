@@ -0,0 +1,31 @@
+from sqlalchemy import text
+from backend.database import create_db_engine, PROFILES
+
+
+def pragmas(engine):
+    with engine.connect() as conn:
+        return {
+            name: conn.execute(text(f"PRAGMA {name}")).scalar()
+            for name in ("journal_mode", "synchronous", "cache_size", "busy_timeout", "mmap_size")
+        }
+
+
+def test_tuned_profile_applied_on_connect(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'tuned.db'}")
+
+    assert pragmas(engine) == {
+        "journal_mode": "wal",
+        "synchronous": 1, # NORMAL
+        "cache_size": -64 * 1024,
+        "busy_timeout": 5000,
+        "mmap_size": 256 * 1024 * 1024,
+    }
+    assert engine.pool.size() == PROFILES["tuned"].pool_size
+
+
+def test_safe_profile(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'safe.db'}", profile=PROFILES["safe"])
+
+    result = pragmas(engine)
+    assert result["journal_mode"] == "delete"
+    assert result["synchronous"] == 2 # FULL
@@ -1,10 +1,8 @@
 import pytest
-from unittest.mock import MagicMock, patch
-import pandas as pd
 from datetime import date
-from io import StringIO
 from backend.importer.strategies import TwBrokerStrategy, TransactionDTO
-from backend.importer.processor import TransactionProcessor
+from backend.importer.processor import TransactionProcessor, ImportResult
+from backend import versions
 from backend.models import Transaction
 
 # Mock CSV content mimicking the provided format
@@ -25,71 +23,102 @@ def processor():
     return TransactionProcessor()
 
 @pytest.fixture
-def mock_db_session():
-    session = MagicMock()
-    # Mock query().scalar() to return False (no duplicate) by default
-    session.query.return_value.scalar.return_value = False
-    return session
-
-def test_tw_broker_strategy_parse(strategy):
-    # Create DataFrame before patching to use real pd.read_csv
-    mock_df = pd.read_csv(StringIO(MOCK_CSV_CONTENT))
+def tw_csv(tmp_path):
+    file_path = tmp_path / "tw.csv"
+    file_path.write_text(MOCK_CSV_CONTENT, encoding="utf-8")
+    return str(file_path)
+
+def test_tw_broker_strategy_parse(strategy, tw_csv):
+    # Test parse method
+    transactions = strategy.parse(tw_csv)
+    
+    assert len(transactions) == 4 # Should skip the invalid date row
+    
+    # Check first transaction (BUY)
+    t1 = transactions[0]
+    assert t1.date == date(2025, 1, 2)
+    assert t1.action == "BUY"
+    assert t1.symbol == "00680L"
+    assert t1.price == 10.5
+    assert t1.quantity == 1000.0
+    assert t1.fee == 20.0
+    assert t1.tax == 0.0
+    
+    # Check second transaction (SELL)
+    t2 = transactions[1]
+    assert t2.action == "SELL"
+    assert t2.symbol == "2330"
+
+    # Check third transaction (BUY_CLOSE) - Short Cover
+    t3 = transactions[2]
+    assert t3.action == "BUY_CLOSE"
     
-    # Mock pd.read_csv to return the pre-created DataFrame
-    with patch('pandas.read_csv') as mock_read_csv:
-        mock_read_csv.return_value = mock_df
-        
-        # Test parse method
-        transactions = strategy.parse("dummy_path.csv")
-        
-        assert len(transactions) == 4 # Should skip the invalid date row
-        
-        # Check first transaction (BUY)
-        t1 = transactions[0]
-        assert t1.date == date(2025, 1, 2)
-        assert t1.action == "BUY"
-        assert t1.symbol == "00680L"
-        assert t1.price == 10.5
-        assert t1.quantity == 1000.0
-        assert t1.fee == 20.0
-        assert t1.tax == 0.0
-        
-        # Check second transaction (SELL)
-        t2 = transactions[1]
-        assert t2.action == "SELL"
-        assert t2.symbol == "2330"
-
-        # Check third transaction (BUY_CLOSE) - Short Cover
-        t3 = transactions[2]
-        assert t3.action == "BUY_CLOSE"
-        
-        # Check fourth transaction (SELL_OPEN) - Short Sell
-        t4 = transactions[3]
-        assert t4.action == "SELL_OPEN"
-
-def test_processor_insert(processor, mock_db_session):
+    # Check fourth transaction (SELL_OPEN) - Short Sell
+    t4 = transactions[3]
+    assert t4.action == "SELL_OPEN"
+
+def test_processor_insert(processor, db_session):
     transactions = [
         TransactionDTO(date=date(2025, 1, 1), asset_type="Stock", symbol="2330", action="BUY", price=500, quantity=1000),
         TransactionDTO(date=date(2025, 1, 2), asset_type="Stock", symbol="2330", action="SELL", price=550, quantity=1000)
     ]
     
-    count = processor.process_transactions(transactions, mock_db_session)
+    count = processor.process_transactions(transactions, db_session)
     
     assert count == 2
-    assert mock_db_session.add.call_count == 2
-    mock_db_session.commit.assert_called_once()
+    assert db_session.query(Transaction).count() == 2
 
-def test_processor_duplicate_check(processor, mock_db_session):
+def test_processor_duplicate_check(processor, db_session):
     transactions = [
         TransactionDTO(date=date(2025, 1, 1), asset_type="Stock", symbol="2330", action="BUY", price=500, quantity=1000)
     ]
+    processor.process_transactions(transactions, db_session)
     
-    # Mock duplicate check to return True
-    mock_db_session.query.return_value.scalar.return_value = True
-    
-    count = processor.process_transactions(transactions, mock_db_session)
+    # Importing the same file again inserts nothing
+    count = processor.process_transactions(transactions, db_session)
     
     assert count == 0
-    mock_db_session.add.assert_not_called()
-    mock_db_session.commit.assert_called_once()
+    assert db_session.query(Transaction).count() == 1
+    # Only the write bumped the table version (cached responses stay valid)
+    assert versions.current(db_session, [versions.TRANSACTIONS]) == {versions.TRANSACTIONS: 1}
+
+def test_processor_bulk_import_counts(processor, db_session):
+    same_day_trade = TransactionDTO(date=date(2025, 1, 1), asset_type="TW_STOCK", symbol="2330", action="BUY", price=500.0, quantity=1000.0)
+    first_file = [same_day_trade, same_day_trade]
+    second_file = [
+        same_day_trade,
+        same_day_trade,
+        same_day_trade,
+        TransactionDTO(date=date(2025, 1, 3), asset_type="TW_STOCK", symbol="2330", action="SELL", price=550.0, quantity=1000.0),
+    ]
+
+    # Identical trades on the same day are kept, and only the extra ones are inserted on overlap
+    assert processor.import_transactions(first_file, db_session) == ImportResult(inserted=2, skipped=0)
+    assert processor.import_transactions(second_file, db_session) == ImportResult(inserted=2, skipped=2)
+    assert processor.import_transactions([], db_session) == ImportResult(inserted=0, skipped=0)
+    assert db_session.query(Transaction).count() == 4
+
+def test_iter_batches_matches_parse(strategy, tw_csv):
+    batches = list(strategy.iter_batches(tw_csv, chunksize=2))
+
+    assert [len(b) for b in batches] == [2, 2]
+    assert [t for batch in batches for t in batch] == strategy.parse(tw_csv)
+
+def test_big5_encoding_detected_from_sample(strategy, tmp_path):
+    file_path = tmp_path / "tw_big5.csv"
+    file_path.write_bytes(MOCK_CSV_CONTENT.encode("big5"))
+
+    assert strategy._detect_encoding(str(file_path)) == "big5"
+    assert len(strategy.parse(str(file_path))) == 4
+
+def test_import_batches_across_chunk_boundary(processor, db_session):
+    trade = TransactionDTO(date=date(2025, 1, 1), asset_type="TW_STOCK", symbol="2330", action="BUY", price=500.0, quantity=1000.0)
+    processor.import_transactions([trade], db_session)
+
+    # Three identical trades split over two batches, one of them already stored
+    progress = []
+    result = processor.import_batches([[trade, trade], [trade]], db_session, on_batch=lambda rows, r: progress.append((rows, r.inserted)))
 
+    assert result == ImportResult(inserted=2, skipped=1)
+    assert progress == [(2, 1), (3, 2)]
+    assert db_session.query(Transaction).count() == 3
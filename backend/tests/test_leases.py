@@ -0,0 +1,42 @@
+import threading
+
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base, create_db_engine
+from backend.leases import LeaderLease
+
+
+def test_lease_is_held_until_it_expires(db_engine, clock):
+    factory = sessionmaker(bind=db_engine)
+    first = LeaderLease(factory, "net_worth_snapshot", ttl=60.0, owner="worker-1", clock=clock)
+    second = LeaderLease(factory, "net_worth_snapshot", ttl=60.0, owner="worker-2", clock=clock)
+
+    assert first.acquire()
+    assert not second.acquire()
+    clock.now += 50.0
+    assert first.acquire() # Renewed until 110
+    clock.now += 50.0
+    assert not second.acquire()
+    clock.now += 20.0
+    assert second.acquire() and not first.acquire()
+    # Leases are per job
+    assert LeaderLease(factory, "other_job", owner="worker-1", clock=clock).acquire()
+
+
+def test_one_worker_wins_the_lease(tmp_path):
+    url = f"sqlite:///{tmp_path / 'finance.db'}"
+    Base.metadata.create_all(bind=create_db_engine(url))
+    leases = [LeaderLease(sessionmaker(bind=create_db_engine(url)), "snapshot_tw_stock") for _ in range(8)]
+    start = threading.Barrier(len(leases))
+    won = []
+
+    def worker(lease):
+        start.wait()
+        won.append(lease.acquire())
+
+    threads = [threading.Thread(target=worker, args=(lease,)) for lease in leases]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(won) == [False] * 7 + [True]
@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timezone
+import pytest
+from sqlalchemy.orm import sessionmaker
+from backend import services
+from backend.live import QuotePoller
+from backend.markets import quote_market_open
+from backend.models import Asset
+from backend.pricing import PriceCache, QuoteRecording, ResolutionIndex, ReplayProvider, replay_providers
+
+# Thursday 2025-01-09 10:00 in Taipei: TWSE trades, NYSE is closed
+TW_SESSION = datetime(2025, 1, 9, 2, 0, tzinfo=timezone.utc)
+
+
+class CountingProvider(ReplayProvider):
+    def __init__(self, name, recording):
+        super().__init__(name, recording)
+        self.calls = 0
+
+    def fetch(self, target):
+        self.calls += 1
+        return super().fetch(target)
+
+    def fetch_many(self, targets):
+        self.calls += 1
+        return super().fetch_many(targets)
+
+
+@pytest.fixture
+def recording(tmp_path, monkeypatch):
+    recording = QuoteRecording(str(tmp_path / "recording.json"))
+    recording.record("yfinance", "2330.TW", 1075.0)
+    recording.record("yfinance", "AAPL", 236.85)
+    recording.record("yfinance", "TWD=X", 32.5)
+    providers = replay_providers(recording)
+    providers["yfinance"] = CountingProvider("yfinance", recording)
+    monkeypatch.setattr(services, "quote_providers", providers)
+    monkeypatch.setattr(services, "price_cache", PriceCache())
+    monkeypatch.setattr(services, "resolution_index", ResolutionIndex(path=str(tmp_path / "routes.db")))
+    return recording
+
+
+@pytest.fixture
+def poller(db_engine, db_session, clock):
+    db_session.add_all([
+        Asset(type="TW_STOCK", symbol="2330", quantity=10.0, cost=1000.0, currency="TWD"),
+        Asset(type="US_STOCK", symbol="AAPL", quantity=2.0, cost=200.0, currency="USD"),
+    ])
+    db_session.commit()
+    return QuotePoller(sessionmaker(bind=db_engine), now=lambda: TW_SESSION, clock=clock)
+
+
+def test_market_sessions():
+    assert quote_market_open("TW_STOCK", TW_SESSION)
+    assert not quote_market_open("US_STOCK", TW_SESSION)
+    assert quote_market_open("FX", TW_SESSION)
+    assert not quote_market_open("TW_STOCK", datetime(2025, 1, 11, 2, 0, tzinfo=timezone.utc)) # Saturday
+
+
+def test_poller_broadcasts_to_every_subscriber_from_one_fetch(poller, recording):
+    loop = asyncio.new_event_loop()
+    try:
+        queues = [poller.subscribe(loop) for _ in range(3)]
+
+        first = poller.poll_once()
+        loop.run_until_complete(asyncio.sleep(0))
+        assert first["event"] == "snapshot"
+        assert first["total_twd"] == pytest.approx(10 * 1075.0 + 2 * 236.85 * 32.5)
+        assert all(q.get_nowait() == first for q in queues)
+        calls = services.quote_providers["yfinance"].calls
+
+        # Nothing is due yet: no upstream call, nothing to send
+        poller.clock.now = 10.0
+        assert poller.poll_once() is None
+        assert services.quote_providers["yfinance"].calls == calls
+
+        # TW quotes are due every 30s during the session, the closed US market every 15 minutes
+        recording.record("yfinance", "2330.TW", 1080.0)
+        recording.record("yfinance", "AAPL", 240.0)
+        poller.clock.now = 31.0
+        update = poller.poll_once()
+        loop.run_until_complete(asyncio.sleep(0))
+        assert update["event"] == "update"
+        assert [(d["symbol"], d["current_price"]) for d in update["details"]] == [("2330", 1080.0)]
+        assert all(q.get_nowait() == update for q in queues)
+        assert poller.stats()["polls"] == 2
+    finally:
+        loop.close()
+
+
+def test_poller_reports_failed_refreshes_as_stale(poller, recording):
+    first = poller.poll_once()
+    assert first["stale_quotes"] == [] and not any(d["stale"] for d in first["details"])
+
+    # Upstream stops answering for AAPL: it keeps its last known price, flagged stale
+    recording.record("yfinance", "AAPL", None)
+    poller.clock.now = 901.0
+    update = poller.poll_once()
+    assert update["stale_quotes"] == ["AAPL"]
+    assert [(d["symbol"], d["current_price"], d["stale"]) for d in update["details"]] == [("AAPL", 236.85, True)]
@@ -0,0 +1,84 @@
+from datetime import date
+
+import pytest
+
+from backend import crud, schemas
+from backend.lots import AVERAGE, FIFO, LIFO, LotBook, method_override
+from backend.models import Asset, OpenLot, PnlRollup, RealizedProfitLoss
+from backend.services import update_assets_from_history
+
+
+@pytest.mark.parametrize("method, pnl, cost", [
+    (FIFO, (130 - 100) * 10 + (130 - 120) * 5, 120.0),
+    (LIFO, (130 - 120) * 10 + (130 - 100) * 5, 100.0),
+    (AVERAGE, (130 - 110) * 15, 110.0),
+])
+def test_lot_book_methods(method, pnl, cost):
+    book = LotBook(method)
+    book.buy(10, 100.0)
+    book.buy(10, 120.0)
+    assert book.sell(15, 130.0) == pytest.approx(pnl)
+    assert book.quantity == 5
+    assert book.average_cost == pytest.approx(cost)
+
+    # Selling more than is held realizes the rest at a zero cost basis
+    assert book.sell(10, 130.0) == pytest.approx((130 - cost) * 5 + 130 * 5)
+    assert (book.quantity, book.average_cost) == (0, 0.0)
+
+
+def test_lot_method_override_is_validated(monkeypatch):
+    monkeypatch.setenv("FINANCE_LOT_METHOD", " lifo ")
+    assert method_override() == LIFO
+    monkeypatch.setenv("FINANCE_LOT_METHOD", "FIFFO")
+    with pytest.raises(ValueError, match="FINANCE_LOT_METHOD"):
+        method_override()
+    monkeypatch.delenv("FINANCE_LOT_METHOD")
+    assert method_override() is None
+
+
+def realized(session):
+    return sorted((r.date.day, r.pnl) for r in session.query(RealizedProfitLoss))
+
+
+def test_sells_match_stored_lots_incrementally(db_session, add_txn):
+    add_txn(2, "AAPL", "BUY", 100.0, 10, asset_type="US_STOCK")
+    add_txn(3, "AAPL", "BUY", 120.0, 10, asset_type="US_STOCK")
+    update_assets_from_history(db_session)
+    assert [(l.quantity, l.price) for l in db_session.query(OpenLot).order_by(OpenLot.id)] == [(10, 100.0), (10, 120.0)]
+
+    add_txn(6, "AAPL", "SELL", 130.0, 15, asset_type="US_STOCK", fee=1.0)
+    update_assets_from_history(db_session)
+    assert realized(db_session) == [(6, 30 * 10 + 10 * 5 - 1.0)]
+    assert [(l.quantity, l.price) for l in db_session.query(OpenLot)] == [(5, 120.0)]
+    # Realized PnL is FIFO, the asset still shows the average cost of its buys
+    assert db_session.query(Asset).one().cost == 110.0
+
+    # A back-dated buy replays the symbol without duplicating its realized PnL
+    add_txn(1, "AAPL", "BUY", 90.0, 10, asset_type="US_STOCK")
+    update_assets_from_history(db_session)
+    assert realized(db_session) == [(6, 40 * 10 + 30 * 5 - 1.0)]
+    assert db_session.query(PnlRollup).filter(PnlRollup.grain == "month").one().pnl == 40 * 10 + 30 * 5 - 1.0
+
+    update_assets_from_history(db_session, full=True)
+    assert realized(db_session) == [(6, 40 * 10 + 30 * 5 - 1.0)]
+
+
+def test_manual_pnl_is_not_counted_twice(db_session, add_txn):
+    add_txn(2, "AAPL", "BUY", 100.0, 10, asset_type="US_STOCK")
+    crud.create_realized_pnl(db_session, schemas.RealizedPnLCreate(date=date(2025, 1, 6), symbol="AAPL", quantity=10, pnl=250.0))
+    add_txn(6, "AAPL", "SELL", 130.0, 10, asset_type="US_STOCK")
+    update_assets_from_history(db_session)
+    assert realized(db_session) == [(6, 250.0)]
+    assert [(l.quantity, l.price) for l in db_session.query(OpenLot)] == []
+
+    # Entered after the sell was matched, the manual row replaces the lot-matched one
+    add_txn(7, "AAPL", "BUY", 100.0, 10, asset_type="US_STOCK")
+    add_txn(8, "AAPL", "SELL", 110.0, 10, asset_type="US_STOCK")
+    update_assets_from_history(db_session)
+    assert realized(db_session) == [(6, 250.0), (8, 100.0)]
+    crud.create_realized_pnl(db_session, schemas.RealizedPnLCreate(date=date(2025, 1, 8), symbol="AAPL", quantity=10, pnl=95.0))
+    assert realized(db_session) == [(6, 250.0), (8, 95.0)]
+    assert db_session.query(PnlRollup).filter(PnlRollup.grain == "month").one().pnl == 345.0
+
+    update_assets_from_history(db_session, full=True)
+    assert realized(db_session) == [(6, 250.0), (8, 95.0)]
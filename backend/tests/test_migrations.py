@@ -0,0 +1,142 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from backend import crud, rollups, services
+from backend.migrations import MIGRATIONS, run_migrations
+from backend.models import Asset, Base, NetWorthRollup, PnlRollup, RealizedProfitLoss
+
+# transactions as created before the migrations existed
+BASELINE_TRANSACTIONS = (
+    "CREATE TABLE transactions (id INTEGER PRIMARY KEY, date DATE, asset_type VARCHAR, symbol VARCHAR, "
+    "action VARCHAR, price FLOAT, quantity FLOAT, contract_month VARCHAR, multiplier FLOAT, "
+    "fee FLOAT, tax FLOAT, assigned_margin FLOAT)"
+)
+
+
+def test_migration_numbers_existing_duplicates(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(BASELINE_TRANSACTIONS))
+        for _ in range(2):
+            conn.execute(text(
+                "INSERT INTO transactions (date, asset_type, symbol, action, price, quantity) "
+                "VALUES ('2025-01-02', 'TW_STOCK', '2330', 'BUY', 500, 1000)"
+            ))
+        conn.execute(text(
+            "INSERT INTO transactions (date, asset_type, symbol, action, price, quantity) "
+            "VALUES ('2025-01-02', 'TW_STOCK', '2330', 'SELL', 510, 1000)"
+        ))
+
+    assert run_migrations(engine) == [version for version, _ in MIGRATIONS]
+    assert run_migrations(engine) == []
+
+    with engine.connect() as conn:
+        occurrences = conn.execute(text("SELECT occurrence FROM transactions ORDER BY id")).scalars().all()
+        assert occurrences == [0, 1, 0]
+        with pytest.raises(Exception, match="UNIQUE"):
+            conn.execute(text(
+                "INSERT INTO transactions (date, asset_type, symbol, action, price, quantity, occurrence) "
+                "VALUES ('2025-01-02', 'TW_STOCK', '2330', 'BUY', 500, 1000, 1)"
+            ))
+    engine.dispose()
+
+
+def test_rollup_backfill_matches_live_rollups(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(BASELINE_TRANSACTIONS))
+        conn.execute(text(
+            "CREATE TABLE realized_pnl (id INTEGER PRIMARY KEY, date DATE, symbol VARCHAR, quantity FLOAT, pnl FLOAT, notes VARCHAR)"
+        ))
+        # Sunday, Monday and the next month: three weeks, two months
+        conn.execute(text(
+            "INSERT INTO realized_pnl (date, symbol, quantity, pnl) VALUES "
+            "('2025-01-05', '2330', 1, 10), ('2025-01-06', '2330', 1, 20), ('2025-01-06', '2330', 1, 5), "
+            "('2025-02-01', 'AAPL', 1, -7)"
+        ))
+
+    run_migrations(engine)
+
+    def pnl_rollup(db):
+        return sorted((r.grain, r.period_start, r.symbol, r.pnl, r.trade_count) for r in db.query(PnlRollup))
+
+    db = Session(bind=engine)
+    migrated = pnl_rollup(db)
+    assert ("week", date(2024, 12, 30), "2330", 10.0, 1) in migrated
+    assert ("week", date(2025, 1, 6), "2330", 25.0, 2) in migrated
+    rollups.rebuild_all(db)
+    assert pnl_rollup(db) == migrated
+    db.close()
+    engine.dispose()
+
+
+def test_migration_moves_net_worth_json_into_item_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    details = '[{"id": 1, "symbol": "TWD", "type": "TWD", "quantity": 100.0, "current_price": 1.0, "value_twd": 100.0, "notional_value": 0.0}, ' \
+        '{"id": 2, "symbol": "2330", "type": "TW_STOCK", "quantity": 10.0, "current_price": 5.0, "value_twd": 50.0, "notional_value": 50.0}]'
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE net_worth_history (id INTEGER PRIMARY KEY, date DATE UNIQUE, total_twd FLOAT, total_usd FLOAT, details JSON)"
+        ))
+        conn.execute(text(BASELINE_TRANSACTIONS))
+        conn.execute(text("INSERT INTO net_worth_history (date, total_twd, total_usd, details) VALUES ('2025-01-06', 150, 0, :details)"),
+                     {"details": details})
+
+    run_migrations(engine)
+
+    with engine.connect() as conn:
+        columns = {row[1] for row in conn.execute(text("PRAGMA table_info(net_worth_history)"))}
+        assert "details" not in columns
+    db = Session(bind=engine)
+    items = crud.get_net_worth_details(db, date(2025, 1, 6))
+    assert [(i.asset_id, i.type, i.price, i.value_twd, i.exposure) for i in items] == [
+        (1, "TWD", 1.0, 100.0, 0.0), (2, "TW_STOCK", 5.0, 50.0, 50.0)
+    ]
+    history = crud.get_net_worth_history(db, breakdown=True)
+    assert history[0]["by_class"] == {"TWD": 100.0, "TW_STOCK": 50.0}
+    assert db.query(NetWorthRollup).filter(NetWorthRollup.grain == "month").count() == 2
+    db.close()
+    engine.dispose()
+
+
+def test_migration_replaces_legacy_fifo_pnl(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(BASELINE_TRANSACTIONS))
+        conn.execute(text(
+            "CREATE TABLE realized_pnl (id INTEGER PRIMARY KEY, date DATE, symbol VARCHAR, quantity FLOAT, pnl FLOAT, notes VARCHAR)"
+        ))
+        conn.execute(text(
+            "INSERT INTO transactions (date, asset_type, symbol, action, price, quantity, multiplier, fee, tax) VALUES "
+            "('2025-01-02', 'US_STOCK', 'AAPL', 'BUY', 100, 10, 1, 1, 0), "
+            "('2025-01-03', 'US_STOCK', 'AAPL', 'BUY', 120, 10, 1, 1, 0), "
+            "('2025-01-06', 'US_STOCK', 'AAPL', 'SELL', 130, 15, 1, 1, 0)"
+        ))
+        conn.execute(text(
+            "INSERT INTO realized_pnl (date, symbol, quantity, pnl, notes) VALUES "
+            "('2025-01-06', 'AAPL', 15, 349, 'US Stock FIFO PnL (including fees)'), "
+            "('2025-01-01', 'TWD', 0, 5, 'manual')"
+        ))
+
+    # As on startup: create_all, then the migrations
+    Base.metadata.create_all(engine)
+    run_migrations(engine)
+
+    # The legacy rows are gone; positions are replayed on the next start
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT symbol, pnl FROM realized_pnl")).all() == [("TWD", 5.0)]
+        assert conn.execute(text("SELECT COUNT(*) FROM position_state")).scalar() == 0
+    db = Session(bind=engine)
+    assert services.ensure_positions(db)
+    assert not services.ensure_positions(db)
+    rows = sorted((r.symbol, r.pnl, r.txn_id) for r in db.query(RealizedProfitLoss))
+    # FIFO: 10 @ 100 and 5 @ 120 sold at 130, minus the sell fee
+    assert rows == [("AAPL", 30 * 10 + 10 * 5 - 1, 3), ("TWD", 5.0, None)]
+    # ...while the asset keeps the weighted average cost of its buys
+    asset = db.query(Asset).one()
+    assert (asset.symbol, asset.quantity, asset.cost) == ("AAPL", 5.0, 110.0)
+    db.close()
+    engine.dispose()
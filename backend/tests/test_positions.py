@@ -0,0 +1,43 @@
+from datetime import date
+from backend.models import Asset, PositionState
+from backend.positions import sync_positions
+from backend.services import update_assets_from_history
+
+
+def holdings(session):
+    return {a.symbol: (a.quantity, round(a.cost, 6), a.type) for a in session.query(Asset).all()}
+
+
+def test_incremental_update_applies_only_new_rows(db_session, add_txn):
+    add_txn(1, "2330", "BUY", 500.0, 100)
+    add_txn(2, "AAPL", "BUY", 200.0, 10, asset_type="US_STOCK")
+    update_assets_from_history(db_session)
+    assert holdings(db_session) == {"2330": (100, 500.0, "TW_STOCK"), "AAPL": (10, 200.0, "US_STOCK")}
+
+    add_txn(3, "2330", "BUY", 600.0, 100)
+    add_txn(4, "AAPL", "SELL", 250.0, 10, asset_type="US_STOCK")
+    update_assets_from_history(db_session)
+    assert holdings(db_session) == {"2330": (200, 550.0, "TW_STOCK")}
+
+    state = db_session.get(PositionState, "2330")
+    assert state.last_date == date(2025, 1, 3)
+    assert state.last_txn_id == 3
+
+
+def test_back_dated_trade_replays_symbol(db_session, add_txn):
+    add_txn(10, "2330", "BUY", 500.0, 100)
+    add_txn(20, "2330", "SELL", 550.0, 100)
+    add_txn(21, "2330", "BUY", 700.0, 10)
+    update_assets_from_history(db_session)
+    assert holdings(db_session) == {"2330": (10, 700.0, "TW_STOCK")}
+
+    # A trade dated before the checkpoint changes the average cost of everything after it
+    add_txn(5, "2330", "BUY", 400.0, 100)
+    update_assets_from_history(db_session)
+    incremental = holdings(db_session)
+    # The checkpoint covers the back-dated row (highest id): the next sync has nothing to replay
+    assert db_session.get(PositionState, "2330").last_txn_id == 4
+    assert sync_positions(db_session) == set()
+
+    update_assets_from_history(db_session, full=True)
+    assert incremental == holdings(db_session) == {"2330": (110, round((100 * 450 + 10 * 700) / 110, 6), "TW_STOCK")}
@@ -0,0 +1,516 @@
+import threading
+import pytest
+from datetime import date
+from types import SimpleNamespace
+from backend.pricing import (
+    QuoteEngine, PriceCache, ResolutionIndex, PriceStore, QuoteProvider, QuoteRecording, RecordingProvider,
+    live_providers, replay_providers, CircuitBreaker, CircuitOpenError, GuardedProvider, StaleClose, expect_bars,
+)
+from backend import services
+
+
+def make_asset(id, type, symbol, quantity, cost, **kwargs):
+    defaults = dict(currency="TWD", leverage=1.0, contract_size=1.0, margin=0.0)
+    defaults.update(kwargs)
+    return SimpleNamespace(id=id, name=symbol, type=type, symbol=symbol, quantity=quantity, cost=cost, **defaults)
+
+
+@pytest.fixture
+def calls():
+    return {"batch": [], "single": []}
+
+
+@pytest.fixture
+def engine(calls):
+    def batch(tickers):
+        calls["batch"].append(list(tickers))
+        # 2330 listed on TWSE, 8299 on TPEX, AAPL on US market; QSF maps to 8299
+        closes = {"2330.TW": 600.0, "8299.TWO": 400.0, "AAPL": 200.0}
+        return {t: closes[t] for t in tickers if t in closes}
+
+    def single(symbol, type):
+        calls["single"].append((symbol, type))
+        return 50.0
+
+    return QuoteEngine(single_fetcher=single, fx_fetcher=lambda: 30.0, batch_fetcher=batch)
+
+
+def test_engine_batches_and_falls_back(engine, calls):
+    snapshot = engine.snapshot([
+        ("2330", "TW_STOCK"),
+        ("8299", "TW_STOCK"),
+        ("QSF", "TW_STOCK"),
+        ("AAPL", "US_STOCK"),
+        ("UNKNOWN", "TW_STOCK"),
+        ("2330", "TW_STOCK"),
+    ])
+
+    assert snapshot.usd_rate == 30.0
+    assert snapshot.price("2330", "TW_STOCK") == 600.0
+    assert snapshot.price("8299", "TW_STOCK") == 400.0
+    assert snapshot.price("QSF", "TW_STOCK") == 400.0
+    assert snapshot.price("AAPL", "US_STOCK") == 200.0
+    assert snapshot.price("UNKNOWN", "TW_STOCK") == 50.0
+    # One download per market, only the miss goes through the single-symbol path
+    assert len(calls["batch"]) == 2
+    assert calls["single"] == [("UNKNOWN", "TW_STOCK")]
+
+
+def test_calculate_net_worth_uses_engine(engine):
+    assets = [
+        make_asset(1, "TWD", None, 1000.0, 1.0, leverage=0.0),
+        make_asset(2, "USD", None, 10.0, 1.0, currency="USD", leverage=0.0),
+        make_asset(3, "TW_STOCK", "2330", 10.0, 500.0),
+        make_asset(4, "US_STOCK", "AAPL", 2.0, 150.0, currency="USD", leverage=2.0),
+        make_asset(5, "TW_FUTURE", "QSF", 1.0, 350.0, contract_size=100.0, margin=10000.0),
+    ]
+
+    result = services.calculate_net_worth(assets, quote_engine=engine)
+
+    # 1000 + 10*30 + 10*600 + 2*200*30 + (10000 + 50*100)
+    assert result["total_twd"] == pytest.approx(1000 + 300 + 6000 + 12000 + 15000)
+    assert result["total_usd"] == pytest.approx(10 + 400)
+    future = result["details"][4]
+    assert future["notional_value"] == pytest.approx(40000.0)
+    assert future["leverage"] == pytest.approx(4.0)
+    # exposure: 6000 * 1 + 12000 * 2 + 40000
+    assert result["leverage_ratio"] == pytest.approx(70000 / 34300)
+
+
+def test_price_cache_ttl_and_stale_while_revalidate(clock):
+    cache = PriceCache(ttls={"TW_STOCK": 10.0}, max_stale=100.0, clock=clock)
+    loads = []
+
+    def loader():
+        loads.append(clock.now)
+        return 100.0 + len(loads)
+
+    key = ("2330", "TW_STOCK")
+    assert cache.get_or_load(key, loader) == 101.0
+    assert cache.get_or_load(key, loader) == 101.0
+    assert len(loads) == 1
+
+    # Stale: old value returned immediately, refresh happens in the background
+    clock.now = 50.0
+    assert cache.get_or_load(key, loader) == 101.0
+    cache._executor.shutdown(wait=True)
+    assert len(loads) == 2
+    assert cache.peek(key) == (102.0, True)
+
+    # Past the stale window it is a plain miss again
+    clock.now = 500.0
+    assert cache.peek(key) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["stale_hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["refreshes"] == 1
+
+
+def test_price_cache_lru_eviction_and_failures():
+    cache = PriceCache(max_entries=2)
+    cache.put(("A", "US_STOCK"), 1.0)
+    cache.put(("B", "US_STOCK"), 2.0)
+    cache.peek(("A", "US_STOCK"))  # A becomes most recently used
+    cache.put(("C", "US_STOCK"), 3.0)
+
+    assert cache.peek(("B", "US_STOCK")) is None
+    assert cache.peek(("A", "US_STOCK")) == (1.0, True)
+    assert cache.stats()["evictions"] == 1
+
+    # A failed lookup (0.0) is returned but not cached
+    assert cache.get_or_load(("D", "US_STOCK"), lambda: 0.0) == 0.0
+    assert cache.peek(("D", "US_STOCK")) is None
+
+
+def test_engine_serves_cached_quotes(calls, engine):
+    engine.cache = PriceCache()
+    engine.snapshot([("2330", "TW_STOCK"), ("AAPL", "US_STOCK")])
+    engine.snapshot([("2330", "TW_STOCK"), ("AAPL", "US_STOCK")])
+
+    assert len(calls["batch"]) == 2  # only the first snapshot went upstream
+
+
+def test_resolution_index_routes_known_good_first(tmp_path, monkeypatch, clock):
+    index = ResolutionIndex(path=str(tmp_path / "routes.db"), negative_ttl=60.0, clock=clock)
+    monkeypatch.setattr(services, "resolution_index", index)
+
+    tried = []
+
+    def fake_fetch_route(route, symbol):
+        tried.append(route)
+        return 400.0 if route == ("yfinance", "8299.TWO") else None
+
+    monkeypatch.setattr(services, "fetch_route", fake_fetch_route)
+
+    assert services.fetch_stock_price("8299", "TW_STOCK") == 400.0
+    assert tried == [("yfinance", "8299.TW"), ("yfinance", "8299.TWO")]
+
+    # Second lookup goes straight to the known-good route
+    tried.clear()
+    assert services.fetch_stock_price("8299", "TW_STOCK") == 400.0
+    assert tried == [("yfinance", "8299.TWO")]
+
+    # The index survives a restart
+    reopened = ResolutionIndex(path=str(tmp_path / "routes.db"), clock=clock)
+    assert reopened.known_good("8299", "TW_STOCK") == ("yfinance", "8299.TWO")
+    assert reopened.failed("8299", "TW_STOCK") == {("yfinance", "8299.TW")}
+
+    # When the known-good route fails, the other routes are re-probed, skipping recent failures
+    monkeypatch.setattr(services, "fetch_route", lambda route, symbol: tried.append(route))
+    tried.clear()
+    assert services.fetch_stock_price("8299", "TW_STOCK") == 0.0
+    assert tried == [("yfinance", "8299.TWO"), ("twstock", "8299"), ("twse", "8299")]
+
+    # Negative entries expire
+    clock.now = 120.0
+    assert index.failed("8299", "TW_STOCK") == set()
+
+
+def test_resolution_index_recovers_after_outage(tmp_path, monkeypatch, clock):
+    index = ResolutionIndex(path=str(tmp_path / "routes.db"), clock=clock)
+    monkeypatch.setattr(services, "resolution_index", index)
+    upstream = {"up": False}
+    tried = []
+
+    def fake_fetch_route(route, symbol):
+        tried.append(route)
+        return 1075.0 if upstream["up"] and route[0] in ("yfinance", "twse") else None
+
+    monkeypatch.setattr(services, "fetch_route", fake_fetch_route)
+
+    # An outage on the first lookup fails every route...
+    assert services.fetch_stock_price("2330", "TW_STOCK") == 0.0
+    assert len(index.failed("2330", "TW_STOCK")) == 4
+    # ...which are all probed again once upstream is back, instead of being skipped for a day
+    upstream["up"] = True
+    clock.now = 10.0
+    assert services.fetch_stock_price("2330", "TW_STOCK") == 1075.0
+    assert index.known_good("2330", "TW_STOCK") == ("yfinance", "2330.TW")
+
+    # One outage does not demote the known-good route: it is still tried first
+    upstream["up"] = False
+    clock.now = 20.0
+    assert services.fetch_stock_price("2330", "TW_STOCK") == 0.0
+    assert index.known_good("2330", "TW_STOCK") == ("yfinance", "2330.TW")
+    upstream["up"] = True
+    tried.clear()
+    clock.now = 30.0
+    assert services.fetch_stock_price("2330", "TW_STOCK") == 1075.0
+    assert tried == [("yfinance", "2330.TW")]
+
+    # Repeated failures demote it, with a short back-off since it used to work
+    upstream["up"] = False
+    for _ in range(3):
+        services.fetch_stock_price("2330", "TW_STOCK")
+    assert index.known_good("2330", "TW_STOCK") is None
+    assert ("yfinance", "2330.TW") in index.failed("2330", "TW_STOCK")
+    clock.now += index.retry_ttl + 1
+    assert ("yfinance", "2330.TW") not in index.failed("2330", "TW_STOCK")
+
+
+@pytest.fixture
+def store(tmp_path, price_fixtures):
+    downloads = []
+
+    def fetcher(tickers, start, end):
+        downloads.append((list(tickers), start, end))
+        return price_fixtures(tickers, start, end)
+
+    today = SimpleNamespace(value=date(2025, 1, 8))
+    price_store = PriceStore(path=str(tmp_path / "prices.db"), fetcher=fetcher, today=lambda: today.value)
+    price_store.downloads, price_store.clock = downloads, today
+    return price_store
+
+
+def test_price_store_syncs_incrementally(store):
+    assert store.latest_closes(["2330.TW", "AAPL", "TWD=X", "NOPE.TW"]) == {
+        "2330.TW": 1070.0, "AAPL": 242.70, "TWD=X": 32.93,
+    }
+    # New tickers share one download of the lookback window; today's bar is not final yet
+    assert store.downloads == [(["2330.TW", "AAPL", "TWD=X", "NOPE.TW"], date(2024, 12, 29), date(2025, 1, 8))]
+    assert store.coverage("2330.TW") == (date(2024, 12, 29), date(2025, 1, 7))
+
+    # Next day: only the bars after the last final day are downloaded
+    store.clock.value = date(2025, 1, 10)
+    store.downloads.clear()
+    assert store.latest_closes(["2330.TW", "AAPL"]) == {"2330.TW": 1075.0, "AAPL": 236.85}
+    assert store.downloads == [(["2330.TW", "AAPL"], date(2025, 1, 8), date(2025, 1, 10))]
+
+    # An earlier start only downloads the days before the synced range
+    store.downloads.clear()
+    closes = store.history(["2330.TW"], date(2024, 12, 20), date(2025, 1, 3))
+    assert store.downloads == [(["2330.TW"], date(2024, 12, 20), date(2024, 12, 28))]
+    assert closes["2330.TW"].tolist() == [1065.0, 1090.0]
+
+    bars = store.bars("2330.TW", start=date(2025, 1, 2), end=date(2025, 1, 2))
+    assert bars.iloc[0].tolist() == [1070.0, 1075.0, 1055.0, 1065.0, 30223000.0]
+
+
+def test_price_store_retries_tickers_missing_from_a_batch(store):
+    dropped = {"AAPL"}
+    fetcher = store.fetcher
+    store.fetcher = lambda tickers, start, end: {
+        t: frame for t, frame in fetcher(tickers, start, end).items() if t not in dropped
+    }
+    store.sync(["2330.TW", "AAPL"], start=date(2025, 1, 2))
+    assert store.coverage("2330.TW") == (date(2025, 1, 2), date(2025, 1, 7))
+    assert store.coverage("AAPL") is None
+
+    # The ticker the download dropped is asked for again, over the whole range
+    dropped.clear()
+    store.downloads.clear()
+    store.sync(["2330.TW", "AAPL"], start=date(2025, 1, 2))
+    assert store.downloads == [
+        (["2330.TW"], date(2025, 1, 8), date(2025, 1, 8)),
+        (["AAPL"], date(2025, 1, 2), date(2025, 1, 8)),
+    ]
+    assert store.coverage("AAPL") == (date(2025, 1, 2), date(2025, 1, 7))
+
+
+def test_price_store_reads_offline(store, tmp_path):
+    store.sync(["AAPL"], start=date(2025, 1, 2))
+
+    def offline(tickers, start, end):
+        raise ConnectionError("no network")
+
+    # Reopened from disk with a failing downloader: stored bars are still served
+    reopened = PriceStore(path=store.path, fetcher=offline, today=lambda: date(2025, 1, 9))
+    assert reopened.coverage("AAPL") == (date(2025, 1, 2), date(2025, 1, 7))
+    assert reopened.latest_closes(["AAPL"]) == {"AAPL": 242.70}
+    assert reopened.closes(["AAPL"], date(2025, 1, 6), date(2025, 1, 7))["AAPL"].tolist() == [245.00, 242.21]
+    assert not isinstance(reopened.latest_closes(["AAPL"])["AAPL"], StaleClose)
+
+    # Days later the stored close is still served, flagged as older than the last session
+    reopened.today = lambda: date(2025, 1, 14)
+    close = reopened.latest_closes(["AAPL"])["AAPL"]
+    assert close == 242.70 and isinstance(close, StaleClose)
+
+
+def test_outdated_closes_are_reported_stale(engine, calls):
+    engine.cache = PriceCache()
+    fast_batch = engine.batch_fetcher
+    engine.batch_fetcher = lambda tickers: {t: StaleClose(p) for t, p in fast_batch(tickers).items()}
+    engine.single_fetcher = lambda symbol, type: 610.0 if symbol == "2330" else 0.0
+
+    snapshot = engine.snapshot([("2330", "TW_STOCK"), ("AAPL", "US_STOCK")])
+    # A current price from the per-symbol fallback wins; otherwise the outdated close is used
+    assert snapshot.price("2330", "TW_STOCK") == 610.0
+    assert snapshot.price("AAPL", "US_STOCK") == 200.0
+    assert snapshot.stale == {("AAPL", "US_STOCK")}
+    assert engine.cache.last_known(("AAPL", "US_STOCK")) is None
+    assert engine.cache.last_known(("2330", "TW_STOCK")) == 610.0
+
+
+def test_quotes_served_from_price_fixtures(tmp_path, monkeypatch, price_fixtures):
+    store = PriceStore(path=str(tmp_path / "prices.db"), fetcher=price_fixtures, today=lambda: date(2025, 1, 10))
+    monkeypatch.setattr(services, "quote_providers", live_providers(store))
+    monkeypatch.setattr(services, "resolution_index", ResolutionIndex(path=str(tmp_path / "routes.db")))
+    assert services.fetch_stock_price("2330", "TW_STOCK") == 1075.0
+    assert services.fetch_usd_to_twd_rate() == 32.98
+
+
+class FakeUpstream(QuoteProvider):
+    name = "twstock"
+
+    def __init__(self, prices):
+        self.prices, self.calls = prices, 0
+
+    def fetch(self, target):
+        self.calls += 1
+        return self.prices.get(target)
+
+
+def test_provider_without_fetch_fails_on_construction():
+    class Incomplete(QuoteProvider):
+        name = "incomplete"
+
+    with pytest.raises(TypeError, match="fetch"):
+        Incomplete()
+
+
+def test_recorded_quotes_replay_offline(tmp_path, monkeypatch):
+    path = str(tmp_path / "recording.json")
+    upstream = FakeUpstream({"2330": 1075.0})
+    recorder = RecordingProvider(upstream, QuoteRecording(path))
+    assert recorder.fetch_many(["2330", "9999"]) == {"2330": 1075.0}
+
+    replayed = replay_providers(QuoteRecording(path))["twstock"]
+    assert replayed.fetch("2330") == 1075.0 and replayed.fetch("9999") is None
+    assert QuoteRecording(path).lookup("twstock", "9999") == (True, None) # Misses are recorded too
+    assert upstream.calls == 2
+
+    # The whole valuation path runs from a recording, without network access
+    recording = QuoteRecording(path)
+    recording.record("yfinance", "2330.TW", 1075.0)
+    recording.record("yfinance", "AAPL", 236.85)
+    recording.record("yfinance", "TWD=X", 32.98)
+    monkeypatch.setattr(services, "quote_providers", replay_providers(recording))
+    monkeypatch.setattr(services, "price_cache", PriceCache())
+    monkeypatch.setattr(services, "resolution_index", ResolutionIndex(path=str(tmp_path / "routes.db")))
+    result = services.calculate_net_worth([
+        make_asset(1, "TW_STOCK", "2330", 10.0, 1000.0),
+        make_asset(2, "US_STOCK", "AAPL", 2.0, 200.0, currency="USD"),
+    ])
+    assert result["usd_rate"] == 32.98
+    assert result["total_twd"] == 10 * 1075.0 + 2 * 236.85 * 32.98
+
+
+def fail(*args):
+    raise ConnectionError("timeout")
+
+
+def test_circuit_breaker_opens_and_probes(clock):
+    breaker = CircuitBreaker("twse", failure_threshold=2, cooldown=30.0, clock=clock)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+    assert breaker.state == "open" and not breaker.available()
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: 1.0) # Fails fast during the cool-down
+
+    # One probe after the cool-down: a failure re-opens, a success closes
+    clock.now = 30.0
+    assert breaker.state == "half_open"
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    assert breaker.state == "open"
+    clock.now = 60.0
+    assert breaker.call(lambda: 1.0) == 1.0
+    assert breaker.state == "closed"
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_open_circuit_is_skipped_without_marking_routes_failed(tmp_path, monkeypatch):
+    breaker = CircuitBreaker("yfinance", failure_threshold=1)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    providers = replay_providers(QuoteRecording(str(tmp_path / "recording.json")))
+    providers["yfinance"] = GuardedProvider(providers["yfinance"], breaker)
+    index = ResolutionIndex(path=str(tmp_path / "routes.db"))
+    monkeypatch.setattr(services, "quote_providers", providers)
+    monkeypatch.setattr(services, "resolution_index", index)
+    tried = []
+    monkeypatch.setattr(services, "fetch_route", lambda route, symbol: tried.append(route) or (80.0 if route[0] == "twse" else None))
+
+    assert services.fetch_stock_price("8299", "TW_STOCK") == 80.0
+    assert tried == [("twstock", "8299"), ("twse", "8299")]
+    assert index.failed("8299", "TW_STOCK") == {("twstock", "8299")}
+
+
+def test_open_yahoo_circuit_is_not_recorded_as_failed(tmp_path, monkeypatch, price_fixtures):
+    breaker = CircuitBreaker("yfinance", failure_threshold=1)
+    with pytest.raises(ConnectionError):
+        breaker.call(fail)
+    store = PriceStore(path=str(tmp_path / "prices.db"), fetcher=breaker.wrap(price_fixtures), today=lambda: date(2025, 1, 10))
+    providers = live_providers(store, breaker)
+    providers["twstock"] = FakeUpstream({"2330": 1080.0})
+    index = ResolutionIndex(path=str(tmp_path / "routes.db"))
+    monkeypatch.setattr(services, "quote_providers", providers)
+    monkeypatch.setattr(services, "resolution_index", index)
+
+    # The store's downloads are rejected, so Yahoo is skipped rather than marked failed
+    assert not providers["yfinance"].available()
+    assert services.fetch_stock_price("2330", "TW_STOCK") == 1080.0
+    assert index.failed("2330", "TW_STOCK") == set()
+
+
+def test_empty_downloads_open_the_yahoo_circuit(tmp_path, price_fixtures, clock):
+    breaker = CircuitBreaker("yfinance", failure_threshold=2, clock=clock)
+    upstream = {"up": True}
+    today = SimpleNamespace(value=date(2025, 1, 8))
+
+    def download(tickers, start, end):
+        # yf.download logs the error of each ticker and returns an empty frame
+        return price_fixtures(tickers, start, end) if upstream["up"] else {}
+
+    store = PriceStore(path=str(tmp_path / "prices.db"), today=lambda: today.value)
+    store.fetcher = breaker.wrap(
+        expect_bars(download, known=lambda ticker: store.coverage(ticker) is not None, today=lambda: today.value)
+    )
+    store.sync(["AAPL"])
+    upstream["up"] = False
+
+    # Nothing is missing yet: today's bar, and tickers that never had data
+    store.sync(["AAPL"])
+    store.sync(["NOPE.TW"])
+    assert breaker.stats()["consecutive_failures"] == 0
+
+    # The next day, AAPL's bar of the 8th should be there
+    today.value = date(2025, 1, 10)
+    store.sync(["AAPL"])
+    store.sync(["AAPL"])
+    assert breaker.state == "open"
+    assert store.coverage("AAPL") == (date(2024, 12, 29), date(2025, 1, 7))
+
+
+def test_budget_falls_back_to_last_known_prices(engine, calls):
+    engine.cache = PriceCache(ttls={}, default_ttl=0.0, max_stale=0.0)
+    engine.cache.put(("AAPL", "US_STOCK"), 190.0)
+    engine.cache.put(("TWD=X", "FX"), 31.0)
+    release = threading.Event()
+    fast_batch = engine.batch_fetcher
+
+    def slow_us_batch(tickers):
+        if "AAPL" in tickers:
+            release.wait(5.0) # Yahoo US hangs
+        return fast_batch(tickers)
+
+    def slow_fx():
+        release.wait(5.0)
+        return 30.0
+
+    engine.batch_fetcher, engine.fx_fetcher, engine.budget = slow_us_batch, slow_fx, 0.2
+    snapshot = engine.snapshot([("2330", "TW_STOCK"), ("AAPL", "US_STOCK"), ("NEW", "US_STOCK")])
+
+    assert snapshot.price("AAPL", "US_STOCK") == 190.0 # Last known
+    assert snapshot.price("NEW", "US_STOCK") == 0.0 # Never priced
+    assert snapshot.usd_rate == 31.0
+    assert snapshot.stale == {("AAPL", "US_STOCK"), ("TWD=X", "FX")}
+
+    # The fetch finishes in the background and refreshes the cache
+    release.set()
+    for _ in range(100):
+        if engine.cache.last_known(("AAPL", "US_STOCK")) == 200.0:
+            break
+        threading.Event().wait(0.02)
+    assert engine.cache.last_known(("AAPL", "US_STOCK")) == 200.0
+
+
+def test_stream_renders_cached_quotes_first(engine):
+    engine.cache = PriceCache()
+    engine.cache.put(("AAPL", "US_STOCK"), 190.0)
+    engine.cache.put(("TWD=X", "FX"), 31.0)
+    release = threading.Event()
+    fast_batch = engine.batch_fetcher
+
+    def slow_tw_batch(tickers):
+        if "2330.TW" in tickers:
+            release.wait(5.0)
+        return fast_batch(tickers)
+
+    engine.batch_fetcher = slow_tw_batch
+    assets = [
+        make_asset(1, "TW_STOCK", "2330", 10.0, 500.0),
+        make_asset(2, "US_STOCK", "AAPL", 2.0, 150.0, currency="USD"),
+    ]
+    events = services.stream_net_worth(assets, quote_engine=engine)
+
+    # Positions and cached quotes come first, without waiting for upstream
+    first = next(events)
+    assert first["event"] == "snapshot"
+    assert first["pending_quotes"] == ["2330"]
+    assert [(d["symbol"], d["current_price"], d["pending"]) for d in first["details"]] == [
+        ("2330", 0.0, True), ("AAPL", 190.0, False),
+    ]
+    assert first["total_twd"] == pytest.approx(2 * 190.0 * 31.0)
+
+    release.set()
+    rest = list(events)
+    update = rest[-2]
+    assert update["event"] == "update" and update["pending_quotes"] == []
+    assert [(d["symbol"], d["current_price"]) for d in update["details"]] == [("2330", 600.0)] # Changed rows only
+    assert update["total_twd"] == pytest.approx(10 * 600.0 + 2 * 190.0 * 31.0)
+    assert rest[-1] == {"event": "done", "stale_quotes": []}
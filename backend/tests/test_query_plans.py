@@ -0,0 +1,31 @@
+from datetime import date
+
+from backend.importer.processor import TransactionProcessor
+from backend.positions import new_transactions_query, symbol_history_query
+
+
+def query_plan(session, query) -> str:
+    stmt = getattr(query, "statement", query)
+    compiled = stmt.compile(dialect=session.bind.dialect)
+    params = tuple(None for _ in compiled.positiontup or ())
+    rows = session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+    return " | ".join(row[3] for row in rows)
+
+
+def test_dedup_query_uses_covering_natural_key_index(db_session):
+    stmt = TransactionProcessor._existing_keys_statement(date(2025, 1, 1), date(2025, 1, 31))
+    plan = query_plan(db_session, stmt)
+    assert "COVERING INDEX uq_transactions_natural_key" in plan
+
+
+def test_symbol_replay_uses_composite_index_without_sort(db_session):
+    plan = query_plan(db_session, symbol_history_query(db_session, "AAPL", "US_STOCK"))
+    assert "ix_transactions_symbol_type_date_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_new_transactions_read_is_primary_key_range(db_session):
+    plan = query_plan(db_session, new_transactions_query(db_session, 42))
+    assert "INTEGER PRIMARY KEY (rowid>?)" in plan
+    assert "TEMP B-TREE" not in plan
+
@@ -0,0 +1,54 @@
+from datetime import date
+
+from backend import crud, rollups, schemas
+from backend.models import NetWorthRollup, PnlRollup, RealizedProfitLoss
+
+
+def snapshot(session):
+    return sorted(
+        (r.grain, r.period_start, r.asset_class, r.value_twd, r.as_of) for r in session.query(NetWorthRollup)
+    )
+
+
+def test_realized_pnl_rolls_up_on_write(db_session):
+    for day, symbol, pnl in [(6, "AAPL", 10.0), (7, "AAPL", 5.0), (7, "2330", -2.0), (31, "AAPL", 1.0)]:
+        crud.create_realized_pnl(db_session, schemas.RealizedPnLCreate(
+            date=date(2025, 1, day), symbol=symbol, quantity=1, pnl=pnl
+        ))
+
+    rows = {(r.grain, r.period_start, r.symbol): (r.pnl, r.trade_count) for r in db_session.query(PnlRollup)}
+    assert rows[("day", date(2025, 1, 7), "AAPL")] == (5.0, 1)
+    assert rows[("week", date(2025, 1, 6), "AAPL")] == (15.0, 2)
+    assert rows[("month", date(2025, 1, 1), "AAPL")] == (16.0, 3)
+    assert rows[("month", date(2025, 1, 1), "2330")] == (-2.0, 1)
+
+    # FIFO recomputation replaces a symbol's realized rows and rebuilds only that symbol
+    db_session.query(RealizedProfitLoss).filter(RealizedProfitLoss.symbol == "AAPL").delete()
+    db_session.add(RealizedProfitLoss(date=date(2025, 1, 8), symbol="AAPL", quantity=1, pnl=3.0))
+    db_session.flush()
+    rollups.rebuild_symbol_pnl(db_session, "AAPL")
+    monthly = {r.symbol: r.pnl for r in db_session.query(PnlRollup).filter(PnlRollup.grain == "month")}
+    assert monthly == {"AAPL": 3.0, "2330": -2.0}
+
+
+def test_net_worth_rollup_keeps_latest_snapshot_of_period(db_session):
+    monday = [{"type": "TWD", "value_twd": 100.0}, {"type": "TW_STOCK", "value_twd": 50.0}]
+    tuesday = [{"type": "TWD", "value_twd": 180.0}]
+    rollups.record_net_worth(db_session, date(2025, 1, 7), tuesday)
+    rollups.record_net_worth(db_session, date(2025, 1, 6), monday) # Late, older snapshot
+    db_session.commit()
+
+    week = [r for r in snapshot(db_session) if r[0] == "week"]
+    assert week == [("week", date(2025, 1, 6), "TWD", 180.0, date(2025, 1, 7))]
+    periods = crud.get_net_worth_rollup(db_session, grain="day")
+    assert [(p["date"], p["total_twd"], p["by_class"]) for p in periods] == [
+        (date(2025, 1, 6), 150.0, {"TWD": 100.0, "TW_STOCK": 50.0}),
+        (date(2025, 1, 7), 180.0, {"TWD": 180.0}),
+    ]
+
+    # A full rebuild from the raw snapshots gives the same rollups
+    expected = snapshot(db_session)
+    for day, details in [(date(2025, 1, 6), monday), (date(2025, 1, 7), tuesday)]:
+        crud.save_net_worth_items(db_session, day, [dict(item, id=i) for i, item in enumerate(details)])
+    rollups.rebuild_all(db_session)
+    assert snapshot(db_session) == expected
@@ -0,0 +1,114 @@
+from datetime import date, datetime, timezone
+import logging
+
+from backend import crud, markets
+from backend.markets import NYSE, TAIFEX, TAIPEI, TWSE
+from backend.models import NetWorthHistory, Transaction
+from backend.pricing import PriceStore
+from backend.snapshots import GROUPS_BY_NAME, MarketCloseTrigger, catch_up, record_snapshot, settled_day
+
+
+def taipei(*args):
+    return datetime(*args, tzinfo=TAIPEI)
+
+
+def detail(id, type, value_twd, quantity=1.0, price=1.0):
+    return {"id": id, "symbol": str(id), "type": type, "quantity": quantity, "current_price": price,
+            "value_twd": value_twd, "notional_value": value_twd}
+
+
+def test_calendars_skip_weekends_and_holidays():
+    assert not TWSE.is_trading_day(date(2025, 1, 28)) # Lunar New Year
+    assert NYSE.is_trading_day(date(2025, 1, 28)) and not NYSE.is_trading_day(date(2025, 1, 9))
+    # TAIFEX night session: Friday evening and until 05:00 on Saturday, not Saturday evening
+    assert TAIFEX.is_open(taipei(2025, 1, 10, 20, 0)) and TAIFEX.is_open(taipei(2025, 1, 11, 4, 0))
+    assert not TAIFEX.is_open(taipei(2025, 1, 11, 20, 0)) and not TWSE.is_open(taipei(2025, 1, 10, 20, 0))
+
+
+def test_dates_past_the_holiday_lists_are_flagged(monkeypatch, caplog):
+    monkeypatch.setattr(markets, "_uncovered_warned", set())
+    assert NYSE.covered_years == TWSE.covered_years == {2025, 2026}
+    with caplog.at_level(logging.WARNING, logger="backend.markets"):
+        assert NYSE.is_trading_day(date(2031, 1, 1)) # Not listed: a regular weekday
+        assert not NYSE.is_trading_day(date(2031, 1, 4))
+        assert NYSE.is_trading_day(date(2026, 1, 2))
+    assert [r.getMessage() for r in caplog.records] == [
+        "NYSE holidays are only listed for 2025, 2026: 2031 is treated as having none (extend markets.py)."
+    ]
+
+
+def test_triggers_fire_after_each_market_close():
+    tw = MarketCloseTrigger(GROUPS_BY_NAME["tw_stock"])
+    fire = tw.get_next_fire_time(None, taipei(2025, 1, 22, 13, 40))
+    assert fire == taipei(2025, 1, 22, 13, 45) # 15 minutes after the close
+    # The next close after Jan 22 skips the Lunar New Year break
+    assert tw.get_next_fire_time(fire, fire) == taipei(2025, 2, 3, 13, 45)
+
+    futures = MarketCloseTrigger(GROUPS_BY_NAME["tw_future"])
+    assert futures.get_next_fire_time(None, taipei(2025, 1, 10, 14, 30)) == taipei(2025, 1, 13, 14, 0)
+
+    # NYSE closes at 16:00 New York time: early morning in Taipei, on the US date
+    us = MarketCloseTrigger(GROUPS_BY_NAME["us_stock"])
+    fire = us.get_next_fire_time(None, taipei(2025, 1, 8, 14, 0))
+    assert fire.astimezone(TAIPEI) == taipei(2025, 1, 9, 5, 15)
+    assert us.get_next_fire_time(fire, fire).astimezone(TAIPEI) == taipei(2025, 1, 11, 5, 15) # Skips Jan 9
+
+
+def test_group_snapshot_keeps_other_markets_rows(db_session):
+    day = date(2025, 1, 8)
+    record_snapshot(db_session, day, [detail(1, "TW_STOCK", 6000.0), detail(2, "US_STOCK", 3000.0, 10.0, 10.0)])
+
+    # The NYSE run replaces the US rows only
+    us_run = [detail(1, "TW_STOCK", 9999.0), detail(2, "US_STOCK", 3300.0, 10.0, 11.0)]
+    record_snapshot(db_session, day, us_run, types=GROUPS_BY_NAME["us_stock"].types)
+
+    history = db_session.query(NetWorthHistory).one()
+    assert (history.total_twd, history.total_usd) == (6000.0 + 3300.0, 110.0)
+    items = {i.type: i.value_twd for i in crud.get_net_worth_details(db_session, day)}
+    assert items == {"TW_STOCK": 6000.0, "US_STOCK": 3300.0}
+
+
+def test_first_group_run_of_a_day_carries_other_markets_over(db_session):
+    record_snapshot(db_session, date(2025, 1, 8), [detail(1, "TW_STOCK", 6000.0), detail(2, "US_STOCK", 3000.0, 10.0, 10.0)])
+
+    # Only the TW assets were quoted; the US rows come from the 8th
+    record_snapshot(db_session, date(2025, 1, 9), [detail(1, "TW_STOCK", 6100.0)], types=GROUPS_BY_NAME["tw_stock"].types)
+
+    items = {i.type: i.value_twd for i in crud.get_net_worth_details(db_session, date(2025, 1, 9))}
+    assert items == {"TW_STOCK": 6100.0, "US_STOCK": 3000.0}
+    history = db_session.query(NetWorthHistory).filter(NetWorthHistory.date == date(2025, 1, 9)).one()
+    assert (history.total_twd, history.total_usd) == (6100.0 + 3000.0, 100.0)
+
+
+def test_catch_up_coalesces_missed_days_into_one_backfill(db_session, tmp_path, price_fixtures):
+    db_session.add(Transaction(date=date(2025, 1, 2), asset_type="US_STOCK", symbol="AAPL", action="BUY", price=240.0, quantity=10))
+    db_session.add(NetWorthHistory(date=date(2025, 1, 3), total_twd=1.0, total_usd=1.0))
+    db_session.commit()
+    downloads = []
+    store = PriceStore(
+        path=str(tmp_path / "prices.db"),
+        fetcher=lambda tickers, start, end: downloads.append(tickers) or price_fixtures(tickers, start, end),
+        today=lambda: date(2025, 1, 11),
+    )
+
+    # Down from Jan 3 until Friday Jan 10, 15:00 in Taipei: Jan 10 has closed in Taiwan, not in New York
+    now = taipei(2025, 1, 10, 15, 0).astimezone(timezone.utc)
+    assert settled_day(now) == date(2025, 1, 9)
+    result, due = catch_up(db_session, now, loader=store.history)
+
+    assert (result.start, result.end, result.days) == (date(2025, 1, 4), date(2025, 1, 9), 4)
+    assert len(downloads) == 1
+    assert [g.name for g in due] == ["tw_stock", "tw_future"]
+    # Nothing recorded yet: nothing to catch up
+    db_session.query(NetWorthHistory).delete()
+    assert catch_up(db_session, now) == (None, [])
+
+
+def test_snapshot_upsert_is_idempotent(db_session):
+    day = date(2025, 1, 8)
+    record_snapshot(db_session, day, [detail(1, "TW_STOCK", 6000.0)])
+    record_snapshot(db_session, day, [detail(1, "TW_STOCK", 6100.0)]) # Same job run twice
+
+    history = db_session.query(NetWorthHistory).one()
+    assert history.total_twd == 6100.0
+    assert [i.value_twd for i in crud.get_net_worth_details(db_session, day)] == [6100.0]
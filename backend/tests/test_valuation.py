@@ -0,0 +1,124 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+
+from backend import services
+from backend.pricing import QuoteSnapshot
+from backend.valuation import load_arrays, value_portfolio
+
+TYPES = ["TWD", "USD", "TW_STOCK", "US_STOCK", "TW_FUTURE", "CRYPTO"]
+
+
+def legacy_net_worth(assets, quotes):
+    """The per-asset loop calculate_net_worth used before the vectorized kernel."""
+    usd_rate = quotes.usd_rate
+    total_twd = total_usd = total_exposure_twd = 0.0
+    details = []
+    for asset in assets:
+        current_price = value_twd = exposure_twd = 0.0
+        leverage_mult = asset.leverage if asset.leverage is not None else 1.0
+        if asset.type in ["TWD", "USD"]:
+            leverage_mult = 0.0
+        notional_value = equity = pnl = pnl_percentage = 0.0
+        if asset.type == "TWD":
+            value_twd = asset.quantity
+            total_twd += value_twd
+            current_price = 1.0
+            leverage_mult = 0.0
+            notional_value = value_twd * leverage_mult
+            equity = value_twd
+        elif asset.type == "USD":
+            value_twd = asset.quantity * usd_rate
+            total_usd += asset.quantity
+            total_twd += value_twd
+            current_price = usd_rate
+            leverage_mult = 0.0
+            notional_value = value_twd * leverage_mult
+            equity = value_twd
+        elif asset.type == "US_STOCK":
+            price_usd = quotes.price(asset.symbol, "US_STOCK")
+            value_usd = price_usd * asset.quantity
+            value_twd = value_usd * usd_rate
+            total_usd += value_usd
+            total_twd += value_twd
+            current_price = price_usd
+            notional_value = value_twd * leverage_mult
+            equity = value_twd
+            cost_twd = asset.cost * asset.quantity * usd_rate
+            pnl = value_twd - cost_twd
+            pnl_percentage = (pnl / cost_twd * 100) if cost_twd != 0 else 0.0
+        elif asset.type == "TW_STOCK":
+            price_twd = quotes.price(asset.symbol, "TW_STOCK")
+            value_twd = price_twd * asset.quantity
+            total_twd += value_twd
+            current_price = price_twd
+            notional_value = value_twd * leverage_mult
+            equity = value_twd
+            cost_twd = asset.cost * asset.quantity
+            pnl = value_twd - cost_twd
+            pnl_percentage = (pnl / cost_twd * 100) if cost_twd != 0 else 0.0
+        elif asset.type == "TW_FUTURE":
+            price_twd = quotes.price(asset.symbol, "TW_STOCK")
+            current_price = price_twd
+            contract_size = asset.contract_size if asset.contract_size else 1.0
+            margin = asset.margin if asset.margin else 0.0
+            notional_value = price_twd * asset.quantity * contract_size
+            pnl = (price_twd - asset.cost) * asset.quantity * contract_size
+            equity = margin + pnl
+            total_twd += equity
+            exposure_twd = notional_value
+            leverage_mult = notional_value / margin if margin > 0 else 0.0
+            value_twd = equity
+            pnl_percentage = (pnl / margin * 100) if margin != 0 else 0.0
+        if asset.type != "TW_FUTURE":
+            exposure_twd = value_twd * leverage_mult
+        total_exposure_twd += exposure_twd
+        details.append((current_price, value_twd, leverage_mult, notional_value, equity, pnl, pnl_percentage))
+    leverage_ratio = total_exposure_twd / total_twd if total_twd > 0 else 0.0
+    return total_twd, total_usd, leverage_ratio, details
+
+
+def random_portfolio(n, seed):
+    rng = random.Random(seed)
+    assets, prices = [], {}
+    for i in range(n):
+        asset_type = rng.choice(TYPES)
+        symbol = f"S{i}"
+        assets.append(SimpleNamespace(
+            id=i, name=symbol, type=asset_type, symbol=symbol, currency=rng.choice(["TWD", "USD"]),
+            quantity=rng.choice([0.0, rng.uniform(-5, 5000)]),
+            cost=rng.choice([0.0, rng.uniform(1, 900)]),
+            leverage=rng.choice([None, 0.0, 1.0, 2.0]),
+            contract_size=rng.choice([None, 0.0, 50.0, 200.0]),
+            margin=rng.choice([None, 0.0, rng.uniform(1000, 100000)]),
+        ))
+        key = (symbol, "TW_STOCK" if asset_type == "TW_FUTURE" else asset_type)
+        prices[key] = rng.choice([0.0, rng.uniform(1, 1200)])
+    return assets, QuoteSnapshot(usd_rate=31.7, prices=prices)
+
+
+def test_calculate_net_worth_matches_legacy_loop_exactly():
+    for seed in range(20):
+        assets, quotes = random_portfolio(60, seed)
+        engine = SimpleNamespace(snapshot=lambda keys: quotes)
+        result = services.calculate_net_worth(assets, quote_engine=engine)
+
+        total_twd, total_usd, leverage_ratio, details = legacy_net_worth(assets, quotes)
+        assert (result["total_twd"], result["total_usd"], result["leverage_ratio"]) == (total_twd, total_usd, leverage_ratio)
+        fields = ("current_price", "value_twd", "leverage", "notional_value", "equity", "pnl", "pnl_percentage")
+        assert [tuple(d[f] for f in fields) for d in result["details"]] == details
+
+
+def test_value_portfolio_scenarios():
+    assets, quotes = random_portfolio(30, 1)
+    arrays = load_arrays(assets)
+    keys = [services.quote_key(a) for a in assets]
+    base = np.array([quotes.price(*k) if k else 0.0 for k in keys])
+    shocks = np.array([0.8, 1.0, 1.2])
+
+    scenarios = value_portfolio(arrays, base * shocks[:, None], np.array([30.0, 31.7, 33.0]))
+    assert scenarios.total_twd.shape == (3,)
+    middle = value_portfolio(arrays, base, 31.7)
+    assert scenarios.total_twd[1] == middle.total_twd
+    assert np.array_equal(scenarios.value_twd[1], middle.value_twd)
@@ -0,0 +1,148 @@
+from dataclasses import dataclass
+from typing import Sequence, Union
+
+import numpy as np
+
+# Asset types and currencies as small integer codes; unknown values get -1
+TYPE_CODES = {"TWD": 0, "USD": 1, "US_STOCK": 2, "TW_STOCK": 3, "TW_FUTURE": 4}
+CURRENCY_CODES = {"TWD": 0, "USD": 1}
+TWD, USD, US_STOCK, TW_STOCK, TW_FUTURE = range(5)
+
+
+@dataclass
+class PortfolioArrays:
+    """
+    Assets as parallel typed arrays (one element per asset). Missing numbers are NaN,
+    except contract_size, margin and leverage, which get the defaults calculate_net_worth uses.
+    """
+    quantity: np.ndarray
+    cost: np.ndarray
+    contract_size: np.ndarray
+    margin: np.ndarray
+    leverage: np.ndarray
+    type_code: np.ndarray
+    currency_code: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.quantity)
+
+
+@dataclass
+class Valuation:
+    """
+    Per-asset results (shape (n,) or (scenarios, n)) and portfolio totals (scalar or (scenarios,)).
+    """
+    current_price: np.ndarray
+    value_twd: np.ndarray # Equity for futures, as in the details of calculate_net_worth
+    notional_value: np.ndarray
+    equity: np.ndarray
+    pnl: np.ndarray
+    pnl_percentage: np.ndarray
+    leverage: np.ndarray
+    exposure_twd: np.ndarray
+    total_twd: np.ndarray
+    total_usd: np.ndarray
+    total_exposure_twd: np.ndarray
+    leverage_ratio: np.ndarray
+
+
+def _floats(values, missing=np.nan) -> np.ndarray:
+    return np.array([missing if v is None else v for v in values], dtype=np.float64)
+
+
+def load_arrays(assets: Sequence) -> PortfolioArrays:
+    return PortfolioArrays(
+        quantity=_floats(a.quantity for a in assets),
+        cost=_floats(a.cost for a in assets),
+        # Futures treat a missing or zero contract size as 1 and a missing margin as 0
+        contract_size=np.array([a.contract_size or 1.0 for a in assets], dtype=np.float64),
+        margin=np.array([a.margin or 0.0 for a in assets], dtype=np.float64),
+        leverage=_floats((a.leverage for a in assets), missing=1.0),
+        type_code=np.array([TYPE_CODES.get(a.type, -1) for a in assets], dtype=np.int8),
+        currency_code=np.array([CURRENCY_CODES.get(a.currency, -1) for a in assets], dtype=np.int8),
+    )
+
+
+def _sequential_sum(values: np.ndarray) -> np.ndarray:
+    # Left-to-right like the original loop (np.sum's pairwise summation rounds differently)
+    if values.shape[-1] == 0:
+        return np.zeros(values.shape[:-1])
+    return np.cumsum(values, axis=-1)[..., -1]
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    out = np.zeros(np.broadcast(numerator, denominator, valid).shape)
+    np.divide(numerator, denominator, out=out, where=valid & np.ones_like(out, dtype=bool))
+    return out
+
+
+def value_portfolio(arrays: PortfolioArrays, prices: np.ndarray, usd_rate: Union[float, np.ndarray]) -> Valuation:
+    """
+    Values every asset at once, reproducing calculate_net_worth's arithmetic operation for
+    operation. `prices` holds the quote of each asset (ignored for cash). Pass prices of
+    shape (scenarios, n) and `usd_rate` of shape (scenarios,) to value many scenarios in
+    one call.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    usd_rate = np.asarray(usd_rate, dtype=np.float64)
+    if usd_rate.ndim:
+        usd_rate = usd_rate[..., np.newaxis]
+    shape = np.broadcast(prices, arrays.quantity, usd_rate).shape
+    code = arrays.type_code
+    is_twd, is_usd = code == TWD, code == USD
+    is_us, is_tw, is_future = code == US_STOCK, code == TW_STOCK, code == TW_FUTURE
+    is_cash, is_stock = is_twd | is_usd, is_us | is_tw
+
+    q, cost, size, margin = arrays.quantity, arrays.cost, arrays.contract_size, arrays.margin
+    zeros = np.zeros(shape)
+
+    with np.errstate(invalid="ignore"):
+        # Stocks: value = price * quantity (then * rate for US)
+        value_usd = np.where(is_us, prices * q, 0.0)
+        value_twd = np.select(
+            [is_twd, is_usd, is_us, is_tw],
+            [q + zeros, q * usd_rate + zeros, value_usd * usd_rate, prices * q + zeros],
+            0.0,
+        )
+        cost_twd = np.select([is_us, is_tw], [cost * q * usd_rate + zeros, cost * q + zeros], 0.0)
+        stock_pnl = value_twd - cost_twd
+
+        # Futures: notional = price * quantity * contract size, equity = margin + unrealized PnL
+        future_notional = prices * q * size
+        future_pnl = (prices - cost) * q * size
+        future_equity = margin + future_pnl
+
+        leverage = np.where(is_cash, 0.0, arrays.leverage) + zeros
+        leverage = np.where(is_future, _ratio(future_notional, margin, margin > 0), leverage)
+
+        current_price = np.select([is_twd, is_usd, is_stock | is_future], [1.0 + zeros, usd_rate + zeros, prices + zeros], 0.0)
+        value_twd = np.where(is_future, future_equity, value_twd)
+        notional = np.where(is_future, future_notional, value_twd * leverage)
+        equity = np.where(is_cash | is_stock, value_twd, np.where(is_future, future_equity, 0.0))
+        pnl = np.select([is_stock, is_future], [stock_pnl, future_pnl], 0.0)
+        pnl_percentage = np.select(
+            [is_stock, is_future],
+            [_ratio(pnl, cost_twd, cost_twd != 0) * 100, _ratio(pnl, margin, margin != 0) * 100],
+            0.0,
+        )
+        exposure = np.where(is_future, future_notional, value_twd * leverage)
+
+    total_twd = _sequential_sum(np.where(is_cash | is_stock | is_future, value_twd, 0.0))
+    total_usd = _sequential_sum(np.select([is_usd, is_us], [q + zeros, value_usd], 0.0))
+    total_exposure = _sequential_sum(exposure)
+    leverage_ratio = _ratio(total_exposure, total_twd, total_twd > 0)
+
+    return Valuation(
+        current_price=current_price,
+        value_twd=value_twd,
+        notional_value=notional,
+        equity=equity,
+        pnl=pnl,
+        pnl_percentage=pnl_percentage,
+        leverage=leverage,
+        exposure_twd=exposure,
+        total_twd=total_twd,
+        total_usd=total_usd,
+        total_exposure_twd=total_exposure,
+        leverage_ratio=leverage_ratio,
+    )
@@ -0,0 +1,35 @@
+"""
+Per-table write counters, kept in the table_versions table of the shared database.
+
+Writers call bump() in the same transaction as their write, so the new version becomes
+visible to every process exactly when the data does. Readers (response_cache) compare
+versions instead of re-reading the data.
+"""
+from typing import Dict, Iterable
+
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from .models import TableVersion
+
+ASSETS = "assets"
+NET_WORTH_HISTORY = "net_worth_history"
+REALIZED_PNL = "realized_pnl" # Also covers pnl_rollup, written alongside
+TRANSACTIONS = "transactions"
+
+
+def bump(db: Session, *tables: str) -> None:
+    """
+    Increments the version of `tables` (no commit).
+    """
+    for table in tables:
+        stmt = insert(TableVersion).values(name=table, version=1)
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[TableVersion.name], set_={"version": TableVersion.version + 1}
+        ))
+
+
+def current(db: Session, tables: Iterable[str]) -> Dict[str, int]:
+    tables = list(tables)
+    versions = dict(db.query(TableVersion.name, TableVersion.version).filter(TableVersion.name.in_(tables)))
+    return {table: versions.get(table, 0) for table in tables}
@@ -4,4 +4,49 @@ const api = axios.create({
     baseURL: 'http://localhost:8000',
 });
 
+// Reads /net-worth/stream (NDJSON) and calls onEvent with each event as it arrives:
+// a "snapshot" from cached quotes first, "update"s as quotes resolve, then "done".
+export const streamNetWorth = async (onEvent) => {
+    const response = await fetch(`${api.defaults.baseURL}/net-worth/stream`, {
+        headers: { Accept: 'application/x-ndjson' },
+    });
+    if (!response.ok) {
+        throw new Error(`Net worth stream failed: ${response.status}`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+        const { done, value } = await reader.read();
+        buffer += decoder.decode(value || new Uint8Array(), { stream: !done });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        lines.filter(line => line.trim()).forEach(line => onEvent(JSON.parse(line)));
+        if (done) break;
+    }
+};
+
+// Subscribes to /ws/net-worth: the server's shared quote poller pushes a "snapshot", then
+// "update"s with the rows that changed. Returns a function that closes the socket.
+export const subscribeNetWorth = (onEvent) => {
+    const socket = new WebSocket(`${api.defaults.baseURL.replace(/^http/, 'ws')}/ws/net-worth`);
+    socket.onmessage = (message) => onEvent(JSON.parse(message.data));
+    socket.onerror = (error) => console.error("Net worth socket error", error);
+    return () => socket.close();
+};
+
+// Applies one streamed or pushed event to the current net worth (null before the snapshot)
+export const applyNetWorthEvent = (netWorth, event) => {
+    const { event: type, ...data } = event;
+    if (type === 'snapshot') return data;
+    if (!netWorth) return netWorth;
+    if (type === 'done') return { ...netWorth, stale_quotes: data.stale_quotes };
+    const changed = new Map(data.details.map(detail => [detail.id, detail]));
+    return {
+        ...netWorth,
+        ...data,
+        details: netWorth.details.map(detail => changed.get(detail.id) || detail),
+    };
+};
+
 export default api;
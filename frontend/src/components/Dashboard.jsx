@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import api from '../api';
+import api, { streamNetWorth, subscribeNetWorth, applyNetWorthEvent } from '../api';
 import AssetTable from './AssetTable';
 import RealizedPnLTable from './RealizedPnLTable';
 import AssetAllocationChart from './AssetAllocationChart';
@@ -32,16 +32,18 @@ const Dashboard = () => {
 
     const fetchData = async () => {
         setLoading(true);
+        // Net worth renders from cached quotes right away and fills in as quotes arrive,
+        // independently of the other requests
+        streamNetWorth(event => setNetWorth(current => applyNetWorthEvent(current, event)))
+            .catch(error => console.error("Error streaming net worth", error));
         try {
-            const [assetsRes, netWorthRes, historyRes, pnlHistoryRes, cumulativePnlRes] = await Promise.all([
+            const [assetsRes, historyRes, pnlHistoryRes, cumulativePnlRes] = await Promise.all([
                 api.get('/assets/'),
-                api.get('/net-worth/current'),
-                api.get('/net-worth/history'),
+                api.get('/net-worth/history', { params: { breakdown: historyViewMode === 'breakdown' } }),
                 api.get('/pnl/history'),
                 api.get('/pnl/cumulative')
             ]);
             setAssets(assetsRes.data);
-            setNetWorth(netWorthRes.data);
             setHistory(historyRes.data);
             setPnlHistory(pnlHistoryRes.data);
             setCumulativePnl(cumulativePnlRes.data);
@@ -56,6 +58,24 @@ const Dashboard = () => {
         fetchData();
     }, []);
 
+    // Live prices pushed by the server while the dashboard is open
+    useEffect(() => subscribeNetWorth(event => setNetWorth(current => applyNetWorthEvent(current, event))), []);
+
+    // History is loaded as totals only; per-class values are requested for the breakdown view
+    const fetchHistory = async (mode) => {
+        try {
+            const res = await api.get('/net-worth/history', { params: { breakdown: mode === 'breakdown' } });
+            setHistory(res.data);
+        } catch (error) {
+            console.error("Error fetching history", error);
+        }
+    };
+
+    const changeHistoryViewMode = (mode) => {
+        setHistoryViewMode(mode);
+        fetchHistory(mode);
+    };
+
     const filteredHistory = filterDataByTimeRange(history, timeRange);
     const filteredCumulativePnl = filterDataByTimeRange(cumulativePnl, timeRange);
 
@@ -203,13 +223,13 @@ const Dashboard = () => {
                             {viewMode !== 'pnl' && (
                                 <div className="flex bg-slate-900/50 rounded-lg p-0.5 border border-white/10">
                                     <button
-                                        onClick={() => setHistoryViewMode('total')}
+                                        onClick={() => changeHistoryViewMode('total')}
                                         className={`px-3 py-1.5 text-xs font-bold uppercase tracking-wider rounded-md transition-colors ${historyViewMode === 'total' ? 'bg-slate-700 text-white' : 'text-slate-500 hover:text-slate-300'}`}
                                     >
                                         Total
                                     </button>
                                     <button
-                                        onClick={() => setHistoryViewMode('breakdown')}
+                                        onClick={() => changeHistoryViewMode('breakdown')}
                                         className={`px-3 py-1.5 text-xs font-bold uppercase tracking-wider rounded-md transition-colors ${historyViewMode === 'breakdown' ? 'bg-slate-700 text-white' : 'text-slate-500 hover:text-slate-300'}`}
                                     >
                                         Breakdown
@@ -19,6 +19,17 @@ const ImportHistoryModal = ({ isOpen, onClose, onSuccess }) => {
         }
     };
 
+    const waitForJob = async (jobId) => {
+        while (true) {
+            const { data: job } = await api.get(`/jobs/${jobId}`);
+            if (job.phase === 'done' || job.phase === 'failed') {
+                return job;
+            }
+            setMessage(`Importing... ${job.rows_parsed} rows parsed, ${job.rows_inserted} inserted`);
+            await new Promise((resolve) => setTimeout(resolve, 500));
+        }
+    };
+
     const handleUpload = async () => {
         if (!file) return;
 
@@ -37,8 +48,14 @@ const ImportHistoryModal = ({ isOpen, onClose, onSuccess }) => {
                 },
             });
 
+            // The import runs as a background job; poll its progress until it finishes
+            const job = await waitForJob(response.data.job_id);
+            if (job.phase === 'failed') {
+                throw { response: { data: { detail: job.error } } };
+            }
+
             setStatus('success');
-            setMessage(`Successfully imported ${response.data.imported_count} transactions.`);
+            setMessage(`Successfully imported ${job.rows_inserted} transactions (${job.rows_skipped} already existed).`);
 
             // Close after a short delay
             setTimeout(() => {
@@ -110,8 +127,8 @@ const ImportHistoryModal = ({ isOpen, onClose, onSuccess }) => {
 
                     {/* Status Message */}
                     {message && (
-                        <div className={`p-4 rounded-xl flex items-center gap-3 ${status === 'success' ? 'bg-green-500/10 text-green-400 border border-green-500/20' : 'bg-red-500/10 text-red-400 border border-red-500/20'}`}>
-                            {status === 'success' ? <CheckCircle size={20} /> : <AlertCircle size={20} />}
+                        <div className={`p-4 rounded-xl flex items-center gap-3 ${status === 'success' ? 'bg-green-500/10 text-green-400 border border-green-500/20' : status === 'error' ? 'bg-red-500/10 text-red-400 border border-red-500/20' : 'bg-white/5 text-slate-300 border border-white/10'}`}>
+                            {status === 'success' ? <CheckCircle size={20} /> : status === 'error' ? <AlertCircle size={20} /> : <FileText size={20} />}
                             <span className="text-sm font-medium">{message}</span>
                         </div>
                     )}
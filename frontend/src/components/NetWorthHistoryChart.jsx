@@ -4,37 +4,12 @@ import { LineChart, Line, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContai
 const NetWorthHistoryChart = ({ data, dataKey = "total_twd", color = "#3b82f6", viewMode = 'total' }) => {
     // Process data to calculate breakdown if needed
     const processedData = (data || []).map(entry => {
-        if (viewMode === 'breakdown' && entry.details) {
-            let cash = 0;
-            let twStock = 0;
-            let usStock = 0;
-
-            entry.details.forEach(item => {
-                // Calculate value in TWD
-                let valueTwd = 0;
-                if (item.type === 'TWD') {
-                    valueTwd = item.quantity;
-                } else if (item.type === 'USD') {
-                    valueTwd = item.quantity * (entry.usd_rate || 32.0); // Use entry rate if available, else fallback
-                    // Note: entry.usd_rate might not be in history object directly if not stored, 
-                    // but usually total_twd / total_usd gives rate if both exist.
-                    // Actually, let's look at how value_twd is stored in details.
-                    // The details in DB is a JSON snapshot which includes 'value_twd' calculated at that time.
-                    // So we should use item.value_twd directly if available.
-                    valueTwd = item.value_twd || 0;
-                } else {
-                    valueTwd = item.value_twd || 0;
-                }
-
-                // Categorize
-                if (item.type === 'TWD' || item.type === 'USD') {
-                    cash += valueTwd;
-                } else if (item.type === 'TW_STOCK' || item.type === 'TW_FUTURE') {
-                    twStock += valueTwd;
-                } else if (item.type === 'US_STOCK') {
-                    usStock += valueTwd;
-                }
-            });
+        if (viewMode === 'breakdown' && entry.by_class) {
+            // by_class: TWD value per asset type, aggregated by the backend
+            const value = (type) => entry.by_class[type] || 0;
+            const cash = value('TWD') + value('USD');
+            const twStock = value('TW_STOCK') + value('TW_FUTURE');
+            const usStock = value('US_STOCK');
 
             return {
                 ...entry,